@@ -0,0 +1,57 @@
+"""
+Compares calculating the timing of a design space sweep one configuration at
+a time, with a deep copied reg_dict and calc_fps() for each point, against
+sweep_timing() which calculates every point in one vectorized pass.
+
+Run from the benchmark folder
+
+    python batch_timing_benchmark.py
+"""
+
+import os
+import copy
+import time
+
+import numpy as np
+import mlx75027_config as mlx
+
+csvFile = os.path.join("..", "mlx75027.csv")
+mlx75027 = True
+
+speeds = np.array([300, 600, 704, 800, 960])
+int_times = np.linspace(50, 1000, 40)
+nraws = np.arange(1, 9)
+pretimes = np.array([10.0, 25.0, 50.0])
+
+reg_dict = mlx.csv_import(csvFile)
+mlx.set_preheat(reg_dict, [True, False, False,
+                           False, False, False, False, False])
+npoints = speeds.size * int_times.size * nraws.size * pretimes.size
+print("Sweep of " + str(npoints) + " configurations")
+
+t_start = time.perf_counter()
+depth_fps = []
+for speed in speeds:
+    for int_time in int_times:
+        for nraw in nraws:
+            for pretime in pretimes:
+                reg = copy.deepcopy(reg_dict)
+                mlx.set_hmax(reg, mlx.calc_hmax(reg, mlx75027, speed=speed))
+                mlx.set_nraw(reg, nraw)
+                mlx.set_int_times(reg, np.array([int_time]), mlx75027)
+                mlx.set_pretime(reg, pretime, mlx75027)
+                depth_fps.append(mlx.calc_fps(reg, mlx75027)[0])
+t_scalar = time.perf_counter() - t_start
+
+t_start = time.perf_counter()
+timing = mlx.sweep_timing(reg_dict, mlx75027, speed=speeds[:, None, None, None],
+                          int_times=int_times[None, :, None, None, None],
+                          nraw=nraws[None, None, :, None], pretime=pretimes)
+t_batch = time.perf_counter() - t_start
+
+print("Scalar : {:8.3f} s, {:8.1f} us per configuration".format(
+    t_scalar, 1e6*t_scalar/npoints))
+print("Batch  : {:8.3f} s, {:8.1f} us per configuration".format(
+    t_batch, 1e6*t_batch/npoints))
+print("Identical results: " +
+      str(np.array_equal(np.array(depth_fps), timing["depth_fps"])))
@@ -0,0 +1,45 @@
+"""
+Compares loading the register map from the CSV file with csv_import() against
+loading the compiled binary file with compiled_import(), which memory maps the
+file and only decodes the field names.
+
+Run from the benchmark folder
+
+    python compiled_config_benchmark.py
+"""
+
+import os
+import tempfile
+import timeit
+
+import mlx75027_config as mlx
+
+nloops = 500
+
+for csvFile in ["mlx75027.csv", "mlx75026.csv", "epc660.csv"]:
+    csvFile = os.path.join("..", csvFile)
+    compiledFile = os.path.join(tempfile.mkdtemp(), "config.bin")
+    mlx.csv_to_compiled(csvFile, compiledFile)
+
+    t_csv = timeit.timeit(lambda: mlx.csv_import(csvFile), number=nloops)
+    t_map = timeit.timeit(lambda: mlx.csv_import(
+        csvFile, compiled=True), number=nloops)
+    t_bin = timeit.timeit(
+        lambda: mlx.compiled_import(compiledFile), number=nloops)
+    t_raw = timeit.timeit(lambda: mlx.compiled_import(
+        compiledFile, verify=False), number=nloops)
+    t_all = timeit.timeit(lambda: mlx.compiled_import(
+        compiledFile, verify_all=True), number=nloops)
+
+    print(os.path.basename(csvFile) + ", {:d} bytes CSV, {:d} bytes compiled".format(
+        os.path.getsize(csvFile), os.path.getsize(compiledFile)))
+    print("  csv_import()                     : {:8.1f} us".format(
+        1e6*t_csv/nloops))
+    print("  csv_import(compiled=True)        : {:8.1f} us".format(
+        1e6*t_map/nloops))
+    print("  compiled_import()                : {:8.1f} us".format(
+        1e6*t_bin/nloops))
+    print("  compiled_import(verify=False)    : {:8.1f} us".format(
+        1e6*t_raw/nloops))
+    print("  compiled_import(verify_all=True) : {:8.1f} us".format(
+        1e6*t_all/nloops))
@@ -0,0 +1,60 @@
+"""
+Compares loading the CSV files with csv_import() against loading them through
+a CSVCache. A new CSVCache on the same folder loads from disk, as a new worker
+process would, and a CSVCache that has already loaded a file returns a copy
+from memory.
+
+Run from the benchmark folder
+
+    python csv_cache_benchmark.py
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import mlx75027_config as mlx
+
+csvFiles = [os.path.join("..", name)
+            for name in ["mlx75027.csv", "mlx75026.csv", "epc660.csv"]]
+nworkers = 20
+nloads = 50
+
+cache_dir = tempfile.mkdtemp()
+
+t_start = time.perf_counter()
+for worker in range(0, nworkers):
+    for n in range(0, nloads):
+        for csvFile in csvFiles:
+            mlx.csv_import(csvFile, compiled=True)
+t_csv = time.perf_counter() - t_start
+
+stats = []
+t_start = time.perf_counter()
+for worker in range(0, nworkers):
+    # Each worker process has its own cache, sharing the folder
+    cache = mlx.CSVCache(cache_dir)
+    for n in range(0, nloads):
+        for csvFile in csvFiles:
+            mlx.csv_import(csvFile, compiled=True, cache=cache)
+    stats.append(cache.stats())
+t_cache = time.perf_counter() - t_start
+
+nloaded = nworkers * nloads * len(csvFiles)
+print(str(nworkers) + " workers each loading " + str(len(csvFiles)) +
+      " CSV files " + str(nloads) + " times")
+print("csv_import()         : {:8.1f} us per load".format(1e6*t_csv/nloaded))
+print("csv_import(cache=..) : {:8.1f} us per load".format(
+    1e6*t_cache/nloaded))
+
+for name in ["misses", "disk_hits", "memory_hits", "evictions"]:
+    print("  {:12s} : {:d}".format(name, sum(s[name] for s in stats)))
+print("  hit rate     : {:.4f}".format(
+    sum(s["hit_rate"] for s in stats) / nworkers))
+print("  first worker miss time : {:8.1f} us".format(
+    1e6*stats[0]["mean_miss_time"]))
+print("  mean hit time          : {:8.1f} us".format(
+    1e6*sum(s["mean_hit_time"] for s in stats) / nworkers))
+
+shutil.rmtree(cache_dir)
@@ -0,0 +1,85 @@
+"""
+Compares the per call latency of epc_set_int_times() against the previous
+multiplier search, which tested every multiplier from 1 to 1022 and looped over
+them in Python for two (HDR) integration times. Besides the round integration
+times, the multiplier is timed over random integration times and over totals
+with large prime factors, the worst case of a divisor search.
+
+Run from the benchmark folder
+
+    python epc_int_times_benchmark.py
+"""
+
+import os
+import timeit
+
+import numpy as np
+import mlx75027_config as mlx
+
+csvFile = os.path.join("..", "epc660.csv")
+nloops = 2000
+mclk = 96.0
+demod_clk = 0.0
+
+
+def search_int_mult(int_total):
+    """ The previous multiplier search """
+    if np.size(int_total) == 1 or int_total[0] == int_total[1]:
+        pos_mult = np.arange(1, 1023)
+        mult_work = np.nonzero(np.mod(int_total[0], pos_mult) == 0)
+        return mult_work[0][-1] + 1
+    pos_mult = np.tile(np.reshape(np.arange(1, 1023), (-1, 1)), (1, 2))
+    com_mult = (np.mod(int_total, pos_mult) == 0)
+    use_ind = 0
+    for n in range(0, 1022):
+        if (com_mult[n, 0] == True and com_mult[n, 1] == True):
+            use_ind = n
+    return use_ind + 1
+
+
+reg_dict = mlx.csv_import(csvFile)
+tests = [("single", 0.5, np.array([48000], dtype=np.int32)),
+         ("dual", [0.1, 0.5], np.array([9600, 48000], dtype=np.int32))]
+
+rng = np.random.RandomState(0)
+random_ms = rng.uniform(0.05, 2.0, size=(200, 2))
+random_totals = [np.int32(ms[:1]*mclk*1e3) for ms in random_ms]
+random_hdr_totals = [np.int32(ms*mclk*1e3) for ms in random_ms]
+# Primes and products of two large primes, which have no divisor up to 1022
+prime_totals = [np.array([total], dtype=np.int32) for total in
+                (1000003, 2999999, 1009*1013, 99991, 2147483647)]
+
+for name, int_time_ms, int_total in tests:
+    mlx.epc_set_mode(reg_dict, False, False, np.size(int_time_ms) == 2)
+    t_set = timeit.timeit(lambda: mlx.epc_set_int_times(
+        reg_dict, int_time_ms, mclk, demod_clk), number=nloops)
+    t_search = timeit.timeit(
+        lambda: search_int_mult(int_total), number=nloops)
+    t_mult = timeit.timeit(
+        lambda: mlx.epc_calc_int_mult(int_total), number=nloops)
+    print(name + " integration time")
+    print("  previous multiplier search : {:8.1f} us per call".format(
+        1e6*t_search/nloops))
+    print("  epc_calc_int_mult()        : {:8.1f} us per call".format(
+        1e6*t_mult/nloops))
+    print("  epc_set_int_times()        : {:8.1f} us per call".format(
+        1e6*t_set/nloops))
+    print("  identical multiplier       : " +
+          str(search_int_mult(int_total) == mlx.epc_calc_int_mult(int_total)))
+
+for name, totals in (("random single", random_totals),
+                     ("random dual", random_hdr_totals),
+                     ("prime factor", prime_totals)):
+    t_search = timeit.timeit(lambda: [search_int_mult(int_total)
+                                      for int_total in totals], number=nloops//100)
+    t_mult = timeit.timeit(lambda: [mlx.epc_calc_int_mult(int_total)
+                                    for int_total in totals], number=nloops//100)
+    ncalls = len(totals)*(nloops//100)
+    print(name + " integration times")
+    print("  previous multiplier search : {:8.1f} us per call".format(
+        1e6*t_search/ncalls))
+    print("  epc_calc_int_mult()        : {:8.1f} us per call".format(
+        1e6*t_mult/ncalls))
+    print("  identical multiplier       : " +
+          str(all(search_int_mult(int_total) == mlx.epc_calc_int_mult(int_total)
+                  for int_total in totals)))
@@ -0,0 +1,49 @@
+"""
+Writes the registers of 1000 configurations, comparing a csv_export_registers()
+file per configuration against streaming every configuration to a single output
+in each of the RegisterStreamWriter formats.
+
+Run from the benchmark folder
+
+    python export_benchmark.py
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import mlx75027_config as mlx
+
+csvFile = os.path.join("..", "mlx75027.csv")
+nconfigs = 1000
+mlx75027 = True
+
+reg_map = mlx.csv_import(csvFile, compiled=True)
+configs = []
+for int_time in np.linspace(100, 1000, nconfigs):
+    reg = reg_map.fork()
+    mlx.set_int_times(reg, np.array([int_time]*4), mlx75027)
+    reg.pack_registers()
+    configs.append(reg)
+names = ["config" + str(n) for n in range(0, nconfigs)]
+
+out_dir = tempfile.mkdtemp()
+try:
+    t_start = time.perf_counter()
+    for name, reg in zip(names, configs):
+        mlx.csv_export_registers(os.path.join(out_dir, name + ".csv"), reg)
+    t_files = time.perf_counter() - t_start
+    print(str(nconfigs) + " configurations")
+    print("{:32s}: {:8.2f} ms".format("csv_export_registers() per file", 1e3*t_files))
+
+    for fmt in mlx.REGISTER_FORMATS:
+        outfile = os.path.join(out_dir, "registers." + fmt)
+        t_start = time.perf_counter()
+        mlx.export_registers(outfile, configs, fmt, names)
+        t_stream = time.perf_counter() - t_start
+        print("{:32s}: {:8.2f} ms, {:8.1f} kB".format(
+            "export_registers() " + fmt, 1e3*t_stream, os.path.getsize(outfile)/1e3))
+finally:
+    shutil.rmtree(out_dir)
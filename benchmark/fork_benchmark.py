@@ -0,0 +1,61 @@
+"""
+Forks a base configuration 10000 times and sets the integration time of each
+fork, comparing copy.deepcopy() of a reg_dict, an eager copy of the
+RegisterMap values, and RegisterMap.fork() which shares the values until the
+fork is written.
+
+Run from the benchmark folder
+
+    python fork_benchmark.py
+"""
+
+import os
+import copy
+import time
+
+import numpy as np
+import mlx75027_config as mlx
+
+csvFile = os.path.join("..", "mlx75027.csv")
+nforks = 10000
+mlx75027 = True
+
+# The base configuration from examples/example_configuration.py
+reg_dict = mlx.csv_import(csvFile)
+mlx.set_nlanes(reg_dict, 2)
+mlx.set_output_mode(reg_dict, 0)
+mlx.set_hmax(reg_dict, mlx.calc_hmax(reg_dict, mlx75027, speed=800))
+mlx.set_roi(reg_dict, 1, 640, 1, 480, mlx75027)
+mlx.set_mod_freq(reg_dict, 35.0)
+mlx.set_nraw(reg_dict, 4)
+mlx.set_int_times(reg_dict, np.array([250, 250, 250, 250]), mlx75027)
+mlx.set_duty_cycle(reg_dict, 0.5)
+mlx.set_phase_shift(reg_dict, np.array([0.0, 0.25, 0.5, 0.75]))
+reg_map = mlx.compile_reg_dict(reg_dict)
+reg_map.pack_registers()
+int_times = np.linspace(100, 1000, nforks)
+
+
+def run(name, fork):
+    t_start = time.perf_counter()
+    forks = [fork() for n in range(0, nforks)]
+    t_fork = time.perf_counter() - t_start
+    t_start = time.perf_counter()
+    for reg, int_time in zip(forks, int_times):
+        mlx.set_int_times(reg, np.array([int_time]*4), mlx75027)
+    t_set = time.perf_counter() - t_start
+    print("{:28s}: fork {:7.2f} us, set_int_times {:7.2f} us, total {:7.3f} s".format(
+        name, 1e6*t_fork/nforks, 1e6*t_set/nforks, t_fork + t_set))
+    # Only a sample is kept, so the forks of one run do not slow the garbage collection of the next
+    return [mlx.dict_to_registers(reg) for reg in forks[::100]]
+
+
+print(str(nforks) + " forks, each followed by set_int_times()")
+dict_regs = run("copy.deepcopy(reg_dict)",
+                lambda: copy.deepcopy(reg_dict))
+copy_regs = run("RegisterMap eager copy",
+                lambda: mlx.RegisterMap(reg_map.layout, reg_map.values_array))
+fork_regs = run("RegisterMap.fork()", reg_map.fork)
+
+print("Identical registers: " +
+      str(dict_regs == copy_regs and dict_regs == fork_regs))
@@ -0,0 +1,42 @@
+"""
+Measures the startup time of a fresh interpreter importing the package, which
+loads its modules on first use, against the first use of the EPC660 and the
+MLX75027 functions, and against importing every module as the package used to.
+
+Run from the benchmark folder
+
+    python import_benchmark.py
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+nruns = 20
+
+env = dict(os.environ)
+env["PYTHONPATH"] = os.pathsep.join(
+    [os.path.abspath("..")] + [p for p in [env.get("PYTHONPATH")] if p])
+
+tests = [("python (no import)", "pass"),
+         ("import mlx75027_config", "import mlx75027_config"),
+         ("import, first EPC660 function", "import mlx75027_config as mlx; mlx.epc_calc_mod_freq"),
+         ("import, first MLX75027 function", "import mlx75027_config as mlx; mlx.calc_speed"),
+         ("import every module (eager)", "from mlx75027_config import *")]
+
+
+def run(code):
+    t_start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
+    return time.perf_counter() - t_start
+
+
+for name, code in tests:
+    # The first run warms the file system and the bytecode caches
+    run(code)
+    times = np.array([run(code) for n in range(0, nruns)])
+    print("{:35s}: median {:7.1f} ms, min {:7.1f} ms".format(
+        name, 1e3*np.median(times), 1e3*np.min(times)))
@@ -0,0 +1,43 @@
+"""
+Decodes the register dumps read back from 500 sensors, comparing
+registers_to_dict() on a copy of the reg_dict for each sensor against a single
+unpack_registers() call on the 2-D array of dumps.
+
+Run from the benchmark folder
+
+    python readback_benchmark.py
+"""
+
+import os
+import copy
+import time
+
+import numpy as np
+import mlx75027_config as mlx
+
+csvFile = os.path.join("..", "mlx75027.csv")
+nsensors = 500
+
+reg_dict = mlx.csv_import(csvFile)
+reg_map = mlx.compile_reg_dict(reg_dict)
+addresses = list(mlx.dict_to_registers(reg_dict).keys())
+# Random register values, as if every sensor had a different configuration
+rng = np.random.default_rng(0)
+registers = rng.integers(0, 256, size=(nsensors, len(addresses)))
+
+t_start = time.perf_counter()
+dict_values = []
+for n in range(0, nsensors):
+    reg = copy.deepcopy(reg_dict)
+    mlx.registers_to_dict(reg, dict(zip(addresses, registers[n].tolist())))
+    dict_values.append([reg[k][2] for k in reg])
+t_dict = time.perf_counter() - t_start
+
+t_start = time.perf_counter()
+layout, values = mlx.unpack_registers(reg_map, addresses, registers)
+t_unpack = time.perf_counter() - t_start
+
+print(str(nsensors) + " sensors, " + str(len(addresses)) + " registers each")
+print("registers_to_dict() per sensor: {:8.2f} ms".format(1e3*t_dict))
+print("unpack_registers()            : {:8.2f} ms".format(1e3*t_unpack))
+print("Identical values: " + str(np.array_equal(np.array(dict_values), values)))
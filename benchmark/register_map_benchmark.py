@@ -0,0 +1,63 @@
+"""
+Compares the list of lists reg_dict from csv_import() against the compiled
+RegisterMap, for the per field read and write cost and the memory used when
+holding many configurations.
+
+Run from the benchmark folder
+
+    python register_map_benchmark.py
+"""
+
+import os
+import copy
+import timeit
+import tracemalloc
+
+import mlx75027_config as mlx
+
+csvFile = os.path.join("..", "mlx75027.csv")
+nconfigs = 1000
+nloops = 200000
+
+
+def field_read(reg_dict):
+    return reg_dict["FMOD_HI"][2]
+
+
+def field_write(reg_dict):
+    reg_dict["FMOD_HI"][2] = 1
+
+
+def config_memory(template, ncopies):
+    """ Returns the bytes allocated to hold ncopies of the template """
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    configs = [copy.deepcopy(template) for n in range(0, ncopies)]
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del configs
+    return end - start
+
+
+reg_dict = mlx.csv_import(csvFile)
+reg_map = mlx.csv_import(csvFile, compiled=True)
+
+print("Per field cost over " + str(nloops) + " loops")
+for name, config in [("reg_dict", reg_dict), ("RegisterMap", reg_map)]:
+    t_read = timeit.timeit(lambda: field_read(config), number=nloops)
+    t_write = timeit.timeit(lambda: field_write(config), number=nloops)
+    print("{:12s} read: {:6.1f} ns  write: {:6.1f} ns".format(
+        name, 1e9*t_read/nloops, 1e9*t_write/nloops))
+
+t_read = timeit.timeit(lambda: reg_map.get_value("FMOD_HI"), number=nloops)
+t_write = timeit.timeit(lambda: reg_map.set_value(
+    "FMOD_HI", 1), number=nloops)
+print("{:12s} read: {:6.1f} ns  write: {:6.1f} ns".format(
+    "get/set_value", 1e9*t_read/nloops, 1e9*t_write/nloops))
+
+print("")
+print("Memory of " + str(nconfigs) + " configurations")
+for name, config in [("reg_dict", reg_dict), ("RegisterMap", reg_map)]:
+    nbytes = config_memory(config, nconfigs)
+    print("{:12s} {:10.1f} kB total, {:8.1f} bytes per config".format(
+        name, nbytes/1024.0, nbytes/float(nconfigs)))
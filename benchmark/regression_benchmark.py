@@ -0,0 +1,179 @@
+"""
+Times the configuration hot paths, the CSV import and export, the register
+conversions, the timing calculations, the integration time setters and the
+full example configuration of the MLX75027, MLX75026 and EPC660, and compares
+the times with a saved baseline. Any case slower than the baseline by more than
+the threshold is reported as a regression, and the script exits with 1.
+
+Run from the benchmark folder, save a baseline, then compare against it after a change
+
+    python regression_benchmark.py --save
+    python regression_benchmark.py --threshold 0.25
+
+The baseline is a JSON file of the best time per call of each case, it is only
+comparable on the machine and versions it was saved with.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+import mlx75027_config as mlx
+
+BASELINE_FILE = "regression_baseline.json"
+
+# The CSV file and the mlx75027 flag of each MLX sensor
+MLX_SENSORS = [("mlx75027", os.path.join("..", "mlx75027.csv"), True),
+               ("mlx75026", os.path.join("..", "mlx75026.csv"), False)]
+EPC_CSV = os.path.join("..", "epc660.csv")
+# The full VGA / QVGA region of interest of example_configuration.py
+MLX_ROI = {True: (1, 640, 1, 480), False: (1, 320, 1, 240)}
+# The EPC660 clocks in MHz
+mclk = 96.0
+demod_clk = 0.0
+
+
+def mlx_example(csv_file, mlx75027, out_file):
+    """ The sequence of examples/example_configuration.py """
+    reg_dict = mlx.csv_import(csv_file)
+    mlx.configure_unit(reg_dict, {"roi": MLX_ROI[mlx75027]}, mlx75027)
+    mlx.csv_export_registers(out_file, reg_dict)
+
+
+def epc_example(csv_file, out_file):
+    """ The same sequence for the EPC660 """
+    reg_dict = mlx.csv_import(csv_file)
+    mlx.epc_set_mode(reg_dict, False, False, False)
+    mlx.epc_set_mod_freq(reg_dict, 12.0, mclk)
+    mlx.epc_set_phase_steps(reg_dict, [0, 1, 2, 3])
+    mlx.epc_set_int_times(reg_dict, 0.5, mclk, demod_clk)
+    mlx.epc_set_roi(reg_dict, 4, 323, 6, 125)
+    mlx.epc_set_binning(reg_dict, 0, 0)
+    mlx.epc_setup_light_phase(reg_dict, 0.25, mclk, demod_clk)
+    mlx.csv_export_registers(out_file, reg_dict)
+
+
+def make_cases(out_dir):
+    """ Returns the (name, function) of each case """
+    cases = []
+    for sensor, csv_file, mlx75027 in MLX_SENSORS:
+        reg_dict = mlx.csv_import(csv_file)
+        mlx.configure_unit(reg_dict, {"roi": MLX_ROI[mlx75027]}, mlx75027)
+        registers = mlx.dict_to_registers(reg_dict)
+        out_file = os.path.join(out_dir, sensor + ".csv")
+        int_times = np.full(4, 250.0)
+        cases += [("csv_import[" + sensor + "]", lambda f=csv_file: mlx.csv_import(f)),
+                  ("csv_export[" + sensor + "]",
+                   lambda r=reg_dict, f=out_file: mlx.csv_export(f, r)),
+                  ("dict_to_registers[" + sensor + "]",
+                   lambda r=reg_dict: mlx.dict_to_registers(r)),
+                  ("registers_to_dict[" + sensor + "]",
+                   lambda r=reg_dict, g=registers: mlx.registers_to_dict(r, g)),
+                  ("calc_frame_time[" + sensor + "]",
+                   lambda r=reg_dict, m=mlx75027: mlx.calc_frame_time(r, m)),
+                  ("calc_fps[" + sensor + "]",
+                   lambda r=reg_dict, m=mlx75027: mlx.calc_fps(r, m)),
+                  ("set_int_times[" + sensor + "]",
+                   lambda r=reg_dict, m=mlx75027: mlx.set_int_times(r, int_times, m)),
+                  ("set_pretime[" + sensor + "]",
+                   lambda r=reg_dict, m=mlx75027: mlx.set_pretime(r, 20.0, m)),
+                  ("example_configuration[" + sensor + "]",
+                   lambda f=csv_file, m=mlx75027, o=out_file: mlx_example(f, m, o))]
+
+    epc_dict = mlx.csv_import(EPC_CSV)
+    out_file = os.path.join(out_dir, "epc660.csv")
+    cases += [("csv_import[epc660]", lambda: mlx.csv_import(EPC_CSV)),
+              ("epc_set_int_times[epc660]",
+               lambda: mlx.epc_set_int_times(epc_dict, [0.1, 0.5], mclk, demod_clk)),
+              ("example_configuration[epc660]", lambda: epc_example(EPC_CSV, out_file))]
+    return cases
+
+
+def time_case(func, repeat):
+    """ Returns the best time per call in seconds, of repeat runs of at least 0.2 s """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def versions():
+    return {"python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform()}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Times the configuration hot paths against a saved baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE,
+                        help="the baseline JSON file")
+    parser.add_argument("--save", action="store_true",
+                        help="save the times as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="the slow down that fails a case, 0.25 is 25%% slower than the baseline")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="the number of timing runs of each case")
+    parser.add_argument("--filter", default="",
+                        help="only run the cases with this in their name")
+    args = parser.parse_args()
+
+    baseline = None
+    if not args.save and os.path.isfile(args.baseline):
+        with open(args.baseline, encoding="utf-8") as infile:
+            baseline = json.load(infile)
+        if any(baseline.get(key) != value for key, value in versions().items() if key != "machine"):
+            print("Warning: the baseline was saved with different versions " +
+                  str({key: baseline.get(key) for key in versions()}))
+
+    out_dir = tempfile.mkdtemp()
+    try:
+        times = {}
+        regressions = []
+        print("{:36s}: {:>12s} {:>12s} {:>8s}".format(
+            "Case", "Baseline", "Time", "Change"))
+        for name, func in make_cases(out_dir):
+            if args.filter not in name:
+                continue
+            times[name] = time_case(func, args.repeat)
+            base_time = None if baseline is None else baseline["times"].get(name)
+            if base_time is None:
+                print("{:36s}: {:>12s} {:9.2f} us".format(
+                    name, "-", 1e6*times[name]))
+                continue
+            if times[name] / base_time - 1.0 > args.threshold:
+                # A slow case is timed again, so a noisy run does not fail
+                times[name] = min(times[name], time_case(func, args.repeat))
+            change = times[name] / base_time - 1.0
+            status = ""
+            if change > args.threshold:
+                regressions.append(name)
+                status = "  REGRESSION"
+            print("{:36s}: {:9.2f} us {:9.2f} us {:+7.1%}{:s}".format(
+                name, 1e6*base_time, 1e6*times[name], change, status))
+    finally:
+        shutil.rmtree(out_dir)
+
+    if args.save:
+        saved = versions()
+        saved["times"] = times
+        with open(args.baseline, "w", encoding="utf-8") as outfile:
+            json.dump(saved, outfile, indent=2, sort_keys=True)
+        print("Saved the baseline to " + args.baseline)
+    elif baseline is None:
+        print("No baseline found, save one with --save")
+    elif regressions:
+        print(str(len(regressions)) + " regressions of more than " +
+              "{:.0%}".format(args.threshold) + ": " + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Compares each register helper of SensorConfig.py with the original NumPy
+scalar version, on a reg_dict and a RegisterMap, and the array helpers
+against a loop of the scalar helpers.
+
+Run from the benchmark folder
+
+    python sensor_config_benchmark.py
+"""
+
+import os
+import timeit
+
+import numpy as np
+
+import mlx75027_config as mlx
+
+csvFile = os.path.join("..", "mlx75027.csv")
+nloops = 20000
+narray = 1000
+
+reg_dict = mlx.csv_import(csvFile)
+reg_map = mlx.compile_reg_dict(reg_dict)
+
+
+def np_reg16_to_value(reg_dict, reg0, reg1):
+    """ The original reg16_to_value() """
+    return np.left_shift(reg_dict[reg1][2], 8) | reg_dict[reg0][2]
+
+
+def np_reg24_to_value(reg_dict, reg0, reg1, reg2):
+    """ The original reg24_to_value() """
+    return np.left_shift(reg_dict[reg2][2], 16) | np.left_shift(
+        reg_dict[reg1][2], 8) | reg_dict[reg0][2]
+
+
+def np_reg_to_value(reg_dict, reg0, reg1, reg2, reg3):
+    """ The original reg_to_value() """
+    return np.left_shift(reg_dict[reg3][2], 24) | np.left_shift(
+        reg_dict[reg2][2], 16) | np.left_shift(reg_dict[reg1][2], 8) | reg_dict[reg0][2]
+
+
+def np_value16_to_reg(reg_dict, value, hi_reg, low_reg):
+    """ The original value16_to_reg() """
+    val16 = np.uint16(value)
+    reg_dict[hi_reg][2] = np.right_shift(val16, 8)
+    reg_dict[low_reg][2] = val16 & 0x00FF
+
+
+def np_value24_to_reg(reg_dict, value, reg0, reg1, reg2):
+    """ The original value24_to_reg() """
+    val32 = np.uint32(value)
+    reg_dict[reg0][2] = val32 & 0xFF
+    reg_dict[reg1][2] = np.right_shift(val32, 8) & 0xFF
+    reg_dict[reg2][2] = np.right_shift(val32, 16) & 0xFF
+
+
+def np_value32_to_reg(reg_dict, value, reg0, reg1, reg2, reg3):
+    """ The original value32_to_reg() """
+    val32 = np.uint32(value)
+    reg_dict[reg0][2] = val32 & 0xFF
+    reg_dict[reg1][2] = np.right_shift(val32, 8) & 0xFF
+    reg_dict[reg2][2] = np.right_shift(val32, 16) & 0xFF
+    reg_dict[reg3][2] = np.right_shift(val32, 24) & 0xFF
+
+
+HMAX = ("HMAX_LOW", "HMAX_HI")
+RANDNM0 = ("RANDNM0_0", "RANDNM0_1", "RANDNM0_2")
+FRAME_TIME = ("FRAME_TIME0", "FRAME_TIME1", "FRAME_TIME2", "FRAME_TIME3")
+
+helpers = [("reg16_to_value", np_reg16_to_value, mlx.reg16_to_value, HMAX),
+           ("reg24_to_value", np_reg24_to_value, mlx.reg24_to_value, RANDNM0),
+           ("reg_to_value", np_reg_to_value, mlx.reg_to_value, FRAME_TIME),
+           ("value16_to_reg", np_value16_to_reg, mlx.value16_to_reg,
+            (0x0AF4, "HMAX_HI", "HMAX_LOW")),
+           ("value24_to_reg", np_value24_to_reg, mlx.value24_to_reg,
+            (0x012345,) + RANDNM0),
+           ("value32_to_reg", np_value32_to_reg, mlx.value32_to_reg, (0x01234567,) + FRAME_TIME)]
+
+print("{:16s} {:11s}: {:>10s} {:>10s} {:>8s}".format(
+    "Helper", "State", "NumPy", "int", "Speedup"))
+for name, np_func, func, args in helpers:
+    for state_name, state in [("reg_dict", reg_dict), ("RegisterMap", reg_map)]:
+        t_np = timeit.timeit(lambda: np_func(state, *args), number=nloops) / nloops
+        t_int = timeit.timeit(lambda: func(state, *args), number=nloops) / nloops
+        print("{:16s} {:11s}: {:7.2f} us {:7.2f} us {:7.1f}x".format(
+            name, state_name, 1e6*t_np, 1e6*t_int, t_np / t_int))
+
+# The array helpers against a loop of the scalar helpers
+values = np.random.RandomState(0).randint(0, 2**32, narray, dtype=np.int64)
+regs = mlx.values_to_regs(values, 4)
+regs_dicts = [{reg: [0, 8, int(r[n])] for reg, r in zip(FRAME_TIME, regs)}
+              for n in range(0, narray)]
+
+
+def loop_split():
+    for value in values:
+        mlx.value32_to_reg(regs_dicts[0], value, *FRAME_TIME)
+
+
+def loop_combine():
+    for state in regs_dicts:
+        mlx.reg_to_value(state, *FRAME_TIME)
+
+
+tests = [("values_to_regs", loop_split, lambda: mlx.values_to_regs(values, 4)),
+         ("regs_to_values", loop_combine, lambda: mlx.regs_to_values(regs))]
+
+print("")
+print(str(narray) + " values")
+for name, loop_func, array_func in tests:
+    t_loop = timeit.timeit(loop_func, number=20) / 20
+    t_array = timeit.timeit(array_func, number=20) / 20
+    print("{:16s}: loop {:8.1f} us, array {:8.1f} us, {:7.1f}x".format(
+        name, 1e6*t_loop, 1e6*t_array, t_loop / t_array))
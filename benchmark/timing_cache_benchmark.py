@@ -0,0 +1,67 @@
+"""
+Counts the HMAX table lookups done by calc_fps(), before the line timing was
+resolved once with calc_line_timing() every timing function did its own
+calc_speed() and calc_hmax() table scans.
+
+Run from the benchmark folder
+
+    python timing_cache_benchmark.py
+"""
+
+import os
+import timeit
+
+import mlx75027_config as mlx
+import mlx75027_config.MLX75027Config as mlx_config
+
+csvFile = os.path.join("..", "mlx75027.csv")
+nloops = 2000
+mlx75027 = True
+
+
+class CallCounter:
+    """ Wraps a module function and counts the calls to it """
+
+    def __init__(self, module, name):
+        self.module = module
+        self.name = name
+        self.func = getattr(module, name)
+        self.count = 0
+        setattr(module, name, self)
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+        return self.func(*args, **kwargs)
+
+    def restore(self):
+        setattr(self.module, self.name, self.func)
+
+
+reg_dict = mlx.csv_import(csvFile)
+
+requests = CallCounter(mlx_config, "calc_line_timing")
+scans = CallCounter(mlx_config, "calc_speed")
+mlx.clear_line_timing_cache()
+mlx.calc_fps(reg_dict, mlx75027)
+print("calc_fps() cold: " + str(requests.count) + " line timing requests, " +
+      str(scans.count) + " calc_speed() table scans")
+
+requests.count = 0
+scans.count = 0
+mlx.calc_fps(reg_dict, mlx75027)
+print("calc_fps() warm: " + str(requests.count) + " line timing requests, " +
+      str(scans.count) + " calc_speed() table scans")
+requests.restore()
+scans.restore()
+
+
+def uncached_fps():
+    mlx.clear_line_timing_cache()
+    mlx.calc_fps(reg_dict, mlx75027)
+
+
+t_warm = timeit.timeit(lambda: mlx.calc_fps(
+    reg_dict, mlx75027), number=nloops)
+t_cold = timeit.timeit(uncached_fps, number=nloops)
+print("calc_fps() cold cache: {:8.1f} us per call".format(1e6*t_cold/nloops))
+print("calc_fps() warm cache: {:8.1f} us per call".format(1e6*t_warm/nloops))
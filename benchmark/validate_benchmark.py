@@ -0,0 +1,48 @@
+"""
+Compares checking a configuration with the original per field loop of
+check_reg_dict(), against validate_reg_dict() of a reg_dict, and of a
+RegisterMap which only checks the fields written since its last successful check.
+
+Run from the benchmark folder
+
+    python validate_benchmark.py
+"""
+
+import os
+import timeit
+
+import mlx75027_config as mlx
+
+csvFile = os.path.join("..", "mlx75027.csv")
+nloops = 5000
+
+reg_dict = mlx.csv_import(csvFile)
+reg_map = mlx.compile_reg_dict(reg_dict)
+
+
+def loop_check(reg_dict):
+    """ The original check_reg_dict() """
+    for k in reg_dict:
+        val = reg_dict[k][2]
+        if(val >= (2**reg_dict[k][1])):
+            raise ValueError("Size")
+        if val < 0:
+            raise ValueError("Negative register value")
+    return
+
+
+def write_and_check():
+    reg_map["FMOD_HI"][2] = 1
+    mlx.validate_reg_dict(reg_map)
+
+
+tests = [("Loop over the reg_dict", lambda: loop_check(reg_dict)),
+         ("Loop over the RegisterMap", lambda: loop_check(reg_map)),
+         ("validate_reg_dict(reg_dict)", lambda: mlx.validate_reg_dict(reg_dict)),
+         ("validate_reg_dict(reg_map) unchanged", lambda: mlx.validate_reg_dict(reg_map)),
+         ("validate_reg_dict(reg_map) one write", write_and_check)]
+
+print(str(len(reg_dict)) + " fields")
+for name, func in tests:
+    t_check = timeit.timeit(func, number=nloops) / nloops
+    print("{:40s}: {:8.2f} us".format(name, 1e6*t_check))
@@ -90,6 +90,6 @@ if __name__ == "__main__":
         if not infile:
             raise RuntimeError("ERROR: Can not find register map file:")
 
-    reg_dict = mlx.csv_import(infile)
+    reg_dict = mlx.csv_import(infile, compiled=True)
     app = EPC660_reg_viewer(root, reg_dict)
     root.mainloop()
@@ -24,6 +24,7 @@ from tkinter import messagebox
 
 from ToFSensorConfiguration import RegisterViewer
 from ToFSensorConfiguration import BaseROIViewer
+from ToFSensorConfiguration import RecomputeScheduler
 from ToFSensorConfiguration import get_entry, update_entry
 import mlx75027_config as mlx
 
@@ -37,6 +38,87 @@ def cal_scale(canvas_size, img_size):
     return scale
 
 
+# The options of the time window
+MIPI_LANES = [2, 4]
+DATA_MODES = ["a-b", "a+b", "a", "b", "a&b"]
+MOD_MODES = ["Modulation", "Undefined", "Static Low", "Static Hi"]
+PHI_SHIFTS = [0, 45, 90, 135, 180, 225, 270, 315]
+
+
+def apply_time_inputs(reg_dict, inputs, mlx75027):
+    """ Sets the registers from the inputs of the time window, in the order the settings depend on each other """
+    reg_dict["DATA_LANE_CONFIG"][2] = MIPI_LANES.index(inputs["lane"])
+    reg_dict["OUTPUT_MODE"][2] = DATA_MODES.index(inputs["mode"])
+    # Now update HMAX for the request speed.
+    hmax = mlx.calc_hmax(reg_dict, mlx75027, speed=inputs["speed"])
+    mlx.set_hmax(reg_dict, hmax)
+
+    mlx.set_nraw(reg_dict, inputs["nraw"])
+    mlx.set_mod_freq(reg_dict, inputs["fmod"])
+    mlx.set_duty_cycle(reg_dict, inputs["duty_cycle"])
+
+    mlx.set_startup_time(reg_dict, inputs["startup_time"], mlx75027)
+    mlx.set_deadtime(reg_dict, inputs["dead_time"], mlx75027)
+    mlx.set_pretime(reg_dict, inputs["pre_time"], mlx75027)
+
+    heat_all = np.uint8(0)
+    mix_all = np.uint8(0)
+    leden_all = np.uint8(0)
+    for n in range(0, 8):
+        heat_all = heat_all | np.uint8(inputs["preheat"][n] << n)
+        mix_all = mix_all | np.uint8(inputs["premix"][n] << n)
+        leden_all = leden_all | (inputs["leden"][n] << n)
+
+        for name, key in [("_DMIX0", "dmix0"), ("_DMIX1", "dmix1"), ("_STATIC_LED", "static_led")]:
+            if inputs[key][n] in MOD_MODES:
+                reg_dict["P"+str(n+1)+name][2] = MOD_MODES.index(inputs[key][n])
+
+        reg_dict["P" + str(n)+"_PHASE_SHIFT"][2] = PHI_SHIFTS.index(inputs["phase_shift"][n])
+
+    reg_dict["Px_PREHEAT"][2] = heat_all
+    reg_dict["Px_PREMIX"][2] = mix_all
+    reg_dict["Px_LEDEN"][2] = leden_all
+
+    mlx.set_int_times(reg_dict, np.array(inputs["int_times"]), mlx75027)
+
+    # Update these values from the hmax selected.
+    reg_dict["PLLSSETUP"][2] = np.uint8(mlx.calc_pll_setup(reg_dict, mlx75027))
+    return
+
+
+def calc_time_values(reg_dict, mlx75027):
+    """ Returns the values the time window shows """
+    values = {"speed": mlx.calc_speed(reg_dict, mlx75027),
+              "lane": MIPI_LANES[reg_dict["DATA_LANE_CONFIG"][2]],
+              "mode": DATA_MODES[reg_dict["OUTPUT_MODE"][2]],
+              "nraw": mlx.calc_nraw(reg_dict),
+              "fmod": mlx.calc_mod_freq(reg_dict),
+              "duty_cycle": mlx.calc_duty_cycle(reg_dict),
+              "startup_time": mlx.calc_startup_time(reg_dict, mlx75027),
+              "dead_time": mlx.calc_deadtime(reg_dict, mlx75027),
+              "pre_time": mlx.calc_pretime(reg_dict, mlx75027),
+              "int_times": list(mlx.calc_int_times(reg_dict)),
+              "pretimes": list(mlx.calc_all_pretimes(reg_dict, mlx75027)),
+              "idle_times": list(mlx.calc_idle_time(reg_dict, mlx75027)),
+              "frame_time": mlx.calc_frame_time(reg_dict, mlx75027),
+              "depth_fps": mlx.calc_fps(reg_dict, mlx75027)[0]}
+    values["preheat"] = [(reg_dict["Px_PREHEAT"][2] >> n) & 1 for n in range(0, 8)]
+    values["premix"] = [(reg_dict["Px_PREMIX"][2] >> n) & 1 for n in range(0, 8)]
+    values["leden"] = [(reg_dict["Px_LEDEN"][2] >> n) & 1 for n in range(0, 8)]
+    for name, key in [("_DMIX0", "dmix0"), ("_DMIX1", "dmix1"), ("_STATIC_LED", "static_led")]:
+        values[key] = [MOD_MODES[reg_dict["P"+str(n+1)+name][2]] for n in range(0, 8)]
+    values["phase_shift"] = [PHI_SHIFTS[reg_dict["P"+str(n)+"_PHASE_SHIFT"][2]]
+                             for n in range(0, 8)]
+    return values
+
+
+def calc_time_config(inputs, mlx75027):
+    """ Applies the inputs to a copy of the registers, returns the registers and the values to show """
+    reg_dict = inputs["reg_dict"]
+    apply_time_inputs(reg_dict, inputs, mlx75027)
+    return reg_dict, calc_time_values(reg_dict, mlx75027)
+
+
 class MLX75027TimeViewer(tk.Toplevel):
     def __init__(self, master, reg_dict, mlx75027):
         # We want to do the timing stuff here
@@ -109,13 +191,12 @@ class MLX75027TimeViewer(tk.Toplevel):
         self.duty_cycle_entry = tk.Entry(self.master, bd=3)
         self.duty_cycle_entry.grid(row=row_ind, column=6, sticky=tk.W+tk.E)
 
-        self.set_nraw()
         row_ind += 1
 
         # We want the MIPI speed, MIPI number of lanes and output Data type
         self.speed_list = [300, 600, 704, 800, 960]
-        self.mipi_lanes = [2, 4]
-        self.data_modes = ["a-b", "a+b", "a", "b", "a&b"]
+        self.mipi_lanes = MIPI_LANES
+        self.data_modes = DATA_MODES
 
         self.speed_text = tk.Label(self.master, text="MIPI Speed:")
         self.speed_text.grid(row=row_ind, column=1, sticky=tk.E)
@@ -141,8 +222,6 @@ class MLX75027TimeViewer(tk.Toplevel):
             self.master, self.mode_var, *self.data_modes)
         self.mode_opt.grid(row=row_ind, column=6, sticky=tk.W+tk.E)
 
-        self.set_mipi()
-
         # Canvas for Chronoptics Logo
         self.resize_ratio = 0.2
         self.ruru_size = [1909, 575]
@@ -229,10 +308,10 @@ class MLX75027TimeViewer(tk.Toplevel):
         self.illum_checks = []
         self.illum_vars = []
 
-        self.mod_modes = ["Modulation", "Undefined", "Static Low", "Static Hi"]
+        self.mod_modes = MOD_MODES
         mod_modes = ["Modulation", "Static Low", "Static Hi"]
 
-        phi_shifts = [0, 45, 90, 135, 180, 225, 270, 315]
+        phi_shifts = PHI_SHIFTS
         self.phi_shifts = phi_shifts
 
         self.dmix0_vars = []
@@ -254,7 +333,7 @@ class MLX75027TimeViewer(tk.Toplevel):
             preheat_check = tk.Checkbutton(self.master,
                                            text="enable",
                                            variable=preheat_var,
-                                           command=self.update_can)
+                                           command=self.request_update)
             preheat_check.grid(row=row_ind, column=2, sticky=tk.E+tk.W)
             self.preheat_checks.append(preheat_check)
             self.preheat_vars.append(preheat_var)
@@ -263,7 +342,7 @@ class MLX75027TimeViewer(tk.Toplevel):
             premix_check = tk.Checkbutton(self.master,
                                           text="enable",
                                           variable=premix_var,
-                                          command=self.update_can)
+                                          command=self.request_update)
             premix_check.grid(row=row_ind, column=3, sticky=tk.E+tk.W)
             self.premix_checks.append(premix_check)
             self.premix_vars.append(premix_var)
@@ -284,7 +363,7 @@ class MLX75027TimeViewer(tk.Toplevel):
             illum_check = tk.Checkbutton(self.master,
                                          text="LED Pulse",
                                          variable=illum_var,
-                                         command=self.update_can)
+                                         command=self.request_update)
             illum_check.grid(row=row_ind, column=7, sticky=tk.W+tk.E)
 
             self.illum_checks.append(illum_check)
@@ -336,8 +415,23 @@ class MLX75027TimeViewer(tk.Toplevel):
         self.frame_fps_entry = tk.Entry(self.master, bd=3)
         self.frame_fps_entry.grid(row=row_ind, column=3, sticky=tk.W+tk.E)
 
-        self.set_frame()
-
+        # The timing is recomputed on a worker thread once the edits stop
+        self._showing = False
+        self._read_texts = {}
+        self.scheduler = RecomputeScheduler(self.master, self.read_inputs,
+                                            lambda inputs: calc_time_config(
+                                                inputs, self._mlx75027),
+                                            self.apply_result, self.show_error)
+        self.input_entries = [self.fmod_entry, self.duty_cycle_entry, self.frame_startup_entry,
+                              self.pretime_entry, self.frame_dead_entry] + self.inttime_entrys
+        for entry in self.input_entries:
+            entry.bind("<Return>", self.request_update)
+            entry.bind("<FocusOut>", self.request_update)
+        for var in [self.nraw_var, self.speed_var, self.lane_var, self.mode_var] + self.dmix0_vars + \
+                self.dmix1_vars + self.led_vars + self.phi_vars:
+            var.trace_add("write", self.request_update)
+
+        self.show_values(calc_time_values(self.reg_dict, self._mlx75027))
         self.update_can()
 
         row_ind += 1
@@ -371,204 +465,99 @@ class MLX75027TimeViewer(tk.Toplevel):
             xOffset-cords[0]), int(yOffset-cords[1]))
         return
 
-    def get_nraw(self):
-        nraw = int(float(self.nraw_var.get()))
-        mlx.set_nraw(self.reg_dict, nraw)
-        fmod = get_entry(self.fmod_entry, 4.0, 100.0)
-        mlx.set_mod_freq(self.reg_dict, fmod)
-        mlx.set_duty_cycle(self.reg_dict, get_entry(
-            self.duty_cycle_entry, 0.0, 1.0))
-        return
-
-    def set_nraw(self):
-        nraw = mlx.calc_nraw(self.reg_dict)
-        self.nraw_var.set(nraw)
-        fmod = mlx.calc_mod_freq(self.reg_dict)
-        update_entry(self.fmod_entry, fmod)
-        update_entry(self.duty_cycle_entry,
-                     mlx.calc_duty_cycle(self.reg_dict))
+    def read_inputs(self):
+        """ Reads the widgets, raises ValueError if an entry is invalid """
+        self._read_texts = {entry: entry.get() for entry in self.input_entries}
+        return {"reg_dict": copy.deepcopy(self.reg_dict),
+                "lane": int(self.lane_var.get()),
+                "speed": int(self.speed_var.get()),
+                "mode": self.mode_var.get(),
+                "nraw": int(float(self.nraw_var.get())),
+                "fmod": get_entry(self.fmod_entry, 4.0, 100.0),
+                "duty_cycle": get_entry(self.duty_cycle_entry, 0.0, 1.0),
+                "startup_time": get_entry(self.frame_startup_entry, 0, 2**32),
+                "dead_time": get_entry(self.frame_dead_entry, 0, 2**32),
+                "pre_time": get_entry(self.pretime_entry, 0, 2**32),
+                "int_times": [get_entry(entry, 0, 2**32) for entry in self.inttime_entrys],
+                "preheat": [int(var.get()) for var in self.preheat_vars],
+                "premix": [int(var.get()) for var in self.premix_vars],
+                "leden": [int(var.get()) for var in self.illum_vars],
+                "dmix0": [var.get() for var in self.dmix0_vars],
+                "dmix1": [var.get() for var in self.dmix1_vars],
+                "static_led": [var.get() for var in self.led_vars],
+                "phase_shift": [int(float(var.get())) for var in self.phi_vars]}
+
+    def show_entry(self, entry, value, disable=False):
+        # Only a changed entry is updated, and an entry edited since the inputs were read is kept
+        state = "disabled" if disable else "normal"
+        if entry.get() == str(value) and str(entry.cget("state")) == state:
+            return
+        if entry in self._read_texts and entry.get() != self._read_texts[entry]:
+            return
+        update_entry(entry, value, disable=disable)
         return
 
-    def set_frame(self):
-        update_entry(self.frame_startup_entry,
-                     mlx.calc_startup_time(self.reg_dict, self._mlx75027))
-        update_entry(self.frame_dead_entry,
-                     mlx.calc_deadtime(self.reg_dict, self._mlx75027))
-        update_entry(self.pretime_entry, mlx.calc_pretime(
-            self.reg_dict, self._mlx75027))
-
-        int_times = mlx.calc_int_times(self.reg_dict)
-        pretimes = mlx.calc_all_pretimes(self.reg_dict, self._mlx75027)
-        idle_times = mlx.calc_idle_time(self.reg_dict, self._mlx75027)
-        for n in range(0, 8):
-            if (n+1) > mlx.calc_nraw(self.reg_dict):
-                disable = True
-            else:
-                disable = False
-
-            update_entry(
-                self.inttime_entrys[n], int_times[n], disable=disable)
-            update_entry(
-                self.pretime_entrys[n], pretimes[n], disable=True)
-
-            heat = self.reg_dict["Px_PREHEAT"][2] & (1 << n)
-            if heat:
-                self.preheat_vars[n].set(1)
-            else:
-                self.preheat_vars[n].set(0)
-
-            mix = self.reg_dict["Px_PREMIX"][2] & (1 << n)
-            if mix:
-                self.premix_vars[n].set(1)
-            else:
-                self.premix_vars[n].set(0)
-
-            led = self.reg_dict["Px_LEDEN"][2] & (1 << n)
-            if led:
-                self.illum_vars[n].set(1)
-            else:
-                self.illum_vars[n].set(0)
-
-            dmix0 = self.reg_dict["P"+str(n+1)+"_DMIX0"][2]
-            self.dmix0_vars[n].set(self.mod_modes[dmix0])
-
-            dmix1 = self.reg_dict["P"+str(n+1)+"_DMIX1"][2]
-            self.dmix1_vars[n].set(self.mod_modes[dmix1])
-
-            ledmod = self.reg_dict["P"+str(n+1)+"_STATIC_LED"][2]
-            self.led_vars[n].set(self.mod_modes[ledmod])
-
-            self.phi_vars[n].set(
-                self.phi_shifts[self.reg_dict["P"+str(n)+"_PHASE_SHIFT"][2]])
-
-            update_entry(self.idle_entrys[n], idle_times[n])
-
-        frame_time = mlx.calc_frame_time(self.reg_dict, self._mlx75027)
-        depth_fps, raw_fps = mlx.calc_fps(self.reg_dict, self._mlx75027)
-
-        update_entry(self.frame_fps_entry, depth_fps, disable=True)
-        update_entry(self.frame_time_entry, frame_time, disable=True)
-
+    def show_var(self, var, value):
+        if str(var.get()) != str(value):
+            var.set(value)
         return
 
-    def get_frame(self):
-        startup_time = get_entry(self.frame_startup_entry, 0, 2**32)
-        mlx.set_startup_time(self.reg_dict, startup_time, self._mlx75027)
-
-        dead_time = get_entry(self.frame_dead_entry, 0, 2**32)
-        mlx.set_deadtime(self.reg_dict, dead_time, self._mlx75027)
-
-        pre_time = get_entry(self.pretime_entry, 0, 2**32)
-        mlx.set_pretime(self.reg_dict, pre_time, self._mlx75027)
-
-        heat_all = np.uint8(0)
-        mix_all = np.uint8(0)
-        leden_all = np.uint8(0)
-
-        int_times = np.zeros(8)
-        for n in range(0, 8):
-            int_times[n] = get_entry(self.inttime_entrys[n], 0, 2**32)
-
-            heat = int(self.preheat_vars[n].get()) << n
-            heat_all = heat_all | np.uint8(heat)
-
-            mix = int(self.premix_vars[n].get()) << n
-            mix_all = mix_all | np.uint8(mix)
-
-            led = int(self.illum_vars[n].get()) << n
-            leden_all = leden_all | led
-
-            if self.dmix0_vars[n].get() == "Modulation":
-                self.reg_dict["P"+str(n+1)+"_DMIX0"][2] = 0
-            elif self.dmix0_vars[n].get() == "Static Hi":
-                self.reg_dict["P"+str(n+1)+"_DMIX0"][2] = 3
-            elif self.dmix0_vars[n].get() == "Static Low":
-                self.reg_dict["P"+str(n+1)+"_DMIX0"][2] = 2
-
-            if self.dmix1_vars[n].get() == "Modulation":
-                self.reg_dict["P"+str(n+1)+"_DMIX1"][2] = 0
-            elif self.dmix1_vars[n].get() == "Static Hi":
-                self.reg_dict["P"+str(n+1)+"_DMIX1"][2] = 3
-            elif self.dmix1_vars[n].get() == "Static Low":
-                self.reg_dict["P"+str(n+1)+"_DMIX1"][2] = 2
-
-            if self.led_vars[n].get() == "Modulation":
-                self.reg_dict["P"+str(n+1)+"_STATIC_LED"][2] = 0
-            elif self.led_vars[n].get() == "Static Hi":
-                self.reg_dict["P"+str(n+1)+"_STATIC_LED"][2] = 3
-            elif self.led_vars[n].get() == "Static Low":
-                self.reg_dict["P"+str(n+1)+"_STATIC_LED"][2] = 2
-
-            px = int(float(self.phi_vars[n].get()))
-
-            self.reg_dict["P" +
-                          str(n)+"_PHASE_SHIFT"][2] = self.phi_shifts.index(px)
-
-        self.reg_dict["Px_PREHEAT"][2] = heat_all
-        self.reg_dict["Px_PREMIX"][2] = mix_all
-        self.reg_dict["Px_LEDEN"][2] = leden_all
-
-        mlx.set_int_times(self.reg_dict, int_times, self._mlx75027)
-
+    def show_values(self, values):
+        """ Updates the widgets whose values changed """
+        # Setting the option menus must not request another update
+        self._showing = True
+        try:
+            self.show_var(self.speed_var, values["speed"])
+            self.show_var(self.lane_var, values["lane"])
+            self.show_var(self.mode_var, values["mode"])
+            self.show_var(self.nraw_var, values["nraw"])
+            self.show_entry(self.fmod_entry, values["fmod"])
+            self.show_entry(self.duty_cycle_entry, values["duty_cycle"])
+
+            self.show_entry(self.frame_startup_entry, values["startup_time"])
+            self.show_entry(self.frame_dead_entry, values["dead_time"])
+            self.show_entry(self.pretime_entry, values["pre_time"])
+            for n in range(0, 8):
+                self.show_entry(self.inttime_entrys[n], values["int_times"][n],
+                                disable=(n+1) > values["nraw"])
+                self.show_entry(self.pretime_entrys[n], values["pretimes"][n], disable=True)
+                self.show_entry(self.idle_entrys[n], values["idle_times"][n])
+                self.show_var(self.preheat_vars[n], values["preheat"][n])
+                self.show_var(self.premix_vars[n], values["premix"][n])
+                self.show_var(self.illum_vars[n], values["leden"][n])
+                self.show_var(self.dmix0_vars[n], values["dmix0"][n])
+                self.show_var(self.dmix1_vars[n], values["dmix1"][n])
+                self.show_var(self.led_vars[n], values["static_led"][n])
+                self.show_var(self.phi_vars[n], values["phase_shift"][n])
+
+            self.show_entry(self.frame_fps_entry, values["depth_fps"], disable=True)
+            self.show_entry(self.frame_time_entry, values["frame_time"], disable=True)
+        finally:
+            self._showing = False
         return
 
-    def set_mipi(self):
-        # Update the MIPI display
-        speed = mlx.calc_speed(self.reg_dict, self._mlx75027)
-        lane_ind = self.reg_dict["DATA_LANE_CONFIG"][2]
-        mode_ind = self.reg_dict["OUTPUT_MODE"][2]
-
-        self.lane_var.set(self.mipi_lanes[lane_ind])
-        self.speed_var.set(speed)
-        self.mode_var.set(self.data_modes[mode_ind])
+    def apply_result(self, result):
+        self.reg_dict, values = result
+        self.show_values(values)
         return
 
-    def get_mipi(self):
-        lane = int(self.lane_var.get())
-        speed = int(self.speed_var.get())
-        mode = self.mode_var.get()
-
-        self.reg_dict["DATA_LANE_CONFIG"][2] = self.mipi_lanes.index(lane)
-        self.reg_dict["OUTPUT_MODE"][2] = self.data_modes.index(mode)
-        # Now update HMAX for the request speed.
-        hmax = mlx.calc_hmax(self.reg_dict, self._mlx75027, speed=speed)
-        #print("get_mipi() hmax: " + str(hmax) + " speed: " + str(speed))
-        mlx.set_hmax(self.reg_dict, hmax)
-
+    def show_error(self, error):
+        messagebox.showwarning("Time Configure", str(error))
         return
 
-    def get_updates(self):
-        pll_setup = mlx.calc_pll_setup(self.reg_dict, self._mlx75027)
-        """
-        pix_rst = mlx.calc_pretime(self.reg_dict)
-        randnm7 = mlx.calc_randnm7(self.reg_dict)
-        randnm0 = mlx.calc_randnm0(self.reg_dict)
-        """
-        # Update these values from the hmax selected.
-        self.reg_dict["PLLSSETUP"][2] = np.uint8(pll_setup)
-        """
-        mlx.value16_to_reg(self.reg_dict, pix_rst,
-                           "Px_PRETIME_HI", "Px_PRETIME_LOW")
-        
-        mlx.value24_to_reg(self.reg_dict, randnm0, "RANDNM0_0",
-                           "RANDNM0_1", "RANDNM0_2")
-        mlx.value24_to_reg(self.reg_dict, randnm7, "RANDNM7_0",
-                           "RANDNM7_1", "RANDNM7_2")
-        """
+    def request_update(self, *args):
+        if not self._showing:
+            self.scheduler.request()
         return
 
     def update_can(self):
-        self.get_mipi()
-        self.get_nraw()
-        self.get_frame()
-        self.get_updates()
-
-        #
-        self.set_mipi()
-        self.set_nraw()
-        self.set_frame()
+        """ Recomputes the timing now """
+        self.scheduler.run_now()
+        return
 
     def gui_exit(self):
+        # The edits not yet computed are applied before closing
+        self.scheduler.run_now()
         self.master.destroy()
         return
 
@@ -716,70 +705,10 @@ class MLX75027ROIViewer(BaseROIViewer, tk.Toplevel):
         #print("col_start: " + str(col_start) + " col_end: " + str(col_end))
         #print("row_start: " + str(row_start) + " row_end: " + str(row_end))
         bin_mode = self.reg_dict["BINNING_MODE"][2]
-        nrows = (row_end - row_start) + 1
-        ncols = (col_end - col_start) + 1
-
-        # XXX : Clean up this fuck up.
-        if bin_mode == 0:
-            if (ncols < 8):
-                # We want to force the minimum ROI
-                col_end = col_start + 7
-                ncols = 8
-            if (nrows < 2):
-                # Force the minimum ROI
-                row_end = row_start + 1
-                nrows = 2
-            # x4 in cols
-            col_inc = ncols % 4
-            col_end -= col_inc
-            # x2 in rows
-            row_inc = nrows % 2
-            row_end -= row_inc
-        elif bin_mode == 1:
-            if (ncols < 16):
-                col_end = col_start + 15
-                ncols = 16
-            if nrows < 2:
-                row_end = row_start + 1
-                nrows = 2
-            col_inc = ncols % 8
-            col_end -= col_inc
-            ncols -= col_inc
-            row_inc = nrows % 2
-            row_end -= row_inc
-            nrows -= row_inc
-            nrows = int(nrows/2)
-            ncols = int(ncols/2)
-        elif bin_mode == 2:
-            if ncols < 32:
-                col_end = col_start + 31
-                ncols = 32
-            if nrows < 4:
-                row_end = row_start + 3
-                nrows = 4
-            col_inc = ncols % 16
-            col_end -= col_inc
-            ncols -= col_inc
-            row_inc = nrows % 4
-            row_end -= row_inc
-            nrows -= row_inc
-            nrows = int(nrows/4)
-            ncols = int(ncols/4)
-        elif bin_mode == 3:
-            if ncols < 64:
-                col_end = col_start + 63
-                ncols = 64
-            if nrows < 8:
-                row_end = row_start + 7
-                nrows = 8
-            col_inc = ncols % 32
-            col_end -= col_inc
-            ncols -= col_inc
-            row_inc = nrows % 8
-            row_end -= row_inc
-            nrows -= row_inc
-            nrows = int(nrows/8)
-            ncols = int(ncols/8)
+        roi = mlx.snap_roi(col_start, col_end, row_start,
+                           row_end, bin_mode, self._mlx75027)
+        col_start, col_end, row_start, row_end, ncols, nrows = [
+            int(v) for v in roi]
 
         # Update the start and end values based on our new values
         mlx.set_roi(self.reg_dict, col_start, col_end,
@@ -957,6 +886,6 @@ if __name__ == "__main__":
         if not infile:
             raise RuntimeError("ERROR: Can not find register map file:")
 
-    reg_dict = mlx.csv_import(infile)
+    reg_dict = mlx.csv_import(infile, compiled=True)
     app = MLX75027_reg_viewer(root, reg_dict, mlx75027)
     root.mainloop()
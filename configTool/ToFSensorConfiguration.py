@@ -12,10 +12,13 @@ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLI
 
 import platform
 import copy
+import queue
+import threading
 
 import tkinter as tk
 from tkinter import filedialog
 from tkinter import messagebox
+from tkinter import ttk
 
 import mlx75027_config as mlx
 
@@ -47,6 +50,122 @@ def get_entry(entry, min_val, max_val):
     return value
 
 
+class RecomputeScheduler:
+    """
+    Debounces the recompute requests of a window, runs the computation on a
+    worker thread and applies its result on the Tk thread. One computation runs
+    at a time, the requests made while it runs start one more with the latest inputs.
+
+    Parameters
+    ----------
+    widget : tk.Widget
+        The widget whose after() schedules the callbacks
+    read_inputs : callable
+        Reads the widgets on the Tk thread, raises ValueError if an input is invalid
+    compute : callable
+        Called as compute(inputs) on the worker thread, it must not use any widget
+    apply : callable
+        Called as apply(result) on the Tk thread
+    on_error : callable
+        Called as on_error(error) on the Tk thread when compute raises
+    delay_ms : int, optional
+        The time without a request before the computation starts
+    """
+
+    def __init__(self, widget, read_inputs, compute, apply, on_error, delay_ms=250, poll_ms=20):
+        self.widget = widget
+        self.read_inputs = read_inputs
+        self.compute = compute
+        self.apply = apply
+        self.on_error = on_error
+        self.delay_ms = delay_ms
+        self.poll_ms = poll_ms
+
+        self._after_id = None
+        self._poll_id = None
+        self._thread = None
+        self._pending = False
+        self._results = queue.Queue()
+        return
+
+    def request(self, *args):
+        """ Starts a computation once there has been no request for delay_ms, the args of Tk callbacks are ignored """
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+        self._after_id = self.widget.after(self.delay_ms, self._start)
+        return
+
+    def run_now(self):
+        """ Computes on the Tk thread, discarding any requested or running computation """
+        self.cancel()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self._results = queue.Queue()
+        try:
+            inputs = self.read_inputs()
+        except ValueError:
+            return False
+        self._deliver(*self._run(inputs))
+        return True
+
+    def cancel(self):
+        """ Cancels the requested computation, a running computation is not applied """
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        if self._poll_id is not None:
+            self.widget.after_cancel(self._poll_id)
+            self._poll_id = None
+        self._pending = False
+        return
+
+    def _start(self):
+        self._after_id = None
+        if self._thread is not None:
+            self._pending = True
+            return
+        try:
+            inputs = self.read_inputs()
+        except ValueError:
+            # The invalid entries are already marked
+            return
+        self._thread = threading.Thread(
+            target=lambda: self._results.put(self._run(inputs)), daemon=True)
+        self._thread.start()
+        self._poll_id = self.widget.after(self.poll_ms, self._poll)
+        return
+
+    def _run(self, inputs):
+        try:
+            return self.compute(inputs), None
+        except Exception as err:
+            # Reported on the Tk thread, a worker that raised would never deliver its result
+            return None, err
+
+    def _poll(self):
+        self._poll_id = None
+        try:
+            result, error = self._results.get_nowait()
+        except queue.Empty:
+            self._poll_id = self.widget.after(self.poll_ms, self._poll)
+            return
+        self._thread.join()
+        self._thread = None
+        self._deliver(result, error)
+        if self._pending:
+            self._pending = False
+            self._start()
+        return
+
+    def _deliver(self, result, error):
+        if error is not None:
+            self.on_error(error)
+        else:
+            self.apply(result)
+        return
+
+
 class ResizingCanvas(tk.Canvas):
     def __init__(self, parent, **kwargs):
         tk.Canvas.__init__(self, parent, **kwargs)
@@ -86,84 +205,104 @@ class RegisterViewer(tk.Toplevel):
                             "mclk": mclk,
                             "registers": mlx.dict_to_registers(self._reg_dict),
                             "checksum": 0}
-        self.can = tk.Canvas(self.master)
-        self.can.grid(row=0, column=0, rowspan=12, sticky=tk.W+tk.E+tk.N+tk.S)
-
-        self.scrollbar = tk.Scrollbar(self.master, command=self.can.yview)
-        self.scrollbar.grid(row=0, column=1, rowspan=11,
+        # The rows are filtered by a search of the register map as it is typed
+        self.search_frame = tk.Frame(self.master)
+        self.search_frame.grid(row=0, column=0, columnspan=2, sticky=tk.W+tk.E)
+        self.search_text = tk.Label(self.search_frame, text="Search")
+        self.search_text.pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(
+            self.search_frame, textvariable=self.search_var)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.search_entry.bind("<Escape>", lambda event: self.search_var.set(""))
+        self.search_var.trace_add("write", lambda *args: self.filter_rows())
+
+        # The fields are rows of a table, which only draws the visible rows
+        self.table = ttk.Treeview(self.master, columns=(
+            "register", "bits", "value", "description"), show="headings", selectmode="browse")
+        self.table.grid(row=1, column=0, rowspan=12,
+                        sticky=tk.W+tk.E+tk.N+tk.S)
+        for column, text, width, stretch in [("register", "Register", 200, False),
+                                             ("bits", "Bits", 60, False),
+                                             ("value", "Value", 90, False),
+                                             ("description", "Description", 500, True)]:
+            self.table.heading(column, text=text)
+            self.table.column(column, width=width, stretch=stretch)
+        self.table.tag_configure("invalid", background="red")
+
+        self.scrollbar = tk.Scrollbar(self.master, command=self.table.yview)
+        self.scrollbar.grid(row=1, column=1, rowspan=12,
                             sticky=tk.E+tk.N+tk.S+tk.W)
-#        self.can.configure(yscrollcommand=self.scrollbar.set)
-        self.can.configure(
-            yscrollcommand=self.scrollbar.set, yscrollincrement=1)
-        self.can.bind("<Configure>", self.on_configure)
+        self._view = None
+        self.table.configure(yscrollcommand=self.on_scroll)
 
-        #self.can.bind_all("<MouseWheel>", self.on_mousewheel)
+        # The full description of the selected field
+        self.desc_text = tk.Text(self.master, height=4, wrap=tk.WORD)
+        self.desc_text.grid(row=13, column=0, columnspan=2,
+                            sticky=tk.W+tk.E)
+        self.desc_text.configure(state="disabled")
 
-        # These are the functions that work on linux, need to update so can also work on windows.
-        if platform.system() == 'Windows' or platform.system() == 'Darwin':
-            self.can.bind_all("<MouseWheel>", self.on_mousewheel)
-        else:
-            self.can.bind_all("<Button-4>", self.on_mousewheel_up)
-            self.can.bind_all("<Button-5>", self.on_mousewheel_down)
-
-        self.frame = tk.Frame(self.can)
-        self.can.create_window((0, 0), window=self.frame, anchor='nw')
-        self.reg_text = tk.Label(
-            self.frame, text="Register", font='Helvetica 12 bold')
-        self.bits_text = tk.Label(
-            self.frame, text="Bits", font='Helvetica 12 bold')
-        #self.prop_text = tk.Label(self.frame,text="Property", font='Helvetica 12 bold')
-        self.desc_text = tk.Label(
-            self.frame, text="Description", font='Helvetica 12 bold')
-        self.val_text = tk.Label(
-            self.frame, text="Value", font='Helvetica 12 bold')
-
-        self.reg_text.grid(row=0, column=0)
-        self.bits_text.grid(row=0, column=1)
-        # self.prop_text.grid(row=0,column=2)
-        self.desc_text.grid(row=0, column=3)
-        self.val_text.grid(row=0, column=4)
-        # How to setup buttons
-        # Is there a way to make this more generic ??
-
-        self.val_entry = []
-        row_ind = 1
-        #reg_cnt = 0
-
-        # This is really fucking slow for large register maps, or some versions of python ...
-        # I think we will have to replace this with a table to increase the speed.
-        for k in reg_dict:
-            reg_txt = tk.Label(self.frame, text=str(k))
-            reg_txt.grid(row=row_ind, column=0)
+        # A value is edited in an entry placed over its cell
+        self._editor = None
+        self._editor_item = None
+        self.table.bind("<Double-1>", self.on_double_click)
+        self.table.bind("<Return>", self.on_return)
+        self.table.bind("<<TreeviewSelect>>", self.on_select)
 
-            bit_str = mlx.calc_bits(reg_dict[k][0], reg_dict[k][1])
-            bit_txt = tk.Label(self.frame, text=bit_str)
-            bit_txt.grid(row=row_ind, column=1, sticky=tk.E)
+        self._names = []
+        self.fill_table()
 
-            desc_txt = tk.Text(self.frame)
-            desc_txt.configure(height=2, wrap=tk.WORD)
-            desc_txt.insert(tk.INSERT, reg_dict[k][3]+reg_dict[k][5])
-            desc_txt.configure(state="disabled")
-            desc_txt.grid(row=row_ind, column=3, sticky=tk.E+tk.W)
+    def gui_exit(self):
+        self.master.destroy()
+        return
 
-            val_txt = tk.Entry(self.frame, bd=3)
-            val_txt.insert(0, str(reg_dict[k][2]))
-            val_txt.grid(row=row_ind, column=4, sticky=tk.E+tk.W)
-            self.val_entry.append(val_txt)
+    def fill_table(self):
+        """ Creates a row for each field of the register map """
+        self.close_editor(commit=False)
+        # The rows hidden by the search are not children of the table
+        self.table.delete(*self._names)
+        self._names = list(self._reg_dict)
+        # The value shown for each field, and the fields edited since the last parse_reg()
+        self._shown = {}
+        self._edited = set()
+        for k in self._names:
+            value = str(int(self._reg_dict[k][2]))
+            bit_str = mlx.calc_bits(self._reg_dict[k][0], self._reg_dict[k][1])
+            desc = " ".join((self._reg_dict[k][3]+self._reg_dict[k][5]).split())
+            self.table.insert("", tk.END, iid=k, values=(k, bit_str, value, desc))
+            self._shown[k] = value
+        self._index = mlx.RegisterIndex(self._reg_dict)
+        self.filter_rows()
+        return
 
-            row_ind += 1
+    def filter_rows(self):
+        """ Shows only the rows matching the search, in the register map order """
+        self.close_editor()
+        self._visible = self._index.query(self.search_var.get())
+        self.table.set_children("", *self._visible)
+        return
 
-    def gui_exit(self):
-        self.master.destroy()
+    def show_row(self, k):
+        """ Scrolls to a row, clearing the search if it hides the row """
+        if k not in self._visible:
+            self.search_var.set("")
+        self.table.see(k)
         return
 
     def update_values(self):
-        ind = 0
-        for k in self._reg_dict:
-            self.val_entry[ind].delete(0, tk.END)
-            self.val_entry[ind].insert(0, str(int(self._reg_dict[k][2])))
-            ind += 1
+        if list(self._reg_dict) != self._names:
+            self.fill_table()
+            return
 
+        # Only the rows whose value changed, or that have an edit, are updated
+        self.close_editor(commit=False)
+        for k in self._names:
+            value = str(int(self._reg_dict[k][2]))
+            if value != self._shown[k] or k in self._edited:
+                self.table.set(k, "value", value)
+                self.table.item(k, tags=())
+                self._shown[k] = value
+        self._edited.clear()
         return
 
     def import_csv(self, import_file=""):
@@ -173,29 +312,46 @@ class RegisterViewer(tk.Toplevel):
             if not import_file:
                 return
 
-        self._reg_dict = mlx.csv_import(import_file)
+        self._reg_dict = mlx.csv_import(import_file, compiled=True)
         self.update_values()
 
         return
 
     def parse_reg(self):
-        ind = 0
-        for k in self._reg_dict:
+        self.close_editor()
+        previous = {}
+        # Only the edited rows are written
+        for k in [k for k in self._names if k in self._edited]:
             try:
-                new_val = int(float(self.val_entry[ind].get()))
-                if(new_val >= (2**self._reg_dict[k][1])):
-                    raise ValueError("Size")
-                if new_val < 0:
-                    raise ValueError("Negative register value")
+                new_val = int(float(self.table.set(k, "value")))
+                previous[k] = self._reg_dict[k][2]
                 self._reg_dict[k][2] = new_val
-            except ValueError:
-                self.val_entry[ind].configure(background="red")
+            except (ValueError, OverflowError):
+                self.table.item(k, tags=("invalid",))
+                self.show_row(k)
                 messagebox.showwarning(
-                    k, k + ": Invalid Value of " + self.val_entry[ind].get())
+                    k, k + ": Invalid Value of " + self.table.set(k, "value"))
                 return -1
-            self.val_entry[ind].configure(background="white")
-            ind += 1
-        return 0
+            self.table.item(k, tags=())
+            self._edited.discard(k)
+            self._shown[k] = str(new_val)
+            self.table.set(k, "value", self._shown[k])
+
+        # Every entry is checked at once, and the invalid values are put back
+        violations = mlx.validate_reg_dict(self._reg_dict)
+        if len(violations) == 0:
+            return 0
+        for violation in violations:
+            k = violation["name"]
+            if k in previous:
+                self._reg_dict[k][2] = previous[k]
+                self._shown[k] = str(int(previous[k]))
+                self._edited.add(k)
+            self.table.item(k, tags=("invalid",))
+        self.show_row(violations[0]["name"])
+        messagebox.showwarning("Invalid Values", "\n".join(
+            v["name"] + ": Invalid Value of " + str(v["value"]) for v in violations))
+        return -1
 
     def export_csv(self):
         val = self.parse_reg()
@@ -223,21 +379,72 @@ class RegisterViewer(tk.Toplevel):
         mlx.csv_export_registers(out_file, self._reg_dict)
         return
 
-    def on_mousewheel_down(self, event):
-        self.can.yview_scroll(1, tk.UNITS)
+    def open_editor(self, item):
+        """ Places an entry over the value cell of a row """
+        self.close_editor()
+        self.show_row(item)
+        self.table.update_idletasks()
+        bbox = self.table.bbox(item, "value")
+        if not bbox:
+            return
+        x, y, width, height = bbox
+        self._editor = tk.Entry(self.table, bd=1)
+        self._editor.insert(0, self.table.set(item, "value"))
+        self._editor.select_range(0, tk.END)
+        self._editor.place(x=x, y=y, width=width, height=height)
+        self._editor.focus_set()
+        self._editor_item = item
+        self._editor.bind("<Return>", lambda event: self.close_editor())
+        self._editor.bind("<KP_Enter>", lambda event: self.close_editor())
+        self._editor.bind("<Escape>", lambda event: self.close_editor(commit=False))
+        self._editor.bind("<FocusOut>", lambda event: self.close_editor())
+        return
+
+    def close_editor(self, commit=True):
+        """ Removes the entry, and puts its text in the row if commit """
+        if self._editor is None:
+            return
+        editor, item = self._editor, self._editor_item
+        # Destroying the entry loses its focus, which calls this again
+        self._editor = None
+        self._editor_item = None
+        text = editor.get().strip()
+        editor.destroy()
+        if commit and text != self.table.set(item, "value"):
+            self.table.set(item, "value", text)
+            self.table.item(item, tags=())
+            self._edited.add(item)
+        self.table.focus_set()
+        return
+
+    def on_double_click(self, event):
+        item = self.table.identify_row(event.y)
+        if item:
+            self.open_editor(item)
         return
 
-    def on_mousewheel_up(self, event):
-        self.can.yview_scroll(-1, tk.UNITS)
+    def on_return(self, event):
+        item = self.table.focus()
+        if item:
+            self.open_editor(item)
         return
 
-    def on_mousewheel(self, event):
-        # XXX : On some versions of python event.delta might need to be divided by 120
-        self.can.yview_scroll(int(-1*(event.delta)), "units")
+    def on_select(self, event):
+        selection = self.table.selection()
+        self.desc_text.configure(state="normal")
+        self.desc_text.delete("1.0", tk.END)
+        if selection:
+            k = selection[0]
+            self.desc_text.insert(tk.INSERT, self._reg_dict[k][3]+self._reg_dict[k][5])
+        self.desc_text.configure(state="disabled")
         return
 
-    def on_configure(self, event):
-        self.can.configure(scrollregion=self.can.bbox('all'))
+    def on_scroll(self, first, last):
+        # The entry does not move with the rows
+        if (first, last) != self._view:
+            self._view = (first, last)
+            self.close_editor()
+        self.scrollbar.set(first, last)
         return
 
 
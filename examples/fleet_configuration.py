@@ -0,0 +1,60 @@
+"""
+Generates the register file of every camera in a units file, across a pool of
+processes, with the settings of example_configuration.py and each camera's own
+calibration settings. Run from the examples folder
+
+    python fleet_configuration.py units.csv output_folder --processes 8
+
+The units file is a CSV file with a Unit column naming each camera, and
+optional ModFreq, IntTime, DutyCycle, AnalogDelay and PhaseOffset columns.
+"""
+
+import argparse
+import os
+
+import mlx75027_config as mlx
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generates the register files of many MLX75027 or MLX75026 cameras")
+    parser.add_argument("units", help="The CSV file of units and their settings")
+    parser.add_argument("out_dir", help="The folder to write the register files to")
+    parser.add_argument("--mlx75026", help="Use the MLX75026 sensor",
+                        action="store_true")
+    parser.add_argument("--csv", help="The CSV register map, defaults to the sensor's",
+                        default=None)
+    parser.add_argument("--processes", help="The number of worker processes",
+                        type=int, default=None)
+    parser.add_argument("--chunksize", help="The number of units sent to a worker at a time",
+                        type=int, default=16)
+    args = parser.parse_args()
+
+    mlx75027 = not args.mlx75026
+    csv_file = args.csv
+    if csv_file is None:
+        csv_file = os.path.join(
+            "..", "mlx75027.csv" if mlx75027 else "mlx75026.csv")
+
+    units = mlx.read_units(args.units)
+    # Report about every 1% of the units
+    step = max(1, len(units) // 100)
+
+    def progress(ndone, nunits, name, unit_time, error):
+        if error is not None:
+            print(name + " failed, " + error)
+        if ndone % step == 0 or ndone == nunits:
+            print("{:d}/{:d} units, last {:.2f} ms".format(ndone,
+                                                           nunits, 1e3*unit_time))
+        return
+
+    metrics = mlx.generate_fleet(csv_file, units, args.out_dir, mlx75027, processes=args.processes,
+                                 chunksize=args.chunksize, progress=progress)
+    print("{:d} units, {:d} failed, {:.2f} s, {:.1f} units/s, mean {:.2f} ms, max {:.2f} ms per unit".format(
+        metrics["units"], metrics["failed"], metrics["total_time"], metrics["units_per_second"],
+        1e3*metrics["mean_unit_time"], 1e3*metrics["max_unit_time"]))
+    return 1 if metrics["failed"] > 0 else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
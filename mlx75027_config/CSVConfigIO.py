@@ -15,15 +15,46 @@ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLI
 import csv
 import os
 
+from mlx75027_config.RegisterMapping import RegisterMap, compile_reg_dict, unpack_registers, _violation
+
+# Increment when csv_import() parses a CSV file differently, invalidating cached register maps
+CSV_PARSER_VERSION = 1
+
+# The number of values of a field of each size in bits
+_SIZE_LIMITS = [1 << size for size in range(0, 65)]
+
+
+def validate_reg_dict(reg_dict):
+    """
+    Checks every value of the register dictionary at once, and reports all the invalid values.
+    A RegisterMap only checks the fields written since its last successful check.
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The dictionary that contains all the register information
+
+    Returns
+    ----------
+    violations : list
+        A dict for each invalid field with its name, value, max_value and the error,
+        "Size" or "Negative register value", in field order. Empty if every value is valid
+    """
+    if isinstance(reg_dict, RegisterMap):
+        return reg_dict.validate()
+
+    # Reading the values out of the lists costs more than the comparisons, so a dict is
+    # checked in a single pass against the precomputed limits
+    limits = _SIZE_LIMITS
+    return [_violation(k, f[2], limits[f[1]] - 1) for k, f in reg_dict.items()
+            if f[2] >= limits[f[1]] or f[2] < 0]
+
 
 def check_reg_dict(reg_dict):
     """ Check the register dictionary to make sure all the values are valid """
-    for k in reg_dict:
-        val = reg_dict[k][2]
-        if(val >= (2**reg_dict[k][1])):
-            raise ValueError("Size")
-        if val < 0:
-            raise ValueError("Negative register value")
+    violations = validate_reg_dict(reg_dict)
+    if len(violations) > 0:
+        raise ValueError(violations[0]["error"])
     return
 
 
@@ -63,6 +94,10 @@ def dict_to_registers(reg_dict):
     ----------
     reg : dict, dictionary where the keys are the register and the values are the register value
     """
+    if isinstance(reg_dict, RegisterMap):
+        # Only re-packs the registers with changed fields
+        return reg_dict.pack_registers()
+
     # We convert a dictionary to the register values
     reg = {}
     check_reg_dict(reg_dict)
@@ -86,12 +121,17 @@ def registers_to_dict(reg_dict, reg):
 
     # We convert a registers to and update an existing dictionary
     check_reg_dict(reg_dict)
+    if isinstance(reg_dict, RegisterMap):
+        # Every field is unpacked at once
+        layout, values = unpack_registers(
+            reg_dict, list(reg.keys()), list(reg.values()))
+        reg_dict.set_values(values)
+        return
+
     for k in reg_dict:
-        mask = (2**(reg_dict[k][1]))-1
-        try:
-            reg_dict[k][2] = (reg[reg_dict[k][4]] >> reg_dict[k][0]) & mask
-        except KeyError:
-            pass
+        value = reg.get(reg_dict[k][4])
+        if value is not None:
+            reg_dict[k][2] = (value >> reg_dict[k][0]) & (_SIZE_LIMITS[reg_dict[k][1]] - 1)
     return
 
 
@@ -106,14 +146,11 @@ def csv_export_registers(outFile, reg_dict):
 
     """
     registers = dict_to_registers(reg_dict)
-    fieldnames = ["Register", "Value"]
+    # The same rows csv.writer writes, formatted in one pass
+    rows = ["0x{:04X},0x{:02X}\r\n".format(reg, value)
+            for reg, value in registers.items()]
     with open(outFile, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for reg in registers:
-            row_dict = {"Register": "0x{:04X}".format(
-                reg), "Value": "0x{:02X}".format(registers[reg])}
-            writer.writerow(row_dict)
+        csvfile.write("Register,Value\r\n" + "".join(rows))
     return
 
 
@@ -132,24 +169,16 @@ def csv_export(outFile, reg_dict):
         # Write the headers.
         fieldnames = ["Section", "RegisterNumber", "Bits",
                       "Property", "Description", "ValueMeaning", "Value"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for reg in reg_dict.keys():
-
-            bits = calc_bits(reg_dict[reg][0], reg_dict[reg][1])
-            row_dict = {
-                "Property": reg,
-                "Value": reg_dict[reg][2],
-                "RegisterNumber": "0x{:04X}".format((reg_dict[reg][4])),
-                "Bits": bits,
-                "ValueMeaning":  reg_dict[reg][5],
-                "Description": reg_dict[reg][3],
-                "Section": reg_dict[reg][6]}
-            writer.writerow(row_dict)
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        # The rows are lists in the order of the fieldnames, written at once
+        writer.writerows([[field[6], "0x{:04X}".format(field[4]), calc_bits(field[0], field[1]),
+                           reg, field[3], field[5], field[2]]
+                          for reg, field in reg_dict.items()])
     return
 
 
-def csv_import(infile):
+def csv_import(infile, compiled=False, cache=None):
     """
     Export the csv file and configuration. 
 
@@ -157,13 +186,20 @@ def csv_import(infile):
     ----------
     infile : str 
         The CSV file to read from 
+    compiled : bool, optional
+        Set to True to return a RegisterMap instead of a dict
+    cache : CSVCache, optional
+        Load the parsed CSV file from the cache, parsing and adding it to the cache if it is not there
 
     Returns
     ----------
-    reg_dict : dict 
+    reg_dict : dict or RegisterMap
         The dictionary of everything 
     """
 
+    if cache is not None:
+        return cache.load(infile, compiled)
+
     reg_dict = {}
     translation_table = dict.fromkeys(map(ord, '[]'), None)
 
@@ -204,4 +240,6 @@ def csv_import(infile):
     # A sanity check
     check_reg_dict(reg_dict)
 
+    if compiled:
+        return compile_reg_dict(reg_dict)
     return reg_dict
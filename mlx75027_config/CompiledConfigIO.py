@@ -0,0 +1,254 @@
+"""
+Refael Whyte, r.whyte@chronoptics.com
+
+Reads and writes register maps in a compiled binary format, so a configuration
+can be loaded by memory mapping the file instead of parsing the CSV file. The
+CSV file remains the source format, csv_to_compiled() and compiled_to_csv()
+convert between the two.
+
+The compiled file is little endian and contains, in order
+
+    * the header, the magic, format version, number of fields, section offsets, the CRC32
+      checksum of the rest of the file and the CRC32 checksum of the tables and values
+    * the field table, the address, bit offset and bit size of each field
+    * the value of each field as an int64
+    * the string index, the end of each name, description, value meaning and section string
+    * the UTF-8 strings
+
+The descriptions, value meanings and sections are only decoded when they are read.
+The tables checksum covers the header, the field table, the values and the
+string index, so a load checks the structure and the register values of the
+file without reading all the strings.
+
+Copyright 2020 Refael Whyte - Chronoptics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from collections.abc import Sequence
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from mlx75027_config.CSVConfigIO import csv_import, csv_export
+from mlx75027_config.RegisterMapping import RegisterLayout, RegisterMap, compile_reg_dict
+
+COMPILED_MAGIC = b"MLXREGS\0"
+COMPILED_VERSION = 3
+
+# magic, version, header size, number of fields, field table, values, string index and strings offsets
+_HEADER_PREFIX = struct.Struct("<8sHHIIIII")
+# the file checksum and the tables and values checksum
+_CHECKSUMS = struct.Struct("<II")
+_HEADER = struct.Struct("<8sHHIIIIIII")
+_HEADER_SIZE = 48
+_FIELD_DTYPE = np.dtype([("address", "<u4"), ("offset", "u1"),
+                         ("size", "u1"), ("reserved", "<u2")])
+_VALUE_DTYPE = np.dtype("<i8")
+_INDEX_DTYPE = np.dtype("<u4")
+
+# The strings of each field, stored one kind after the other
+_NAMES = 0
+_DESCRIPTIONS = 1
+_VALUE_MEANINGS = 2
+_SECTIONS = 3
+
+
+class CompiledStrings(Sequence):
+    """
+    A read only sequence of strings, decoded from the compiled file when they are read.
+
+    Parameters
+    ----------
+    ends : np.array
+        The end of each string in the data, starting with the start of the first string
+    data : memoryview
+        The UTF-8 encoded strings
+    """
+
+    def __init__(self, ends, data):
+        self._ends = ends
+        self._data = data
+        return
+
+    def __len__(self):
+        return self._ends.size - 1
+
+    def __getitem__(self, ind):
+        if isinstance(ind, slice):
+            return [self[n] for n in range(*ind.indices(len(self)))]
+        if ind < 0:
+            ind += len(self)
+        if ind < 0 or ind >= len(self):
+            raise IndexError("String index out of range")
+        start = self._ends.item(ind)
+        end = self._ends.item(ind + 1)
+        return str(self._data[start:end], "utf-8")
+
+    def __iter__(self):
+        # Decodes all the strings from a single copy of their data
+        ends = self._ends.tolist()
+        data = bytes(self._data[ends[0]:ends[-1]])
+        starts = [end - ends[0] for end in ends]
+        for n in range(0, len(starts) - 1):
+            yield str(data[starts[n]:starts[n + 1]], "utf-8")
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _table_checksum(data, nfields, fields_offset, values_offset, index_offset):
+    """ The CRC32 of the header, the field table, the values and the string index """
+    view = memoryview(data)
+    checksum = zlib.crc32(view[0:_HEADER_PREFIX.size])
+    checksum = zlib.crc32(
+        view[fields_offset:fields_offset + nfields*_FIELD_DTYPE.itemsize], checksum)
+    checksum = zlib.crc32(
+        view[values_offset:values_offset + nfields*_VALUE_DTYPE.itemsize], checksum)
+    return zlib.crc32(view[index_offset:index_offset + (4*nfields + 1)*_INDEX_DTYPE.itemsize], checksum)
+
+
+def compiled_export(outfile, reg_dict):
+    """
+    Writes the register map to a compiled binary file
+
+    Parameters
+    ----------
+    outfile : str
+        The compiled file to write
+    reg_dict : dict or RegisterMap
+        The register map, as returned by csv_import()
+    """
+    reg_map = compile_reg_dict(reg_dict)
+    reg_map.pack_registers()
+    layout = reg_map.layout
+    nfields = len(layout)
+
+    fields = np.zeros(nfields, dtype=_FIELD_DTYPE)
+    fields["address"] = layout.addresses
+    fields["offset"] = layout.offsets
+    fields["size"] = layout.sizes
+    values = np.asarray(reg_map.values_array, dtype=_VALUE_DTYPE)
+
+    strings = []
+    for kind in (layout.names, layout.descriptions, layout.value_meanings, layout.sections):
+        strings.extend(s.encode("utf-8") for s in kind)
+    ends = np.zeros(len(strings) + 1, dtype=_INDEX_DTYPE)
+    ends[1:] = np.cumsum([len(s) for s in strings])
+
+    fields_offset = _HEADER_SIZE
+    values_offset = _align(fields_offset + fields.nbytes)
+    index_offset = values_offset + values.nbytes
+    strings_offset = index_offset + ends.nbytes
+
+    body = bytearray(strings_offset - _HEADER_SIZE)
+    body[0:fields.nbytes] = fields.tobytes()
+    start = values_offset - _HEADER_SIZE
+    body[start:start + values.nbytes] = values.tobytes()
+    start = index_offset - _HEADER_SIZE
+    body[start:start + ends.nbytes] = ends.tobytes()
+    body += b"".join(strings)
+
+    data = bytearray(_HEADER_SIZE) + body
+    _HEADER_PREFIX.pack_into(data, 0, COMPILED_MAGIC, COMPILED_VERSION, _HEADER_SIZE, nfields,
+                             fields_offset, values_offset, index_offset, strings_offset)
+    _CHECKSUMS.pack_into(data, _HEADER_PREFIX.size, zlib.crc32(body),
+                         _table_checksum(data, nfields, fields_offset, values_offset,
+                                         index_offset))
+    with open(outfile, "wb") as binfile:
+        binfile.write(data)
+    return
+
+
+def compiled_import(infile, verify=True, verify_all=False):
+    """
+    Loads a compiled binary file by memory mapping it
+
+    Parameters
+    ----------
+    infile : str
+        The compiled file to read from
+    verify : bool, optional
+        Check the checksum of the header, the field table, the values and the
+        string index
+    verify_all : bool, optional
+        Also check the checksum of the whole file, which reads all of it
+
+    Returns
+    ----------
+    reg_map : RegisterMap
+        The register map, the same as csv_import(csv_file, compiled=True)
+    """
+    if os.path.isfile(infile) == False:
+        raise RuntimeError("Input file not found!")
+
+    with open(infile, "rb") as binfile:
+        data = mmap.mmap(binfile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(data) < _HEADER_SIZE:
+        raise ValueError("Not a compiled register map")
+    (magic, version, header_size, nfields, fields_offset, values_offset,
+     index_offset, strings_offset, checksum, table_checksum) = _HEADER.unpack_from(data)
+    if magic != COMPILED_MAGIC:
+        raise ValueError("Not a compiled register map")
+    if version != COMPILED_VERSION:
+        raise ValueError("Unsupported compiled register map version")
+    if verify and _table_checksum(data, nfields, fields_offset, values_offset,
+                                  index_offset) != table_checksum:
+        raise ValueError("Compiled register map checksum mismatch")
+    if verify_all and zlib.crc32(memoryview(data)[header_size:]) != checksum:
+        raise ValueError("Compiled register map checksum mismatch")
+
+    fields = np.frombuffer(data, dtype=_FIELD_DTYPE,
+                           count=nfields, offset=fields_offset)
+    values = np.frombuffer(data, dtype=_VALUE_DTYPE,
+                           count=nfields, offset=values_offset)
+    ends = np.frombuffer(data, dtype=_INDEX_DTYPE,
+                         count=4*nfields + 1, offset=index_offset)
+    strings = memoryview(data)[strings_offset:]
+
+    def kind(ind):
+        return CompiledStrings(ends[ind*nfields:(ind + 1)*nfields + 1], strings)
+
+    layout = RegisterLayout(list(kind(_NAMES)), fields["offset"], fields["size"],
+                            fields["address"], kind(_DESCRIPTIONS),
+                            kind(_VALUE_MEANINGS), kind(_SECTIONS))
+    return RegisterMap(layout, values)
+
+
+def csv_to_compiled(csv_file, compiled_file):
+    """
+    Converts a register map CSV file to a compiled binary file
+
+    Parameters
+    ----------
+    csv_file : str
+        The CSV file to read from
+    compiled_file : str
+        The compiled file to write
+    """
+    compiled_export(compiled_file, csv_import(csv_file, compiled=True))
+    return
+
+
+def compiled_to_csv(compiled_file, csv_file):
+    """
+    Converts a compiled binary file back to a register map CSV file
+
+    Parameters
+    ----------
+    compiled_file : str
+        The compiled file to read from
+    csv_file : str
+        The CSV file to write
+    """
+    csv_export(csv_file, compiled_import(compiled_file))
+    return
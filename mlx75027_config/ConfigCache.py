@@ -0,0 +1,209 @@
+"""
+Refael Whyte, r.whyte@chronoptics.com
+
+An opt-in cache of parsed CSV register maps, for services that load the same
+CSV files many times across worker processes. The parsed register maps are
+stored on disk as compiled files, named by the hash of the CSV file contents
+and the parser and compiled format versions, so an edited CSV file or a new
+version of the library never loads a stale map. Within a process the loaded
+register maps are also kept in memory, and each load returns a copy that
+shares the register definitions.
+
+    cache = CSVCache("/tmp/mlx_cache")
+    reg_map = csv_import("mlx75027.csv", compiled=True, cache=cache)
+
+Copyright 2020 Refael Whyte - Chronoptics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from collections import OrderedDict
+import hashlib
+import os
+import tempfile
+import time
+
+from mlx75027_config.CSVConfigIO import CSV_PARSER_VERSION, csv_import
+from mlx75027_config.CompiledConfigIO import COMPILED_VERSION, compiled_export, compiled_import
+from mlx75027_config.RegisterMapping import copy_map
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        # Removed by another process
+        return 0.0
+
+
+class CSVCache:
+    """
+    An on disk and in memory cache of parsed CSV register maps, evicting the
+    least recently used entries.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The folder the compiled register maps are stored in, created if it does not exist
+    max_entries : int, optional
+        The maximum number of register maps kept on disk and in memory
+    """
+
+    def __init__(self, cache_dir, max_entries=16):
+        if max_entries < 1:
+            raise ValueError("The cache must hold at least one entry")
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.reset_stats()
+        return
+
+    def reset_stats(self):
+        """ Resets the hit, miss and load time statistics """
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.hit_time = 0.0
+        self.miss_time = 0.0
+        return
+
+    def stats(self):
+        """
+        Returns the cache statistics
+
+        Returns
+        ----------
+        stats : dict
+            The number of memory hits, disk hits, misses and evictions, the hit rate,
+            and the mean load time in seconds of hits and misses
+        """
+        hits = self.memory_hits + self.disk_hits
+        loads = hits + self.misses
+        return {"memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": hits / loads if loads > 0 else 0.0,
+                "mean_hit_time": self.hit_time / hits if hits > 0 else 0.0,
+                "mean_miss_time": self.miss_time / self.misses if self.misses > 0 else 0.0}
+
+    def key(self, infile):
+        """ Returns the cache key of a CSV file, from its contents and the library versions """
+        if os.path.isfile(infile) == False:
+            raise RuntimeError("Input file not found!")
+        digest = hashlib.sha256()
+        digest.update("csv{:d}-compiled{:d}".format(CSV_PARSER_VERSION,
+                                                    COMPILED_VERSION).encode("ascii"))
+        with open(infile, "rb") as csvfile:
+            digest.update(csvfile.read())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".bin")
+
+    def load(self, infile, compiled=False):
+        """
+        Loads a CSV file, from the cache if it has been loaded before
+
+        Parameters
+        ----------
+        infile : str
+            The CSV file to read from
+        compiled : bool, optional
+            Set to True to return a RegisterMap instead of a dict
+
+        Returns
+        ----------
+        reg_dict : dict or RegisterMap
+            The dictionary of everything, the same as csv_import()
+        """
+        t_start = time.perf_counter()
+        key = self.key(infile)
+        missed = False
+        reg_map = self._memory.get(key)
+        if reg_map is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+        else:
+            reg_map = self._load_disk(key)
+            if reg_map is not None:
+                self.disk_hits += 1
+            else:
+                reg_map = csv_import(infile, compiled=True)
+                self._store_disk(key, reg_map)
+                self.misses += 1
+                missed = True
+            self._memory[key] = reg_map
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+        # Each load gets its own values
+        if compiled:
+            reg_dict = copy_map(reg_map)
+        else:
+            reg_dict = reg_map.to_dict()
+
+        if missed:
+            self.miss_time += time.perf_counter() - t_start
+        else:
+            self.hit_time += time.perf_counter() - t_start
+        return reg_dict
+
+    def _load_disk(self, key):
+        path = self._path(key)
+        if os.path.isfile(path) == False:
+            return None
+        try:
+            reg_map = compiled_import(path, verify_all=True)
+        except ValueError:
+            # A corrupted or incompatible entry is replaced
+            return None
+        # Mark the entry as recently used for eviction
+        os.utime(path)
+        return reg_map
+
+    def _store_disk(self, key, reg_map):
+        # Written to a temporary file first, so other processes never load a partial file
+        handle, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(handle)
+        try:
+            compiled_export(tmp_path, reg_map)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._evict(key)
+        return
+
+    def _evict(self, keep):
+        # The least recently used entries, never the one just written
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                   if name.endswith(".bin") and name != keep + ".bin"]
+        entries.sort(key=_mtime)
+        for path in entries[:max(0, len(entries) + 1 - self.max_entries)]:
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                # Still in use by another process
+                pass
+        return
+
+    def clear(self):
+        """ Removes every entry from the cache """
+        self._memory.clear()
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".bin"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    # Already evicted by another process
+                    pass
+        return
@@ -12,10 +12,12 @@ The above copyright notice and this permission notice shall be included in all c
 THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import math
+
 import numpy as np
 import warnings
 
-from mlx75027_config import value16_to_reg
+from mlx75027_config.SensorConfig import value16_to_reg
 
 
 def epc_set_external_mod(reg_dict, external):
@@ -321,6 +323,47 @@ def epc_calc_int_times(reg_dict, mclk, demod_clk):
     return int_times
 
 
+# The largest integration time multiplier
+_INT_MULT_MAX = 1022
+# Every integration time multiplier, largest first, tested against the common
+# total at once
+_INT_MULTS = np.arange(_INT_MULT_MAX, 0, -1, dtype=np.uint32)
+
+
+def epc_calc_int_mult(int_total):
+    """
+    Calculates the largest integration time multiplier, up to 1022, that divides
+    every integration time total. The common multiplier of two integration times
+    is the largest multiplier that divides their greatest common divisor.
+
+    Parameters
+    ----------
+    int_total : np.array
+        The integration time of each frame in clock cycles
+
+    Returns
+    ----------
+    int_mult : int
+        The integration time multiplier
+    """
+    common = 0
+    for total in np.reshape(int_total, -1).tolist():
+        common = math.gcd(common, int(total))
+
+    if common == 0:
+        # Every multiplier divides zero
+        return _INT_MULT_MAX
+    elif common <= _INT_MULT_MAX:
+        return common
+    # The totals are 32 bit, and the 32 bit remainder is the quickest
+    if common <= 0xFFFFFFFF:
+        common = np.uint32(common)
+    else:
+        common = np.int64(common)
+    # The first multiplier that divides the total, and argmax stops on it
+    return int(_INT_MULTS[np.argmax(common % _INT_MULTS == 0)])
+
+
 def epc_set_int_times(reg_dict, int_time_ms, mclk, demod_clk):
     """
     Set the integration time of each frame.
@@ -354,33 +397,7 @@ def epc_set_int_times(reg_dict, int_time_ms, mclk, demod_clk):
 
     # The multiplier is constant between the two values, if hdr is enabled
     # If HDR is not enabled then find the biggest and best multipler
-    if np.size(int_time_ms) == 1:
-        pos_mult = np.arange(1, 1023)
-        mult_work = np.nonzero(np.mod(int_total[0], pos_mult) == 0)
-        int_mult = mult_work[0][-1] + 1
-
-    elif np.size(int_time_ms) == 2:
-        if (int_time_ms[0] == int_time_ms[1]):
-            pos_mult = np.arange(1, 1023)
-            mult_work = np.nonzero(np.mod(int_total[0], pos_mult) == 0)
-            int_mult = mult_work[0][-1] + 1
-        else:
-            # We now need to do this but as a vector
-            pos_mult = np.tile(np.reshape(np.arange(1, 1023), (-1, 1)), (1, 2))
-            com_mult = (np.mod(int_total, pos_mult) == 0)
-            # Now find the highest pair [True,True] in com_mult
-            use_ind = 0
-            for n in range(0, 1022):
-                if (com_mult[n, 0] == True and com_mult[n, 1] == True):
-                    use_ind = n
-            int_mult = use_ind + 1
-
-            # int_mult = np.floor( np.max(int_total) / np.min(int_total) )
-
-    if int_mult == 0:
-        int_mult = 1.0
-    elif int_mult > 0x03FF:
-        int_mult = 0x03FF
+    int_mult = epc_calc_int_mult(int_total)
 
     int_len = (int_total / int_mult) - 1.0
     if np.any(int_len > (2**16 - 1)):
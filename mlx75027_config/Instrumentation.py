@@ -0,0 +1,242 @@
+"""
+Refael Whyte, r.whyte@chronoptics.com
+
+Opt-in instrumentation of the sensor modules. While a CallProfiler is enabled
+every function of MLX75027Config.py and EPC660Config.py is replaced by a wrapper
+that records its calls in a call tree, wherever the function is referenced in
+the mlx75027_config modules. Disabling the profiler puts the original functions
+back, so there is no cost when it is not in use.
+
+    profiler = CallProfiler()
+    with profiler:
+        calc_fps(reg_dict, True)
+    print(profiler.stats()["calc_speed"]["calls"])
+    profiler.export_collapsed("calc_fps.folded")
+
+The calls are recorded from the thread that enabled the profiler, the calls
+from other threads are not recorded.
+
+Copyright 2020 Refael Whyte - Chronoptics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import functools
+import importlib
+import json
+import sys
+import threading
+import time
+import types
+
+_PACKAGE = "mlx75027_config"
+
+# The modules instrumented by default
+DEFAULT_MODULES = ("MLX75027Config", "EPC660Config")
+
+# The enabled profiler, the modules can only be patched by one at a time
+_active = None
+
+
+def _replace_functions(replacements):
+    """ Replaces the functions referenced by the package modules """
+    for name, module in list(sys.modules.items()):
+        if module is None or (name != _PACKAGE and not name.startswith(_PACKAGE + ".")):
+            continue
+        namespace = vars(module)
+        for attr, value in list(namespace.items()):
+            if isinstance(value, types.FunctionType) and value in replacements:
+                namespace[attr] = replacements[value]
+    return
+
+
+class _CallNode:
+    """ A function at one call path of the call tree """
+    __slots__ = ("name", "calls", "total_time", "child_time", "children")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total_time = 0.0
+        self.child_time = 0.0
+        self.children = {}
+
+    def to_dict(self):
+        return {"name": self.name,
+                "calls": self.calls,
+                "total_time": self.total_time,
+                "self_time": self.total_time - self.child_time,
+                "children": [child.to_dict() for child in self.children.values()]}
+
+
+class CallProfiler:
+    """
+    Records the call counts, the cumulative and self times, and the call tree
+    of the functions of the sensor modules while it is enabled.
+
+    Parameters
+    ----------
+    modules : tuple, optional
+        The names of the mlx75027_config modules to instrument, defaults to
+        MLX75027Config and EPC660Config
+    """
+
+    def __init__(self, modules=DEFAULT_MODULES):
+        self.modules = tuple(modules)
+        self._originals = {}
+        self._thread = None
+        self.reset()
+        return
+
+    @property
+    def enabled(self):
+        return _active is self
+
+    def reset(self):
+        """ Clears the recorded calls """
+        self._root = _CallNode("root")
+        self._stack = [self._root]
+        return
+
+    def _wrap(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if threading.get_ident() != self._thread:
+                return func(*args, **kwargs)
+            parent = self._stack[-1]
+            node = parent.children.get(name)
+            if node is None:
+                node = parent.children[name] = _CallNode(name)
+            self._stack.append(node)
+            t_start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - t_start
+                self._stack.pop()
+                node.calls += 1
+                node.total_time += elapsed
+                parent.child_time += elapsed
+        return wrapper
+
+    def enable(self):
+        """ Replaces the functions of the modules with recording wrappers """
+        global _active
+        if _active is self:
+            return
+        if _active is not None:
+            raise RuntimeError("Another CallProfiler is enabled")
+        wrappers = {}
+        for module_name in self.modules:
+            module = importlib.import_module(_PACKAGE + "." + module_name)
+            for name, func in vars(module).items():
+                if isinstance(func, types.FunctionType) and func.__module__ == module.__name__:
+                    wrappers[func] = self._wrap(name, func)
+        self._originals = {wrapper: func for func, wrapper in wrappers.items()}
+        self._thread = threading.get_ident()
+        _active = self
+        _replace_functions(wrappers)
+        return
+
+    def disable(self):
+        """ Puts the original functions back """
+        global _active
+        if _active is not self:
+            return
+        # Modules imported while enabled hold wrappers too, and are restored by the same scan
+        _replace_functions(self._originals)
+        self._originals = {}
+        self._thread = None
+        _active = None
+        return
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disable()
+        return False
+
+    def stats(self):
+        """
+        Returns the recorded calls of each function
+
+        Returns
+        ----------
+        stats : dict
+            For each function name a dict of the number of calls, the cumulative total_time
+            and the self_time in seconds, excluding the instrumented functions it called
+        """
+        stats = {}
+
+        def visit(node, active):
+            entry = stats.setdefault(
+                node.name, {"calls": 0, "total_time": 0.0, "self_time": 0.0})
+            entry["calls"] += node.calls
+            entry["self_time"] += node.total_time - node.child_time
+            # A recursive call is already in the total time of the outer call
+            if node.name not in active:
+                entry["total_time"] += node.total_time
+            for child in node.children.values():
+                visit(child, active | {node.name})
+            return
+
+        for child in self._root.children.values():
+            visit(child, frozenset())
+        return stats
+
+    def call_tree(self):
+        """
+        Returns the call tree
+
+        Returns
+        ----------
+        tree : list
+            A dict of the name, calls, total_time, self_time and children of each
+            outermost function called, the children are the same dicts
+        """
+        return [child.to_dict() for child in self._root.children.values()]
+
+    def collapsed_stacks(self):
+        """
+        Returns the call tree in the collapsed stack format of flamegraph.pl
+        and speedscope, the self time of each call path in micro-seconds
+
+        Returns
+        ----------
+        lines : list
+            A "calc_fps;calc_frame_time;calc_line_timing 12" line for each call path
+        """
+        lines = []
+
+        def visit(node, path):
+            path = path + [node.name]
+            self_us = int(round(1e6*(node.total_time - node.child_time)))
+            if self_us > 0:
+                lines.append(";".join(path) + " " + str(self_us))
+            for child in node.children.values():
+                visit(child, path)
+            return
+
+        for child in self._root.children.values():
+            visit(child, [])
+        return lines
+
+    def export_json(self, outfile):
+        """ Writes the stats and the call tree to a JSON file """
+        with open(outfile, "w", encoding="utf-8") as jsonfile:
+            json.dump({"functions": self.stats(), "call_tree": self.call_tree()},
+                      jsonfile, indent=2)
+        return
+
+    def export_collapsed(self, outfile):
+        """ Writes the collapsed stacks to a file, for flamegraph.pl or speedscope """
+        with open(outfile, "w", encoding="utf-8") as stackfile:
+            for line in self.collapsed_stacks():
+                stackfile.write(line + "\n")
+        return
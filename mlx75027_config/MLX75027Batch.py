@@ -0,0 +1,464 @@
+"""
+Refael Whyte, r.whyte@chronoptics.com
+
+Vectorized timing calculations of many MLX75027 or MLX75026 configurations at
+once. The register states are stacked into a 2-D array, one row per
+configuration and one column per field of a RegisterLayout, and the timing
+is calculated with the same operations as the scalar functions in MLX75027Config.py
+so the results are identical.
+
+Copyright 2020 Refael Whyte - Chronoptics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+
+from mlx75027_config.RegisterMapping import RegisterMap, compile_reg_dict
+from mlx75027_config.MLX75027Config import calc_line_timing, calc_hmax
+from mlx75027_config.SensorConfig import values_to_regs, regs_to_values
+
+
+def stack_reg_states(reg_states):
+    """
+    Stacks a list of register states into a 2-D array of values.
+
+    Parameters
+    ----------
+    reg_states : list
+        The reg_dicts or RegisterMaps to stack, all from the same CSV file
+
+    Returns
+    ----------
+    layout : RegisterLayout
+        The field definitions of the columns
+    values : numpy.array
+        The (nconfigs, nfields) array of field values
+    """
+    if len(reg_states) == 0:
+        raise ValueError("No register states to stack")
+
+    first = reg_states[0]
+    if isinstance(first, RegisterMap):
+        layout = first.layout
+    else:
+        layout = compile_reg_dict(first).layout
+
+    values = np.zeros((len(reg_states), len(layout)), dtype=np.int64)
+    for n, reg in enumerate(reg_states):
+        if isinstance(reg, RegisterMap) and reg.layout is layout:
+            values[n, :] = reg.values_array
+        else:
+            values[n, :] = [reg[k][2] for k in layout.names]
+    return layout, values
+
+
+def _column(layout, values, name):
+    return values[:, layout.index[name]]
+
+
+def _value16(layout, values, hi_reg, low_reg):
+    return regs_to_values([_column(layout, values, low_reg), _column(layout, values, hi_reg)])
+
+
+def _value32(layout, values, reg0, reg1, reg2, reg3):
+    return regs_to_values([_column(layout, values, reg) for reg in (reg0, reg1, reg2, reg3)])
+
+
+def _set_regs(layout, values, value, regs):
+    # The registers are from the low [7:0] bits
+    for reg, reg_value in zip(regs, values_to_regs(value, len(regs))):
+        values[:, layout.index[reg]] = reg_value
+    return
+
+
+def _set_value16(layout, values, value, hi_reg, low_reg):
+    _set_regs(layout, values, value, (low_reg, hi_reg))
+    return
+
+
+def _set_value32(layout, values, value, reg0, reg1, reg2, reg3):
+    _set_regs(layout, values, value, (reg0, reg1, reg2, reg3))
+    return
+
+
+class _HmaxState:
+    """ The minimum register state calc_line_timing() needs """
+
+    def __init__(self, hmax_hi, hmax_low, lanes, mode):
+        self._state = {"HMAX_HI": [0, 8, hmax_hi], "HMAX_LOW": [0, 8, hmax_low],
+                       "DATA_LANE_CONFIG": [0, 1, lanes], "OUTPUT_MODE": [0, 3, mode]}
+
+    def __getitem__(self, name):
+        return self._state[name]
+
+
+def calc_batch_hmax(layout, values, mlx75027):
+    """
+    Resolves the HMAX value used by the timing calculations of each configuration,
+    as calc_line_timing() does for a single configuration.
+
+    Parameters
+    ----------
+    layout : RegisterLayout
+        The field definitions of the columns of values
+    values : numpy.array
+        The (nconfigs, nfields) array of field values
+    mlx75027 : bool
+        Set to True if MLX75027, False for MLX75026
+
+    Returns
+    ----------
+    hmax : numpy.array
+        The hmax of each configuration
+    """
+    return _batch_line_timing(layout, values, mlx75027)[1]
+
+
+def _batch_line_timing(layout, values, mlx75027):
+    """ The speed and hmax of each configuration, as calc_line_timing() """
+    keys = np.stack([_column(layout, values, "HMAX_HI"),
+                     _column(layout, values, "HMAX_LOW"),
+                     _column(layout, values, "DATA_LANE_CONFIG"),
+                     _column(layout, values, "OUTPUT_MODE")], axis=1)
+    # Only a handful of different line timings exist, resolve each once
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    unique_timing = np.zeros((unique_keys.shape[0], 2), dtype=np.int64)
+    for n in range(0, unique_keys.shape[0]):
+        state = _HmaxState(*[int(v) for v in unique_keys[n]])
+        unique_timing[n, :] = calc_line_timing(state, mlx75027)
+    timing = unique_timing[np.reshape(inverse, -1)]
+    return timing[:, 0], timing[:, 1]
+
+
+def _stack_values(reg_states, layout):
+    """ The layout and the (nconfigs, nfields) values of a list of states or an array """
+    if isinstance(reg_states, np.ndarray):
+        if layout is None:
+            raise ValueError("A layout is required for an array of values")
+        values = reg_states
+    else:
+        layout, values = stack_reg_states(reg_states)
+    if values.ndim != 2 or values.shape[1] != len(layout):
+        raise ValueError("Values must be of size (nconfigs, nfields)")
+    return layout, values
+
+
+def calc_batch_timing(reg_states, mlx75027, layout=None):
+    """
+    Calculates the timing of many configurations in one vectorized pass.
+    The results are the same as calc_phase_time(), calc_frame_time(), calc_fps()
+    and calc_deadtime() called on each configuration.
+
+    Parameters
+    ----------
+    reg_states : list or numpy.array
+        A list of reg_dicts or RegisterMaps, or a (nconfigs, nfields) array of values
+    mlx75027 : bool
+        Set to True if MLX75027, False for MLX75026
+    layout : RegisterLayout, optional
+        The field definitions, required when reg_states is an array
+
+    Returns
+    ----------
+    timing : dict
+        "phase_times" : (nconfigs, 8) array of the raw frame times in micro-seconds (us)
+        "min_frame_time" : the depth frame time without FRAME_TIME in micro-seconds (us)
+        "frame_time" : the depth frame time in micro-seconds (us)
+        "depth_fps" : the depth frames per second
+        "raw_fps" : the raw frames per second
+        "dead_time" : the dead time in micro-seconds (us)
+    """
+    layout, values = _stack_values(reg_states, layout)
+
+    nconfigs = values.shape[0]
+    hmax = calc_batch_hmax(layout, values, mlx75027)
+    output_mode = _column(layout, values, "OUTPUT_MODE")
+    preheat = _column(layout, values, "Px_PREHEAT")
+    premix = _column(layout, values, "Px_PREMIX")
+
+    # calc_pretime()
+    pretime_enabled = (preheat | premix) != 0
+    px_pretime = _value16(layout, values, "Px_PRETIME_HI", "Px_PRETIME_LOW")
+    pre_offset = np.where(output_mode == 4, 5, 9)
+    pre_heat_time = (px_pretime - pre_offset)*hmax/120.0
+    pre_heat_time[pre_heat_time < 0] = 0
+    pretime = np.where(pretime_enabled, pre_heat_time, 50.0*hmax/120.0)
+
+    # calc_all_pretimes(), calc_int_times() and calc_idle_time()
+    pre_times = np.zeros((nconfigs, 8))
+    int_times = np.zeros((nconfigs, 8))
+    idle_times = np.zeros((nconfigs, 8))
+    for n in range(0, 8):
+        pre_heat = np.where(preheat & (1 << n), pretime, 0.0)
+        pre_mix = np.where(premix & (1 << n), pretime, 0.0)
+        pre_times[:, n] = pre_heat + pre_mix
+        px_int = _value32(layout, values, "P"+str(n)+"_INT0", "P" +
+                          str(n)+"_INT1", "P"+str(n)+"_INT2", "P"+str(n)+"_INT3")
+        int_times[:, n] = px_int.astype(np.uint32) / 120
+        idle_times[:, n] = _column(
+            layout, values, "P"+str(n)+"_PHASE_IDLE") * hmax / (120.0)
+
+    # calc_phase_time()
+    roi_row_start = _value16(layout, values,
+                             "ROI_ROW_START_HI", "ROI_ROW_START_LOW")
+    roi_row_end = _value16(layout, values, "ROI_ROW_END_HI", "ROI_ROW_END_LOW")
+    readout = (7.0+(roi_row_end-roi_row_start+1))*hmax/120.0
+    phase_times = pre_times + int_times + idle_times + readout[:, None]
+
+    # calc_frame_time(), summing each group with the same number of raw frames
+    frame_startup = _value16(layout, values,
+                             "FRAME_STARTUP_HI", "FRAME_STARTUP_LOW")
+    frame_startup_us = (frame_startup*hmax)/120
+    nraw = _column(layout, values, "PHASE_COUNT")
+    phase_time = np.zeros(nconfigs)
+    for count in np.unique(nraw):
+        group = nraw == count
+        phase_time[group] = np.sum(np.ascontiguousarray(
+            phase_times[group, 0:count]), axis=1)
+    min_frame_time = phase_time + 500.0 + frame_startup_us
+
+    frame_time_reg = _value32(layout, values, "FRAME_TIME0",
+                              "FRAME_TIME1", "FRAME_TIME2", "FRAME_TIME3")
+    ft_reg = frame_time_reg*hmax/120.0
+    frame_time = np.where(ft_reg > min_frame_time, ft_reg, min_frame_time)
+
+    # calc_fps() and calc_deadtime()
+    depth_fps = 1.0 / (frame_time*1e-6)
+    raw_fps = depth_fps * nraw
+    dead_time = np.where(min_frame_time > ft_reg, 0.0, ft_reg - min_frame_time)
+
+    timing = {"phase_times": phase_times,
+              "min_frame_time": min_frame_time,
+              "frame_time": frame_time,
+              "depth_fps": depth_fps,
+              "raw_fps": raw_fps,
+              "dead_time": dead_time}
+    return timing
+
+
+def calc_batch_bandwidth(reg_states, mlx75027, layout=None):
+    """
+    Calculates the MIPI bandwidth of the raw frames of many configurations in
+    one vectorized pass. The results are the same as calc_bandwidth() called
+    on each configuration.
+
+    Parameters
+    ----------
+    reg_states : list or numpy.array
+        A list of reg_dicts or RegisterMaps, or a (nconfigs, nfields) array of values
+    mlx75027 : bool
+        Set to True if MLX75027, False for MLX75026
+    layout : RegisterLayout, optional
+        The field definitions, required when reg_states is an array
+
+    Returns
+    ----------
+    bandwidth : dict
+        An array of each value of calc_bandwidth(), "nrows", "ncols", "frame_bytes",
+        "buffer_bytes", "line_time", "readout_time", "link_rate", "utilization",
+        "raw_fps", "max_raw_fps" and "data_rate"
+    """
+    layout, values = _stack_values(reg_states, layout)
+
+    output_mode = _column(layout, values, "OUTPUT_MODE")
+    if np.any((output_mode < 0) | (output_mode > 4)):
+        raise RuntimeError("Invalid output mode! Must be between 0 and 4")
+    lane_config = _column(layout, values, "DATA_LANE_CONFIG")
+    if np.any((lane_config != 0) & (lane_config != 1)):
+        raise RuntimeError("Invalid lane configuration!")
+    speed, hmax = _batch_line_timing(layout, values, mlx75027)
+
+    # calc_img_size()
+    binning = _column(layout, values, "BINNING_MODE")
+    roi_row_start = _value16(layout, values,
+                             "ROI_ROW_START_HI", "ROI_ROW_START_LOW")
+    roi_row_end = _value16(layout, values, "ROI_ROW_END_HI", "ROI_ROW_END_LOW")
+    col_width = _value16(layout, values,
+                         "ROI_COL_WIDTH_HI", "ROI_COL_WIDTH_LOW")
+    # The ROI rows of calc_roi(), (row_end - 1)*2 - (row_start*2 + 1) + 1
+    nrows = np.right_shift(2*(roi_row_end - roi_row_start - 1), binning)
+    ncols = np.right_shift(col_width, binning)
+
+    nvalues = np.where(output_mode == 4, 2, 1)
+    line_bytes = (ncols*nvalues*12 + 7) // 8
+    frame_bytes = nrows*line_bytes
+
+    line_time = hmax/120.0
+    readout_time = (7.0+(roi_row_end-roi_row_start+1))*line_time
+    link_rate = np.where(lane_config == 1, 4, 2)*speed
+    raw_fps = calc_batch_timing(values, mlx75027, layout=layout)["raw_fps"]
+
+    bandwidth = {"nrows": nrows,
+                 "ncols": ncols,
+                 "frame_bytes": frame_bytes,
+                 "buffer_bytes": nrows*ncols*nvalues*2,
+                 "line_time": line_time,
+                 "readout_time": readout_time,
+                 "link_rate": link_rate,
+                 "utilization": 8.0*frame_bytes / (link_rate*readout_time),
+                 "raw_fps": raw_fps,
+                 "max_raw_fps": 1e6 / readout_time,
+                 "data_rate": 8.0*frame_bytes*raw_fps*1e-6}
+    return bandwidth
+
+
+def sweep_reg_states(reg_dict, mlx75027, speed=None, row_start=None, row_end=None,
+                     nraw=None, int_times=None, pretime=None):
+    """
+    Creates the stacked register states of a parameter sweep around a base
+    configuration. Each parameter is broadcast against the others and applied
+    with the same register quantization, and in the same order, as set_hmax(),
+    set_roi(), set_nraw(), set_int_times() and set_pretime().
+    Parameters left as None keep the base configuration value.
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The base configuration
+    mlx75027 : bool
+        Set to True if MLX75027, False for MLX75026
+    speed : numpy.array, optional
+        The MIPI speed in Mbps, the HMAX is set with calc_hmax()
+    row_start : numpy.array, optional
+        The ROI row start
+    row_end : numpy.array, optional
+        The ROI row end
+    nraw : numpy.array, optional
+        The number of raw frames
+    int_times : numpy.array, optional
+        The integration time in micro-seconds (us), of every raw frame if 1-D,
+        or of each raw frame along the last axis
+    pretime : numpy.array, optional
+        The pretime in micro-seconds (us)
+
+    Returns
+    ----------
+    layout : RegisterLayout
+        The field definitions of the columns
+    values : numpy.array
+        The (nconfigs, nfields) array of field values
+    """
+    layout, base = stack_reg_states([reg_dict])
+
+    params = {"speed": speed, "row_start": row_start, "row_end": row_end,
+              "nraw": nraw, "pretime": pretime}
+    shapes = [np.shape(p) for p in params.values() if p is not None]
+    if int_times is not None:
+        int_times = np.asarray(int_times, dtype=np.float64)
+        if int_times.ndim <= 1:
+            int_times = int_times[..., None]
+        if int_times.shape[-1] > 8:
+            raise RuntimeError("MLX75027 has maximum number of 8 raw frames!")
+        shapes.append(int_times.shape[:-1])
+    if len(shapes):
+        shape = np.broadcast_arrays(*[np.empty(s) for s in shapes])[0].shape
+    else:
+        shape = ()
+    nconfigs = int(np.prod(shape))
+
+    def flat(param):
+        return np.reshape(np.broadcast_to(param, shape), -1)
+
+    values = np.repeat(base, nconfigs, axis=0)
+
+    if speed is not None:
+        speed = flat(speed)
+        hmax = np.zeros(nconfigs, dtype=np.int64)
+        for sp in np.unique(speed):
+            hmax[speed == sp] = calc_hmax(reg_dict, mlx75027, speed=int(sp))
+        if np.any(hmax < 0) or np.any(hmax > 16383):
+            raise RuntimeError(
+                "Invalid hmax value! Must be between 0 and 16383")
+        _set_value16(layout, values, hmax, "HMAX_HI", "HMAX_LOW")
+
+    if row_start is not None:
+        row_start = flat(row_start).astype(np.int64)
+        row_reg = (row_start-1) >> 1
+        values[:, layout.index["ROI_ROW_START_LOW"]] = row_reg & 0xFF
+        values[:, layout.index["ROI_ROW_START_HI"]] = row_reg >> 8
+    if row_end is not None:
+        row_end = flat(row_end).astype(np.int64)
+        row_reg = (row_end >> 1)+1
+        values[:, layout.index["ROI_ROW_END_LOW"]] = row_reg & 0xFF
+        values[:, layout.index["ROI_ROW_END_HI"]] = row_reg >> 8
+    if row_start is not None or row_end is not None:
+        # The rows as calc_roi() returns them
+        rs = _value16(layout, values, "ROI_ROW_START_HI",
+                      "ROI_ROW_START_LOW")*2 + 1
+        re = (_value16(layout, values, "ROI_ROW_END_HI",
+                       "ROI_ROW_END_LOW") - 1)*2
+        row_max = 480 if mlx75027 else 240
+        if np.any(rs < 1) or np.any(re > row_max):
+            raise RuntimeError("The rows must be between 1 and " + str(row_max))
+        if np.any(rs >= re):
+            raise RuntimeError("The row start must be less than the row end")
+
+    if nraw is not None:
+        nraw = flat(nraw)
+        if np.any(nraw < 1) or np.any(nraw > 8):
+            raise RuntimeError(
+                "Invalid number of raw frames, must be between 1 and 8")
+        values[:, layout.index["PHASE_COUNT"]] = nraw
+
+    hmax = calc_batch_hmax(layout, values, mlx75027)
+
+    if int_times is not None:
+        int_times = np.reshape(np.broadcast_to(
+            int_times, shape + int_times.shape[-1:]), (nconfigs, -1))
+        for n in range(0, int_times.shape[1]):
+            reg_value = np.ceil(int_times[:, n]*120.0/hmax) * hmax
+            _set_value32(layout, values, reg_value, "P"+str(n)+"_INT0",
+                         "P"+str(n)+"_INT1", "P"+str(n)+"_INT2", "P"+str(n)+"_INT3")
+
+    if pretime is not None:
+        pretime = flat(pretime).astype(np.float64)
+        pretime_enabled = (_column(layout, values, "Px_PREHEAT") |
+                           _column(layout, values, "Px_PREMIX")) != 0
+        pre_offset = np.where(
+            _column(layout, values, "OUTPUT_MODE") == 4, 5, 9)
+        pretime_reg = np.where(pretime_enabled,
+                               np.ceil((pretime*120.0)/hmax) + pre_offset,
+                               np.ceil(50.0*120.0 / hmax)).astype(np.int64)
+        randnm7 = np.where(pretime_enabled & (pretime >= 11.13),
+                           1070 + hmax * np.ceil(((pretime-11.13)/hmax) * 120.0), 1070)
+        randnm0 = hmax*pretime_reg - randnm7 - 2098
+        if np.any(randnm0 > (2**22)-1):
+            raise RuntimeError("Invalid RANDNM0 Value!")
+        if np.any(randnm0 < 0):
+            raise RuntimeError("Negative RANDNM0 Value!")
+
+        _set_value16(layout, values, pretime_reg,
+                     "Px_PRETIME_HI", "Px_PRETIME_LOW")
+        for name, value in [("RANDNM0", randnm0), ("RANDNM7", randnm7)]:
+            _set_regs(layout, values, value,
+                      (name+"_0", name+"_1", name+"_2"))
+
+    return layout, values
+
+
+def sweep_timing(reg_dict, mlx75027, **params):
+    """
+    Calculates the timing of a parameter sweep around a base configuration,
+    see sweep_reg_states() for the parameters and calc_batch_timing() for the results.
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The base configuration
+    mlx75027 : bool
+        Set to True if MLX75027, False for MLX75026
+    **params
+        The speed, row_start, row_end, nraw, int_times and pretime arrays
+
+    Returns
+    ----------
+    timing : dict
+        The timing arrays, as returned by calc_batch_timing()
+    """
+    layout, values = sweep_reg_states(reg_dict, mlx75027, **params)
+    return calc_batch_timing(values, mlx75027, layout=layout)
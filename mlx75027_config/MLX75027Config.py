@@ -12,10 +12,23 @@ The above copyright notice and this permission notice shall be included in all c
 THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import bisect
 import numpy as np
 import warnings
 
-from mlx75027_config import value16_to_reg, value24_to_reg, value32_to_reg, reg24_to_value, reg16_to_value, reg_to_value
+from mlx75027_config.SensorConfig import value16_to_reg, value24_to_reg, value32_to_reg, reg24_to_value, reg16_to_value, reg_to_value
+from mlx75027_config.MLX75027Tables import get_domain_tables, ADELAY_FINE_STEP, ADELAY_FINE_MAX, ADELAY_SFINE_STEP, ADELAY_SFINE_MAX
+from mlx75027_config.MLX75027Tables import DUTY_CYCLE_OFF, DUTY_CYCLE_INCREASE, DUTY_CYCLE_DECREASE, DUTY_CYCLE_MAX_VALUE, DUTY_CYCLE_STEP
+
+
+def _adelay_steps(fmod):
+    """ Returns the number of coarse analog delay steps in a modulation period """
+    tables = get_domain_tables()
+    band = bisect.bisect_right(tables.adelay_edges, fmod)
+    if band == len(tables.adelay_steps):
+        warnings.warn("calc_analog_delay() - Invalid modulation frequency!")
+        return tables.adelay_steps[-1]
+    return tables.adelay_steps[band]
 
 
 def calc_analog_delay(reg_dict):
@@ -34,21 +47,13 @@ def calc_analog_delay(reg_dict):
         The delay in microseconds
     """
     fmod = calc_mod_freq(reg_dict)
-    if fmod < 21:
-        N = 32
-    elif fmod < 51:
-        N = 16
-    elif fmod < 101:
-        N = 8
-    else:
-        N = 8
-        warnings.warn("calc_analog_delay() - Invalid modulation frequency!")
+    N = _adelay_steps(fmod)
 
     coarse_delay_seconds = reg_dict["ADELAY_COARSE"][2]/(fmod*1e6*N)
 
     #
-    fine_delay_seconds = reg_dict["ADELAY_FINE"][2] * 75e-12
-    super_fine_seconds = reg_dict["ADELAY_SFINE"][2] * 20e-12
+    fine_delay_seconds = reg_dict["ADELAY_FINE"][2] * ADELAY_FINE_STEP
+    super_fine_seconds = reg_dict["ADELAY_SFINE"][2] * ADELAY_SFINE_STEP
 
     delay_us = (coarse_delay_seconds + fine_delay_seconds +
                 super_fine_seconds) * 1e6
@@ -70,15 +75,7 @@ def set_analog_delay(reg_dict, delay_us):
     """
     delay_seconds = delay_us * 1e-6
     fmod = calc_mod_freq(reg_dict)
-    if fmod < 21:
-        N = 32
-    elif fmod < 51:
-        N = 16
-    elif fmod < 101:
-        N = 8
-    else:
-        N = 8
-        warnings.warn("calc_analog_delay() - Invalid modulation frequency!")
+    N = _adelay_steps(fmod)
 
     coarse_delay = np.floor(delay_seconds/(1.0/(fmod*1e6*N)))
     if coarse_delay > (N-1):
@@ -87,21 +84,21 @@ def set_analog_delay(reg_dict, delay_us):
 
     remaining_time = delay_seconds - coarse_delay/(fmod*1e6*N)
 
-    fine_delay = np.floor(remaining_time/(75e-12))
-    if fine_delay > 71:
-        fine_delay = 71
+    fine_delay = np.floor(remaining_time/ADELAY_FINE_STEP)
+    if fine_delay > ADELAY_FINE_MAX:
+        fine_delay = ADELAY_FINE_MAX
 
     #
-    fine_time = (fine_delay*75e-12)
+    fine_time = (fine_delay*ADELAY_FINE_STEP)
     # Verify that fine_delay isn't greater than a coarse delay step size
     if fine_time > (1.0/(fmod*1e6*N)):
         warnings.warn("calc_analog_delay() - Invalid fine delay time")
 
     remaining = remaining_time - fine_time
 
-    super_fine = np.floor(remaining/(20e-12))
-    if super_fine > 3:
-        super_fine = 3
+    super_fine = np.floor(remaining/ADELAY_SFINE_STEP)
+    if super_fine > ADELAY_SFINE_MAX:
+        super_fine = ADELAY_SFINE_MAX
 
     # Now set the values
     reg_dict["ADELAY_SFINE"][2] = int(super_fine)
@@ -188,14 +185,14 @@ def set_phase_shift(reg_dict, phase_shifts):
     if len(phase_shifts) > 8:
         raise ValueError("Maximum length of phase_shifts is 8")
 
-    pos_vals = np.arange(0, 1, 0.125)
+    codes = get_domain_tables().phase_shift_codes
     n = 0
     for shift in phase_shifts:
-        if shift not in pos_vals:
+        ind = codes.get(float(shift))
+        if ind is None:
             raise ValueError("Invalid phase shift value")
 
-        ind = np.where(shift == pos_vals)[0][0]
-        reg_dict["P"+str(n)+"_PHASE_SHIFT"][2] = int(ind)
+        reg_dict["P"+str(n)+"_PHASE_SHIFT"][2] = ind
         n += 1
 
     return
@@ -346,37 +343,10 @@ def calc_speed(reg_dict, mlx75027):
         The speed of the MIPI bus in megabits per second
     """
     hmax = reg16_to_value(reg_dict, "HMAX_LOW", "HMAX_HI")
-    # print("mlx75027: " + str(mlx75027))
-    if mlx75027:
-        hmax300 = [0x0E78, 0x0860, 0x1A80, 0x0E60]
-        hmax600 = [0x0750, 0x0444, 0x0D54, 0x0744]
-        hmax704 = [0x0640, 0x03A8, 0x0B60, 0x0636]
-        hmax800 = [0x0584, 0x0338, 0x0A06, 0x057A]
-        hmax960 = [0x049E, 0x02B6, 0x0860, 0x0514]
-    else:
-        hmax300 = [0x0878, 0x0560, 0x0E80, 0x0860]
-        hmax600 = [0x0450, 0x02C4, 0x0754, 0x0444]
-        hmax704 = [0x03B2, 0x02B6, 0x0644, 0x03A8]
-        hmax800 = [0x0344, 0x02B6, 0x0586, 0x033A]
-        hmax960 = [0x02BE, 0x02B6, 0x0514, 0x02B6]
-
-    if hmax in hmax300:
-        return 300
-    elif hmax in hmax600:
-        return 600
-    elif hmax in hmax704:
-        return 704
-    elif hmax in hmax800:
-        return 800
-    elif hmax in hmax960:
-        return 960
-    else:
-        if hmax == 824:
-            return 800
-        elif hmax == 826:
-            return 800
+    speed = get_domain_tables().speeds.get((bool(mlx75027), hmax))
+    if speed is None:
         raise ValueError("Invalid hmax: " + str(hmax))
-    return
+    return speed
 
 
 def calc_output_mode(reg_dict):
@@ -421,44 +391,60 @@ def calc_hmax(reg_dict, mlx75027, speed=800):
         The value of the hmax registers, used a lot for the timing calculations
 
     """
-    speed_list = [300, 600, 704, 800, 960]
-    ind = speed_list.index(speed)
-
-    if reg_dict["OUTPUT_MODE"][2] == 4:
-        # We are outputting A & B
-        if reg_dict["DATA_LANE_CONFIG"][2] == 1:
-            # 4 Lane speed
-            if mlx75027:
-                hmax_vec = [0x0E60, 0x0744, 0x0636, 0x057A, 0x0514]
-            else:
-                hmax_vec = [0x0860, 0x0444, 0x03A8, 0x033A, 0x02B6]
-            hmax = hmax_vec[ind]
-        else:
-            # 2 Lane speed
-            if mlx75027:
-                hmax_vec = [0x1CC0, 0x0E88, 0x0C6C, 0x0AF4, 0x0A28]
-            else:
-                hmax_vec = [0x0E80, 0x0754, 0x0644, 0x0586, 0x0514]
-            hmax = hmax_vec[ind]
-    else:
-        # We are in normal mode
-        if reg_dict["DATA_LANE_CONFIG"][2] == 1:
-            # 4 Lane speed
-            if mlx75027:
-                hmax_vec = [0x0860, 0x0444, 0x03A8, 0x033A, 0x02B6]
-            else:
-                hmax_vec = [0x0560, 0x02C4, 0x02B6, 0x02B6, 0x02B6]
-            hmax = hmax_vec[ind]
-        else:
-            # 2 Lane speed
-            if mlx75027:
-                hmax_vec = [0x0E60, 0x0744, 0x0636, 0x057A, 0x0514]
-            else:
-                hmax_vec = [0x0878, 0x0450, 0x03B2, 0x0344, 0x02BE]
-            hmax = hmax_vec[ind]
+    # A & B output doubles the data of each line, and any lane configuration other than 4 lanes is 2 lanes
+    ab_mode = reg_dict["OUTPUT_MODE"][2] == 4
+    nlanes = 4 if reg_dict["DATA_LANE_CONFIG"][2] == 1 else 2
+    hmax = get_domain_tables().hmaxes.get((bool(mlx75027), ab_mode, nlanes, speed))
+    if hmax is None:
+        raise ValueError(str(speed) + " is not a supported speed")
     return hmax
 
 
+# The resolved (speed, hmax) of each HMAX, DATA_LANE_CONFIG, OUTPUT_MODE and sensor combination
+_line_timing_cache = {}
+
+
+def calc_line_timing(reg_dict, mlx75027):
+    """
+    Resolves the MIPI speed and the HMAX value used by the timing calculations.
+    The result only depends on the HMAX_HI, HMAX_LOW, DATA_LANE_CONFIG and
+    OUTPUT_MODE registers, so it is calculated once for each combination and
+    reused until one of those registers changes.
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The dictionary that contains all the register information
+    mlx75027 : bool
+        Set to True if using the MLX75027 sensor, False
+        if using the MLX75026 sensor.
+
+    Returns
+    ----------
+    speed : int
+        The speed of the MIPI bus in megabits per second
+    hmax : int
+        The hmax value for that speed
+    """
+    key = (reg_dict["HMAX_HI"][2], reg_dict["HMAX_LOW"][2],
+           reg_dict["DATA_LANE_CONFIG"][2], reg_dict["OUTPUT_MODE"][2], bool(mlx75027))
+    try:
+        return _line_timing_cache[key]
+    except KeyError:
+        pass
+
+    speed = calc_speed(reg_dict, mlx75027)
+    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    _line_timing_cache[key] = (speed, hmax)
+    return speed, hmax
+
+
+def clear_line_timing_cache():
+    """ Clears the resolved speed and HMAX values of calc_line_timing() """
+    _line_timing_cache.clear()
+    return
+
+
 def calc_int_times(reg_dict):
     """
     Calculates the integration times of each raw frame in us
@@ -501,8 +487,7 @@ def set_int_times(reg_dict, int_times, mlx75027):
         raise RuntimeError("MLX75027 has maximum number of 8 raw frames!")
 
     # print("set_int_times")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
 
     for n in range(0, np.size(int_times)):
         reg_value = np.uint32(np.ceil(int_times[n]*120.0/hmax) * hmax)
@@ -529,8 +514,7 @@ def calc_startup_time(reg_dict, mlx75027):
     """
 
     # print("calc_startup_time")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
     value = reg_dict["FRAME_STARTUP_HI"][2] * \
         256 + reg_dict["FRAME_STARTUP_LOW"][2]
 
@@ -553,8 +537,7 @@ def set_startup_time(reg_dict, startup_time_us, mlx75027):
     """
 
     # print("set_startup_time")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
     frame_startup = int((startup_time_us*120) / hmax)
     reg_dict["FRAME_STARTUP_HI"][2] = frame_startup >> 8
     reg_dict["FRAME_STARTUP_LOW"][2] = frame_startup & 0xFF
@@ -580,8 +563,7 @@ def calc_idle_time(reg_dict, mlx75027):
     """
     idle_time = np.zeros(8)
     # print("calc_idle_time")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
 
     for n in range(0, 8):
         idle_time[n] = reg_dict["P"+str(n)+"_PHASE_IDLE"][2] * hmax / (120.0)
@@ -606,8 +588,7 @@ def set_idle_time(reg_dict, idle_times, mlx75027):
         raise RuntimeError("MLX75027 only 8 raw frame possible!")
 
     # print("set_idle_time")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
 
     for n in range(0, np.size(idle_times)):
         reg_dict["P"+str(n) +
@@ -635,8 +616,7 @@ def calc_pretime(reg_dict, mlx75027):
     """
 
     # print("calc_pretime")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
 
     # As noted in 7.12. both preheat and premix use the same register timing.
     # We are assuming that if either are enabled then.
@@ -679,8 +659,7 @@ def set_pretime(reg_dict, pretime, mlx75027):
         reg_dict["Px_PREHEAT"][2] | reg_dict["Px_PREMIX"][2])
 
     # print("set_pretime")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
 
     if pretime_enabled:
         # TODO: Add warning for this Note : FLOOR(Px_PRETIME_us*120)/HMAX) + Px_Integration should not exceed 1000us
@@ -827,8 +806,7 @@ def calc_phase_time(reg_dict, mlx75027):
     """
 
     # print("calc_phase_time")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
 
     pre_time = calc_all_pretimes(reg_dict, mlx75027)
     int_times = calc_int_times(reg_dict)
@@ -866,8 +844,7 @@ def calc_deadtime(reg_dict, mlx75027):
     """
 
     # print("calc_deadtime")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
     frame_time_reg = reg_to_value(
         reg_dict, "FRAME_TIME0", "FRAME_TIME1", "FRAME_TIME2", "FRAME_TIME3")
     frame_time_us = (frame_time_reg*hmax) / 120.0
@@ -899,8 +876,7 @@ def set_deadtime(reg_dict, dead_time, mlx75027):
     """
 
     # print("set_deadtime")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
     min_frame_time = calc_frame_time(reg_dict, mlx75027, False)
 
     frame_time_us = min_frame_time + dead_time
@@ -937,8 +913,7 @@ def set_frame_time(reg_dict, frame_time_us, mlx75027):
         return
 
     # print("set_frame_time")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
     frame_time_reg = int(np.floor(frame_time_us*120.0/hmax))
     value32_to_reg(reg_dict, frame_time_reg, "FRAME_TIME0", "FRAME_TIME1",
                    "FRAME_TIME2", "FRAME_TIME3")
@@ -964,8 +939,7 @@ def calc_frame_time(reg_dict, mlx75027, use_frame_time=False):
         The total depth frame time in micro-seconds (us)
     """
     # print("calc_frame_time()")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
 
     frame_startup = reg_dict["FRAME_STARTUP_HI"][2] * \
         256 + reg_dict["FRAME_STARTUP_LOW"][2]
@@ -1133,6 +1107,147 @@ def set_roi(reg_dict, col_start, col_end, row_start, row_end, mlx75027):
     return
 
 
+def snap_roi(col_start, col_end, row_start, row_end, binning, mlx75027):
+    """
+    Snaps regions of interest to the sizes supported by the binning modes. Binning
+    by a factor of 2**binning needs at least 8 binned columns, and a multiple of
+    4 binned columns and 2 (or the binning factor of) rows. The end is moved to the
+    supported size, and a minimum ROI past the edge of the sensor is moved back inside.
+    The arguments are arrays of candidate ROIs, or scalars, broadcast together.
+
+    Parameters
+    ----------
+    col_start : numpy.array
+        The column starts between 1 and 640 (or 320)
+    col_end : numpy.array
+        The column ends between 1 and 640 (or 320)
+    row_start : numpy.array
+        The row starts between 1 and 480 (or 240)
+    row_end : numpy.array
+        The row ends between 1 and 480 (or 240)
+    binning : numpy.array
+        The binning modes, 0 to 3, as set_binning()
+    mlx75027 : bool
+        Set to True if MLX75027, False for MLX75026
+
+    Returns
+    ----------
+    col_start : numpy.array
+    col_end : numpy.array
+    row_start : numpy.array
+    row_end : numpy.array
+    ncols : numpy.array
+        The number of columns of the output image
+    nrows : numpy.array
+        The number of rows of the output image
+    """
+    if mlx75027:
+        col_max = 640
+        row_max = 480
+    else:
+        col_max = 320
+        row_max = 240
+
+    col_start, col_end, row_start, row_end, binning = np.broadcast_arrays(
+        *[np.asarray(v, dtype=np.int64) for v in (col_start, col_end, row_start, row_end, binning)])
+    if np.any((binning < 0) | (binning > 3)):
+        raise RuntimeError("Invalid binning mode")
+
+    scale = np.left_shift(1, binning)
+    col_step = 4*scale
+    row_step = np.maximum(2, scale)
+    ncols = np.maximum(col_end - col_start + 1, 2*col_step)
+    nrows = np.maximum(row_end - row_start + 1, row_step)
+    ncols -= ncols % col_step
+    nrows -= nrows % row_step
+
+    col_start = np.minimum(col_start, col_max - ncols + 1)
+    row_start = np.minimum(row_start, row_max - nrows + 1)
+    return col_start, col_start + ncols - 1, row_start, row_start + nrows - 1, ncols // scale, nrows // scale
+
+
+def calc_img_size(reg_dict):
+    """
+    Calculates the size of the output image, the ROI divided by the binning
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The dictionary that contains all the register information
+
+    Returns
+    ----------
+    nrows : int
+        The number of rows of the output image
+    ncols : int
+        The number of columns of the output image
+    """
+    col_start, col_end, row_start, row_end = calc_roi(reg_dict)
+    binning = int(reg_dict["BINNING_MODE"][2])
+    return int(row_end - row_start + 1) >> binning, int(col_end - col_start + 1) >> binning
+
+
+def calc_bandwidth(reg_dict, mlx75027):
+    """
+    Calculates the MIPI bandwidth of the raw frames. The payload of a raw frame is
+    its output image, 12 bit values packed as RAW12, with two values per pixel
+    in the A & B output mode. The readout of a raw frame takes the ROI rows plus
+    7 lines of HMAX/120 micro-seconds each, as calc_phase_time(). The payload
+    excludes the MIPI packet headers and blanking, which use the rest of the link.
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The dictionary that contains all the register information
+    mlx75027 : bool
+        Set to True if MLX75027, False for MLX75026
+
+    Returns
+    ----------
+    bandwidth : dict
+        "nrows", "ncols" : the size of the output image
+        "frame_bytes" : the payload bytes of a raw frame on the MIPI link
+        "buffer_bytes" : the bytes of a raw frame unpacked to 16 bits per value
+        "line_time" : the time of one line, HMAX/120, in micro-seconds (us)
+        "readout_time" : the readout time of a raw frame in micro-seconds (us)
+        "link_rate" : the rate of all the MIPI lanes in megabits per second
+        "utilization" : the fraction of the link rate used during a readout
+        "raw_fps" : the raw frames per second, as calc_fps()
+        "max_raw_fps" : the raw frames per second of back to back readouts
+        "data_rate" : the payload data rate at raw_fps in megabits per second
+    """
+    output_mode = reg_dict["OUTPUT_MODE"][2]
+    if output_mode < 0 or output_mode > 4:
+        raise RuntimeError("Invalid output mode! Must be between 0 and 4")
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
+    nrows, ncols = calc_img_size(reg_dict)
+
+    nvalues = 2 if output_mode == 4 else 1
+    # RAW12 packs two values in three bytes, each line is padded to a byte
+    line_bytes = (ncols*nvalues*12 + 7) // 8
+    frame_bytes = nrows*line_bytes
+
+    roi_row_start = reg16_to_value(reg_dict, "ROI_ROW_START_LOW", "ROI_ROW_START_HI")
+    roi_row_end = reg16_to_value(reg_dict, "ROI_ROW_END_LOW", "ROI_ROW_END_HI")
+    line_time = hmax/120.0
+    readout_time = (7.0+(roi_row_end-roi_row_start+1))*line_time
+    link_rate = calc_nlanes(reg_dict)*speed
+    raw_fps = calc_fps(reg_dict, mlx75027)[1]
+
+    bandwidth = {"nrows": nrows,
+                 "ncols": ncols,
+                 "frame_bytes": frame_bytes,
+                 "buffer_bytes": nrows*ncols*nvalues*2,
+                 "line_time": line_time,
+                 "readout_time": readout_time,
+                 "link_rate": link_rate,
+                 "utilization": 8.0*frame_bytes / (link_rate*readout_time),
+                 "raw_fps": raw_fps,
+                 "max_raw_fps": 1e6 / readout_time,
+                 "data_rate": 8.0*frame_bytes*raw_fps*1e-6}
+    return bandwidth
+
+
 def calc_duty_cycle(reg_dict):
     """
     Calculate the duty cycle of the illumination. The duty cycle might want to be varied 
@@ -1150,13 +1265,15 @@ def calc_duty_cycle(reg_dict):
     duty_cycle : float 
         The duty cycle of the illumination output between 0.0 and 1.0  
     """
-    if reg_dict["DUTY_CYCLE"][2] == 0:
+    cycle = reg_dict["DUTY_CYCLE"][2]
+    if cycle == DUTY_CYCLE_OFF:
         # Duty cycle is disabled
         return 0.5
 
-    edge_change_ps = 0.5 * reg_dict["DUTY_CYCLE_VALUE"][2]
-    if reg_dict["DUTY_CYCLE"][2] == 2:
-        edge_change_ps = -1.0 * edge_change_ps
+    edge_change_ps = get_domain_tables().duty_cycle_edges.get(
+        (cycle, reg_dict["DUTY_CYCLE_VALUE"][2]))
+    if edge_change_ps is None:
+        raise ValueError("Invalid duty cycle registers")
 
     fmod = calc_mod_freq(reg_dict)
 
@@ -1179,28 +1296,26 @@ def set_duty_cycle(reg_dict, duty_cycle):
         The desired duty cycle from 0.0 to 1.0, will select the closest value. 
     """
     if duty_cycle == 0.5:
-        cycle = 0
+        cycle = DUTY_CYCLE_OFF
         value = 0
         reg_dict["DUTY_CYCLE"][2] = cycle
         reg_dict["DUTY_CYCLE_VALUE"][2] = value
         return cycle, value
 
-    if duty_cycle < 0.5:
-        cycle = 2
-    else:
-        cycle = 1
-
     fmod = calc_mod_freq(reg_dict)
     period = 1e3 / fmod
 
     # This is the value in ns,
     # duty_cycle = ( (period/2.0) + edge_change_ps ) / period
     edge_change_ps = (duty_cycle * period) - (period/2.0)
-    value_fl = np.round(np.abs(edge_change_ps) / 0.5)
-    value_int = int(value_fl)
-    # print("set_duty_cycle() - value_int: " + str(value_int))
-    if value_int > 0xF:
-        value_int = 0xF
+    steps = int(np.round(edge_change_ps / DUTY_CYCLE_STEP))
+    steps = max(-DUTY_CYCLE_MAX_VALUE, min(DUTY_CYCLE_MAX_VALUE, steps))
+    if steps == 0:
+        # Too small a change for a step, the direction is still set
+        cycle = DUTY_CYCLE_DECREASE if duty_cycle < 0.5 else DUTY_CYCLE_INCREASE
+        value_int = 0
+    else:
+        cycle, value_int = get_domain_tables().duty_cycle_codes[steps]
 
     reg_dict["DUTY_CYCLE"][2] = cycle
     reg_dict["DUTY_CYCLE_VALUE"][2] = value_int
@@ -1226,8 +1341,7 @@ def calc_pll_setup(reg_dict, mlx75027):
     """
 
     # print("calc_pll_setup()")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
 
     pll_setup = np.ceil((503.0*120.0)/hmax + 8)
     return int(pll_setup)
@@ -1252,8 +1366,7 @@ def calc_randnm7(reg_dict, mlx75027):
     """
 
     # print("calc_randnm7()")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
 
     pretime_enabled = np.any(
         reg_dict["Px_PREHEAT"][2] | reg_dict["Px_PREMIX"][2])
@@ -1289,8 +1402,7 @@ def calc_randnm0(reg_dict, mlx75027):
     """
 
     # print("calc_randnm0")
-    speed = calc_speed(reg_dict, mlx75027)
-    hmax = calc_hmax(reg_dict, mlx75027, speed=speed)
+    speed, hmax = calc_line_timing(reg_dict, mlx75027)
 
     pixrst = calc_pretime(reg_dict, mlx75027)
     randnm7 = calc_randnm7(reg_dict, mlx75027)
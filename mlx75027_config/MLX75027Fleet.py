@@ -0,0 +1,226 @@
+"""
+Refael Whyte, r.whyte@chronoptics.com
+
+Generates the register files of many MLX75027 or MLX75026 cameras, each with
+its own calibration settings, by replaying the set_* sequence of
+examples/example_configuration.py. The units are shared across a process pool,
+each worker parses the CSV register map once and forks it for every unit, and
+writes the register file of each unit as soon as it is configured.
+
+    metrics = generate_fleet("mlx75027.csv", read_units("units.csv"), "output_folder", True)
+
+examples/fleet_configuration.py runs it from the command line.
+
+The units file is a CSV file with a Unit column naming each camera, and
+optional ModFreq, IntTime, DutyCycle, AnalogDelay and PhaseOffset columns.
+An empty value uses the default setting.
+
+Copyright 2020 Refael Whyte - Chronoptics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import csv
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from mlx75027_config.CSVConfigIO import csv_import, csv_export_registers
+from mlx75027_config.MLX75027Config import set_nlanes, set_output_mode, calc_hmax, set_hmax, set_roi
+from mlx75027_config.MLX75027Config import set_mod_freq, set_nraw, set_int_times, set_binning
+from mlx75027_config.MLX75027Config import set_duty_cycle, set_phase_shift, set_analog_delay
+
+# The settings of examples/example_configuration.py, used for any setting a unit does not give
+DEFAULT_SETTINGS = {"mod_freq": 35.0,
+                    "nlanes": 2,
+                    "speed": 800,
+                    "phase_steps": [0.0, 0.25, 0.5, 0.75],
+                    "int_time": 250.0,
+                    "duty_cycle": 0.5,
+                    "roi": None,
+                    "binning": 0,
+                    "output_mode": 0,
+                    "analog_delay": None,
+                    "phase_offset": 0.0}
+
+# The full sensor ROI of the MLX75027 (True) and MLX75026 (False), used when a unit gives no ROI
+DEFAULT_ROI = {True: (1, 640, 1, 480),
+               False: (1, 320, 1, 240)}
+
+# The units file column of each setting
+UNIT_COLUMNS = {"ModFreq": "mod_freq",
+                "IntTime": "int_time",
+                "DutyCycle": "duty_cycle",
+                "AnalogDelay": "analog_delay",
+                "PhaseOffset": "phase_offset"}
+
+# The template of each worker process
+_template = None
+
+
+def configure_unit(reg_dict, settings, mlx75027):
+    """
+    Configures the sensor with the set_* sequence of examples/example_configuration.py
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The dictionary that contains all the register information
+    settings : dict
+        The settings of the unit, any setting not given uses DEFAULT_SETTINGS,
+        and the full sensor ROI of DEFAULT_ROI when no roi is given
+    mlx75027 : bool
+        Set to True if MLX75027, False for MLX75026
+    """
+    unit = dict(DEFAULT_SETTINGS)
+    unit.update(settings)
+    roi = unit["roi"]
+    if roi is None:
+        roi = DEFAULT_ROI[bool(mlx75027)]
+    col_start, col_end, row_start, row_end = roi
+    # The phase offset shifts every phase step, the shifts must still be a multiple of 1/8
+    phase_steps = np.mod(np.asarray(
+        unit["phase_steps"], dtype=np.float64) + unit["phase_offset"], 1.0)
+
+    # The update order is important!!
+    set_nlanes(reg_dict, unit["nlanes"])
+    set_output_mode(reg_dict, unit["output_mode"])
+    set_hmax(reg_dict, calc_hmax(reg_dict, mlx75027, speed=unit["speed"]))
+    set_roi(reg_dict, col_start, col_end, row_start, row_end, mlx75027)
+    set_mod_freq(reg_dict, unit["mod_freq"])
+    set_nraw(reg_dict, len(phase_steps))
+    set_int_times(reg_dict, np.full(
+        len(phase_steps), unit["int_time"]), mlx75027)
+    set_binning(reg_dict, unit["binning"])
+    set_duty_cycle(reg_dict, unit["duty_cycle"])
+    set_phase_shift(reg_dict, phase_steps)
+    if unit["analog_delay"] is not None:
+        set_analog_delay(reg_dict, unit["analog_delay"])
+    return
+
+
+def read_units(infile):
+    """
+    Reads the units file
+
+    Parameters
+    ----------
+    infile : str
+        The CSV file with a Unit column and optional ModFreq, IntTime, DutyCycle,
+        AnalogDelay and PhaseOffset columns
+
+    Returns
+    ----------
+    units : list
+        A (name, settings) tuple for each unit
+    """
+    if os.path.isfile(infile) == False:
+        raise RuntimeError("Input file not found!")
+
+    units = []
+    with open(infile, newline='', encoding='utf-8') as csvfile:
+        reader = csv.DictReader(csvfile)
+        if reader.fieldnames is None or "Unit" not in reader.fieldnames:
+            raise RuntimeError("The units file has no Unit column")
+        for row in reader:
+            settings = {}
+            for column, key in UNIT_COLUMNS.items():
+                value = row.get(column)
+                if value is not None and value.strip() != "":
+                    settings[key] = float(value)
+            units.append((row["Unit"].strip(), settings))
+    return units
+
+
+def _init_worker(csv_file):
+    global _template
+    _template = csv_import(csv_file, compiled=True)
+    return
+
+
+def _generate_unit(task):
+    """ Configures a unit from the worker's template and writes its register file """
+    name, settings, out_dir, mlx75027 = task
+    t_start = time.perf_counter()
+    error = None
+    try:
+        if name == "" or os.path.basename(name) != name:
+            raise ValueError("Invalid unit name")
+        reg_map = _template.fork()
+        configure_unit(reg_map, settings, mlx75027)
+        csv_export_registers(os.path.join(out_dir, name + ".csv"), reg_map)
+    except (ValueError, RuntimeError, KeyError) as err:
+        error = type(err).__name__ + ": " + str(err)
+    return name, time.perf_counter() - t_start, error
+
+
+def generate_fleet(csv_file, units, out_dir, mlx75027, processes=None, chunksize=16, progress=None):
+    """
+    Generates the register file of each unit, <out_dir>/<unit>.csv, across a pool of processes.
+    A unit that can not be configured is reported and does not stop the others.
+
+    Parameters
+    ----------
+    csv_file : str
+        The CSV register map, parsed once by each process
+    units : list
+        A (name, settings) tuple for each unit, as returned by read_units()
+    out_dir : str
+        The folder the register files are written to, created if it does not exist
+    mlx75027 : bool
+        Set to True if MLX75027, False for MLX75026
+    processes : int, optional
+        The number of worker processes, defaults to the number of CPUs, 1 runs in this process
+    chunksize : int, optional
+        The number of units sent to a worker at a time
+    progress : callable, optional
+        Called as progress(ndone, nunits, name, unit_time, error) after each unit
+
+    Returns
+    ----------
+    metrics : dict
+        The number of units and failed units, the failures as a dict of unit name to error,
+        the total_time, the mean_unit_time and max_unit_time in seconds, and units_per_second
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(name, settings, out_dir, mlx75027) for name, settings in units]
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    t_start = time.perf_counter()
+    failures = {}
+    unit_times = []
+
+    def record(result):
+        name, unit_time, error = result
+        unit_times.append(unit_time)
+        if error is not None:
+            failures[name] = error
+        if progress is not None:
+            progress(len(unit_times), len(tasks), name, unit_time, error)
+        return
+
+    if processes == 1 or len(tasks) <= 1:
+        _init_worker(csv_file)
+        for task in tasks:
+            record(_generate_unit(task))
+    else:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(csv_file,)) as pool:
+            # The results arrive as each chunk finishes, the register files are already written
+            for result in pool.imap_unordered(_generate_unit, tasks, chunksize=chunksize):
+                record(result)
+
+    total_time = time.perf_counter() - t_start
+    return {"units": len(tasks),
+            "failed": len(failures),
+            "failures": failures,
+            "total_time": total_time,
+            "mean_unit_time": float(np.mean(unit_times)) if unit_times else 0.0,
+            "max_unit_time": float(np.max(unit_times)) if unit_times else 0.0,
+            "units_per_second": len(tasks) / total_time if total_time > 0 else 0.0}
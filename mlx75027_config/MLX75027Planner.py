@@ -0,0 +1,206 @@
+"""
+Refael Whyte, r.whyte@chronoptics.com
+
+Plans multi-frequency MLX75027 or MLX75026 depth sequences. A depth sequence
+made of several modulation frequencies is unambiguous up to the range of the
+greatest common divisor of the frequencies. The planner only chooses from the
+frequencies set_mod_freq() can produce, which are all multiples of 1/32 MHz,
+so the greatest common divisor is found exactly with integers.
+
+Copyright 2020 Refael Whyte - Chronoptics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import copy
+import itertools
+
+import numpy as np
+
+from mlx75027_config.MLX75027Config import set_mod_freq, calc_frame_time
+from mlx75027_config.RegisterMapping import RegisterMap
+
+# The speed of light in m/s
+SPEED_OF_LIGHT = 299792458.0
+
+# The (start MHz, end MHz, DIVSELPRE, DIVSEL) bands set_mod_freq() uses, the end is exclusive
+MOD_FREQ_BANDS = [(100.0, 101.0, 3, 0), (75.0, 100.0, 0, 0), (51.0, 75.0, 1, 0),
+                  (38.0, 51.0, 0, 1), (21.0, 38.0, 1, 1), (19.0, 21.0, 0, 2),
+                  (10.0, 19.0, 1, 2), (5.0, 10.0, 2, 2), (4.0, 5.0, 3, 2)]
+
+# Every producible frequency is a multiple of this fraction of a MHz
+_FREQ_STEPS = 32
+# The number of common divisors tried at once
+_DIVISOR_BLOCK = 64
+
+_mod_freq_table = None
+
+
+def calc_mod_freq_table():
+    """
+    Returns every modulation frequency set_mod_freq() can produce, the table is
+    calculated on the first call.
+
+    Returns
+    ----------
+    mod_freqs : numpy.array
+        The modulation frequencies in MHz, in ascending order
+    fmod : numpy.array
+        The FMOD register value of each frequency
+    divselpre : numpy.array
+        The DIVSELPRE register value of each frequency
+    divsel : numpy.array
+        The DIVSEL register value of each frequency
+    """
+    global _mod_freq_table
+    if _mod_freq_table is None:
+        fmods = []
+        divselpres = []
+        divsels = []
+        for start, end, divselpre, divsel in MOD_FREQ_BANDS:
+            # The frequency is FMOD / (2**DIVSELPRE * 2**DIVSEL)
+            mult = (1 << divselpre) * (1 << divsel)
+            fmod = np.arange(int(start*mult), int(min(end, 100.0 + 1.0/mult)*mult))
+            fmods.append(fmod)
+            divselpres.append(np.full(fmod.size, divselpre))
+            divsels.append(np.full(fmod.size, divsel))
+        fmod = np.concatenate(fmods)
+        divselpre = np.concatenate(divselpres)
+        divsel = np.concatenate(divsels)
+        mod_freqs = fmod / ((1 << divselpre) * (1 << divsel))
+
+        order = np.argsort(mod_freqs, kind="stable")
+        _mod_freq_table = tuple(arr[order] for arr in (mod_freqs, fmod, divselpre, divsel))
+        for arr in _mod_freq_table:
+            arr.flags.writeable = False
+    return _mod_freq_table
+
+
+def calc_unambiguous_range(mod_freqs):
+    """
+    Calculates the unambiguous range of a set of modulation frequencies, the range
+    of their greatest common divisor.
+
+    Parameters
+    ----------
+    mod_freqs : numpy.array
+        The modulation frequencies in MHz, multiples of 1/32 MHz
+
+    Returns
+    ----------
+    unambiguous_range : float
+        The unambiguous range in meters
+    """
+    steps = np.round(np.asarray(mod_freqs, dtype=np.float64) * _FREQ_STEPS)
+    if np.any(np.abs(steps / _FREQ_STEPS - mod_freqs) > 1e-9):
+        raise ValueError("Modulation frequencies must be multiples of 1/32 MHz")
+    common = np.gcd.reduce(steps.astype(np.int64))
+    return SPEED_OF_LIGHT / (2.0 * common * 1e6 / _FREQ_STEPS)
+
+
+def _best_subset(multiples, nfreqs):
+    """ Returns the subset of multiples with no common divisor and the highest frequencies, or None """
+    best = None
+    for subset in itertools.combinations(multiples.tolist(), nfreqs):
+        if np.gcd.reduce(subset) != 1:
+            continue
+        score = sum(m*m for m in subset)
+        if best is None or score > best[0]:
+            best = (score, subset)
+    if best is None:
+        return None
+    return best[1]
+
+
+def plan_mod_freqs(reg_dict, mlx75027, frame_budget_us, nfreqs=None, min_freq=10.0, max_freq=100.0,
+                   max_multiple=10):
+    """
+    Plans a depth sequence of two or three modulation frequencies with the longest
+    unambiguous range, within a frame time budget. The frequencies are integer multiples
+    of their greatest common divisor, up to max_multiple, which limits how much noise
+    the phase unwrapping can tolerate. Of the frequencies with the longest range the
+    highest are chosen, for the best precision.
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The configuration of each frequency, it is not modified
+    mlx75027 : bool
+        Set to True if MLX75027, False for MLX75026
+    frame_budget_us : float
+        The time in micro-seconds (us) available for the whole sequence
+    nfreqs : int, optional
+        The number of frequencies, 2 or 3, defaults to as many as fit in the budget
+    min_freq : float, optional
+        The lowest modulation frequency in MHz
+    max_freq : float, optional
+        The highest modulation frequency in MHz
+    max_multiple : int, optional
+        The largest multiple of the greatest common divisor a frequency may be
+
+    Returns
+    ----------
+    reg_dicts : list
+        A copy of the configuration for each frequency, with the frequency set
+    plan : dict
+        The mod_freqs in MHz, the unambiguous_range in meters, the frame_times of each
+        configuration and the total frame_time in micro-seconds, and the depth_fps of the sequence
+    """
+    frame_time = calc_frame_time(reg_dict, mlx75027, use_frame_time=True)
+    nfit = int(frame_budget_us // frame_time)
+    if nfreqs is None:
+        nfreqs = min(3, max(2, nfit))
+    if nfreqs < 2 or nfreqs > 3:
+        raise RuntimeError("The sequence must have 2 or 3 frequencies")
+    if nfreqs > nfit:
+        raise RuntimeError("The frame budget fits " + str(nfit) + " frames of " +
+                           str(frame_time) + " us")
+
+    mod_freqs = calc_mod_freq_table()[0]
+    steps = np.round(mod_freqs[(mod_freqs >= min_freq) & (
+        mod_freqs <= max_freq)] * _FREQ_STEPS).astype(np.int64)
+    if steps.size < nfreqs:
+        raise RuntimeError("Not enough modulation frequencies in the range")
+
+    # The common divisors, in steps, are tried from the smallest, the longest unambiguous range,
+    # a block at a time so the search usually stops in the first block
+    chosen = None
+    first = max(1, steps[0] // max_multiple)
+    for start in range(first, steps[-1] + 1, _DIVISOR_BLOCK):
+        divisors = np.arange(start, min(start + _DIVISOR_BLOCK, steps[-1] + 1))
+        multiple = (steps[None, :] % divisors[:, None]) == 0
+        multiple &= (steps[None, :] // divisors[:, None]) <= max_multiple
+        counts = np.sum(multiple, axis=1)
+        for ind in np.nonzero(counts >= nfreqs)[0]:
+            subset = _best_subset(
+                steps[multiple[ind]] // divisors[ind], nfreqs)
+            if subset is not None:
+                chosen = np.array(subset) * divisors[ind] / _FREQ_STEPS
+                break
+        if chosen is not None:
+            break
+    if chosen is None:
+        raise RuntimeError("No modulation frequencies meet the requirements")
+
+    reg_dicts = []
+    frame_times = []
+    for mod_freq in chosen:
+        if isinstance(reg_dict, RegisterMap):
+            reg = reg_dict.fork()
+        else:
+            reg = copy.deepcopy(reg_dict)
+        set_mod_freq(reg, mod_freq)
+        reg_dicts.append(reg)
+        frame_times.append(calc_frame_time(reg, mlx75027, use_frame_time=True))
+
+    total_time = float(np.sum(frame_times))
+    plan = {"mod_freqs": chosen,
+            "unambiguous_range": calc_unambiguous_range(chosen),
+            "frame_times": np.array(frame_times),
+            "frame_time": total_time,
+            "depth_fps": 1.0 / (total_time*1e-6)}
+    return reg_dicts, plan
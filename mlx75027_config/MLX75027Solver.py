@@ -0,0 +1,261 @@
+"""
+Refael Whyte, r.whyte@chronoptics.com
+
+Solves for the MLX75027 or MLX75026 configuration that meets a set of timing
+requirements, instead of iterating set_int_times(), set_nlanes(), calc_hmax()
+and calc_fps() by hand. The discrete search space is the number of MIPI lanes
+and the MIPI speed. Candidates are visited in order of a lower bound on their
+frame time, which only depends on HMAX, and the search stops once no remaining
+candidate can improve on the best found. The integration time of each candidate
+is solved for directly, as the frame time is linear in the integration time register.
+
+Copyright 2020 Refael Whyte - Chronoptics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+
+from mlx75027_config.MLX75027Config import set_nlanes, set_output_mode, set_hmax, calc_hmax
+from mlx75027_config.MLX75027Config import calc_line_timing, set_roi, set_mod_freq, set_nraw, calc_nraw
+from mlx75027_config.MLX75027Config import calc_pretime, set_pretime, set_int_times, calc_frame_time, set_frame_time
+from mlx75027_config.MLX75027Config import calc_fps
+from mlx75027_config.SensorConfig import reg16_to_value
+from mlx75027_config.RegisterMapping import RegisterMap, compile_reg_dict
+
+# The MIPI speeds in Mbps supported by calc_hmax()
+MIPI_SPEEDS = [300, 600, 704, 800, 960]
+
+
+class _Candidate:
+    """ A line timing to try, and the lower bound of its frame time without the integration time """
+
+    def __init__(self, reg_dict, nlanes, speed, hmax, fixed_bound):
+        self.reg_dict = reg_dict
+        self.nlanes = nlanes
+        self.speed = speed
+        self.hmax = hmax
+        self.fixed_bound = fixed_bound
+
+
+def _candidates(reg_dict, mlx75027, nraw, mod_freq, roi, output_mode, pretime, max_lanes, max_speed):
+    """
+    Returns the candidate line timings, each a copy of the configuration with the
+    requirements applied, sorted by the lower bound of their frame time.
+    """
+    # The candidates are forks of a compiled map, which are cheaper than copies of a dict
+    base = compile_reg_dict(reg_dict)
+    if output_mode is not None:
+        set_output_mode(base, output_mode)
+    if roi is not None:
+        col_start, col_end, row_start, row_end = roi
+        set_roi(base, col_start, col_end, row_start, row_end, mlx75027)
+    if mod_freq is not None:
+        set_mod_freq(base, mod_freq)
+    set_nraw(base, nraw)
+    if pretime is None:
+        pretime = calc_pretime(reg_dict, mlx75027)
+
+    # The readout rows and frame startup are counted in lines of HMAX
+    rows = (reg16_to_value(base, "ROI_ROW_END_LOW", "ROI_ROW_END_HI") -
+            reg16_to_value(base, "ROI_ROW_START_LOW", "ROI_ROW_START_HI") + 1)
+    startup = reg16_to_value(base, "FRAME_STARTUP_LOW", "FRAME_STARTUP_HI")
+    nlines = startup + nraw*(7 + rows)
+
+    lanes = [2, 4] if max_lanes >= 4 else [2]
+    candidates = {}
+    for nlanes in lanes:
+        lane_reg = base.fork()
+        set_nlanes(lane_reg, nlanes)
+        for speed in MIPI_SPEEDS:
+            if speed > max_speed:
+                continue
+            hmax = calc_hmax(lane_reg, mlx75027, speed=speed)
+            if (nlanes, hmax) in candidates:
+                # The same line timing at a higher speed
+                continue
+            reg = lane_reg.fork()
+            set_hmax(reg, hmax)
+            try:
+                speed, hmax = calc_line_timing(reg, mlx75027)
+                set_pretime(reg, pretime, mlx75027)
+            except (ValueError, RuntimeError):
+                # Not a supported line timing for these settings
+                continue
+            candidates[(nlanes, hmax)] = _Candidate(
+                reg, nlanes, speed, hmax, 500.0 + nlines*hmax/120.0)
+
+    return sorted(candidates.values(), key=lambda c: (c.fixed_bound, c.nlanes, c.speed))
+
+
+def _solution(cand, base, mlx75027, int_time, evaluated):
+    """ Returns the solved configuration, as the same type as the base, and a summary of it """
+    depth_fps, raw_fps = calc_fps(cand.reg_dict, mlx75027)
+    solution = {"nlanes": cand.nlanes,
+                "speed": cand.speed,
+                "hmax": cand.hmax,
+                "int_time": int_time,
+                "frame_time": calc_frame_time(cand.reg_dict, mlx75027, use_frame_time=True),
+                "depth_fps": depth_fps,
+                "raw_fps": raw_fps,
+                "evaluated": evaluated}
+    if isinstance(base, RegisterMap):
+        return cand.reg_dict, solution
+    return cand.reg_dict.to_dict(), solution
+
+
+def solve_max_fps(reg_dict, mlx75027, min_int_time, nraw=None, mod_freq=None, roi=None,
+                  output_mode=None, pretime=None, max_lanes=4, max_speed=960):
+    """
+    Finds the number of lanes and MIPI speed with the highest depth frame rate.
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The base configuration, it is not modified
+    mlx75027 : bool
+        Set to True if MLX75027, False for MLX75026
+    min_int_time : float
+        The integration time of every raw frame in micro-seconds (us)
+    nraw : int, optional
+        The number of raw frames, defaults to the base configuration
+    mod_freq : float, optional
+        The modulation frequency in MHz
+    roi : tuple, optional
+        The (col_start, col_end, row_start, row_end) region of interest
+    output_mode : int, optional
+        The data output mode, defaults to the base configuration
+    pretime : float, optional
+        The pretime in micro-seconds (us), defaults to the base configuration
+    max_lanes : int, optional
+        The number of MIPI lanes available, 2 or 4
+    max_speed : int, optional
+        The maximum MIPI speed in Mbps
+
+    Returns
+    ----------
+    reg_dict : dict
+        A copy of the base configuration with the solution applied
+    solution : dict
+        The nlanes, speed, hmax, int_time, frame_time, depth_fps, raw_fps and
+        the number of candidates evaluated
+    """
+    if nraw is None:
+        nraw = calc_nraw(reg_dict)
+    candidates = _candidates(reg_dict, mlx75027, nraw, mod_freq, roi, output_mode,
+                             pretime, max_lanes, max_speed)
+
+    best = None
+    best_time = np.inf
+    evaluated = 0
+    for cand in candidates:
+        if cand.fixed_bound + nraw*min_int_time >= best_time:
+            # The remaining candidates can not have a shorter frame time
+            break
+        evaluated += 1
+        set_int_times(cand.reg_dict, np.full(nraw, min_int_time), mlx75027)
+        frame_time = calc_frame_time(cand.reg_dict, mlx75027)
+        if frame_time < best_time:
+            best = cand
+            best_time = frame_time
+
+    if best is None:
+        raise RuntimeError("No supported line timing for the requirements")
+    set_frame_time(best.reg_dict, 0, mlx75027)
+    int_time = np.ceil(min_int_time*120.0/best.hmax)*best.hmax/120.0
+    return _solution(best, reg_dict, mlx75027, int_time, evaluated)
+
+
+def solve_int_time(reg_dict, mlx75027, target_fps, min_int_time, max_int_time=None, nraw=None,
+                   mod_freq=None, roi=None, output_mode=None, pretime=None, max_lanes=4, max_speed=960):
+    """
+    Finds the longest integration time that still meets a target depth frame rate.
+    The FRAME_TIME register is set so the sensor runs at the target frame rate.
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The base configuration, it is not modified
+    mlx75027 : bool
+        Set to True if MLX75027, False for MLX75026
+    target_fps : float
+        The depth frame rate to meet
+    min_int_time : float
+        The shortest acceptable integration time of every raw frame in micro-seconds (us)
+    max_int_time : float, optional
+        The longest integration time in micro-seconds (us)
+    nraw : int, optional
+        The number of raw frames, defaults to the base configuration
+    mod_freq : float, optional
+        The modulation frequency in MHz
+    roi : tuple, optional
+        The (col_start, col_end, row_start, row_end) region of interest
+    output_mode : int, optional
+        The data output mode, defaults to the base configuration
+    pretime : float, optional
+        The pretime in micro-seconds (us), defaults to the base configuration
+    max_lanes : int, optional
+        The number of MIPI lanes available, 2 or 4
+    max_speed : int, optional
+        The maximum MIPI speed in Mbps
+
+    Returns
+    ----------
+    reg_dict : dict
+        A copy of the base configuration with the solution applied
+    solution : dict
+        The nlanes, speed, hmax, int_time, frame_time, depth_fps, raw_fps and
+        the number of candidates evaluated
+    """
+    if target_fps <= 0:
+        raise ValueError("The target frame rate must be positive")
+    if nraw is None:
+        nraw = calc_nraw(reg_dict)
+    frame_budget = 1e6 / target_fps
+    candidates = _candidates(reg_dict, mlx75027, nraw, mod_freq, roi, output_mode,
+                             pretime, max_lanes, max_speed)
+
+    best = None
+    best_int = None
+    evaluated = 0
+    for cand in candidates:
+        # The longest integration time if the rest of the frame took its lower bound
+        int_bound = (frame_budget - cand.fixed_bound) / nraw
+        if max_int_time is not None:
+            int_bound = min(int_bound, max_int_time)
+        if best is not None and int_bound <= best_int:
+            break
+        evaluated += 1
+        hmax = cand.hmax
+        set_int_times(cand.reg_dict, np.full(nraw, min_int_time), mlx75027)
+        min_lines = int(np.ceil(min_int_time*120.0/hmax))
+        min_time = calc_frame_time(cand.reg_dict, mlx75027)
+
+        # The frame time grows by nraw*hmax/120 us for each line of integration
+        lines = min_lines + int(np.floor((frame_budget - min_time)*120.0/(nraw*hmax)))
+        if max_int_time is not None:
+            lines = min(lines, int(np.floor(max_int_time*120.0/hmax)))
+        while lines >= min_lines:
+            # Just under the whole number of lines, so set_int_times() rounds up to it
+            set_int_times(cand.reg_dict, np.full(
+                nraw, (lines*hmax - 0.5)/120.0), mlx75027)
+            if calc_frame_time(cand.reg_dict, mlx75027) <= frame_budget:
+                break
+            lines -= 1
+        if lines < min_lines:
+            continue
+
+        int_time = lines*hmax/120.0
+        if best is None or int_time > best_int:
+            best = cand
+            best_int = int_time
+
+    if best is None:
+        raise RuntimeError("No configuration meets the target frame rate")
+    # Each candidate is a separate copy, so the best still has its integration time set
+    set_frame_time(best.reg_dict, frame_budget, mlx75027)
+    return _solution(best, reg_dict, mlx75027, best_int, evaluated)
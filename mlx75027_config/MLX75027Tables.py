@@ -0,0 +1,156 @@
+"""
+Refael Whyte, r.whyte@chronoptics.com
+
+Lookup tables of the discrete MLX75027 and MLX75026 register domains, the
+phase shifts, the MIPI speed of each HMAX value, the HMAX value of each speed,
+lane and output mode, the duty cycle codes and the analog delay steps. The
+tables are built on the first call to get_domain_tables() and shared by the
+functions in MLX75027Config.py, so each lookup is a single dict access.
+
+Copyright 2020 Refael Whyte - Chronoptics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+# The MIPI speeds in Mbps, in the order of the HMAX lists
+SPEEDS = (300, 600, 704, 800, 960)
+
+# The HMAX values calc_speed() recognises for each speed, keyed by mlx75027
+_SPEED_HMAX = {True: {300: [0x0E78, 0x0860, 0x1A80, 0x0E60],
+                      600: [0x0750, 0x0444, 0x0D54, 0x0744],
+                      704: [0x0640, 0x03A8, 0x0B60, 0x0636],
+                      800: [0x0584, 0x0338, 0x0A06, 0x057A],
+                      960: [0x049E, 0x02B6, 0x0860, 0x0514]},
+               False: {300: [0x0878, 0x0560, 0x0E80, 0x0860],
+                       600: [0x0450, 0x02C4, 0x0754, 0x0444],
+                       704: [0x03B2, 0x02B6, 0x0644, 0x03A8],
+                       800: [0x0344, 0x02B6, 0x0586, 0x033A],
+                       960: [0x02BE, 0x02B6, 0x0514, 0x02B6]}}
+
+# Extra HMAX values of 800 Mbps, for either sensor
+_HMAX_800 = (824, 826)
+
+# The HMAX value of each speed calc_hmax() uses, keyed by (mlx75027, A & B output, nlanes)
+_LINE_HMAX = {(True, True, 4): [0x0E60, 0x0744, 0x0636, 0x057A, 0x0514],
+              (False, True, 4): [0x0860, 0x0444, 0x03A8, 0x033A, 0x02B6],
+              (True, True, 2): [0x1CC0, 0x0E88, 0x0C6C, 0x0AF4, 0x0A28],
+              (False, True, 2): [0x0E80, 0x0754, 0x0644, 0x0586, 0x0514],
+              (True, False, 4): [0x0860, 0x0444, 0x03A8, 0x033A, 0x02B6],
+              (False, False, 4): [0x0560, 0x02C4, 0x02B6, 0x02B6, 0x02B6],
+              (True, False, 2): [0x0E60, 0x0744, 0x0636, 0x057A, 0x0514],
+              (False, False, 2): [0x0878, 0x0450, 0x03B2, 0x0344, 0x02BE]}
+
+# The number of phase shift steps in a modulation period
+PHASE_STEPS = 8
+
+# The DUTY_CYCLE register values, and the largest DUTY_CYCLE_VALUE
+DUTY_CYCLE_OFF = 0
+DUTY_CYCLE_INCREASE = 1
+DUTY_CYCLE_DECREASE = 2
+DUTY_CYCLE_MAX_VALUE = 0xF
+# The edge change of one DUTY_CYCLE_VALUE step
+DUTY_CYCLE_STEP = 0.5
+
+# The (upper modulation frequency in MHz, coarse delay steps per period) of each analog delay band
+ADELAY_BANDS = ((21.0, 32), (51.0, 16), (101.0, 8))
+# The step of ADELAY_FINE and ADELAY_SFINE in seconds, and their largest values, the delay is linear in them
+ADELAY_FINE_STEP = 75e-12
+ADELAY_FINE_MAX = 71
+ADELAY_SFINE_STEP = 20e-12
+ADELAY_SFINE_MAX = 3
+
+
+class DomainTables:
+    """
+    The lookup tables of the discrete register domains, each a dict or tuple.
+
+    Attributes
+    ----------
+    phase_shifts : tuple
+        The phase shift in [0,1) of each P*_PHASE_SHIFT value
+    phase_shift_codes : dict
+        The P*_PHASE_SHIFT value of each phase shift
+    speeds : dict
+        The MIPI speed of each (mlx75027, hmax), as calc_speed() returns
+    hmaxes : dict
+        The HMAX value of each (mlx75027, A & B output, nlanes, speed), as calc_hmax() returns
+    line_modes : dict
+        The (A & B output, nlanes, speed) combinations of each (mlx75027, hmax) in hmaxes
+    duty_cycle_edges : dict
+        The signed edge change of each (DUTY_CYCLE, DUTY_CYCLE_VALUE)
+    duty_cycle_codes : dict
+        The (DUTY_CYCLE, DUTY_CYCLE_VALUE) of each non zero signed number of steps
+    adelay_edges : tuple
+        The upper modulation frequency of each analog delay band
+    adelay_steps : tuple
+        The coarse delay steps per period of each analog delay band
+    """
+
+    def __init__(self):
+        self.phase_shifts = tuple(
+            code/float(PHASE_STEPS) for code in range(0, PHASE_STEPS))
+        self.phase_shift_codes = {shift: code for code,
+                                  shift in enumerate(self.phase_shifts)}
+
+        self.speeds = {}
+        for mlx75027, speed_hmax in _SPEED_HMAX.items():
+            # The first speed that lists an HMAX value wins, as in calc_speed()
+            for speed in SPEEDS:
+                for hmax in speed_hmax[speed]:
+                    self.speeds.setdefault((mlx75027, hmax), speed)
+            for hmax in _HMAX_800:
+                self.speeds.setdefault((mlx75027, hmax), 800)
+
+        self.hmaxes = {}
+        self.line_modes = {}
+        for (mlx75027, ab_mode, nlanes), hmax_vec in _LINE_HMAX.items():
+            for speed, hmax in zip(SPEEDS, hmax_vec):
+                self.hmaxes[(mlx75027, ab_mode, nlanes, speed)] = hmax
+                self.line_modes.setdefault((mlx75027, hmax), []).append(
+                    (ab_mode, nlanes, speed))
+        self.line_modes = {key: tuple(sorted(modes))
+                           for key, modes in self.line_modes.items()}
+
+        # The DUTY_CYCLE register has 3 bits, the unused values behave as an increase
+        self.duty_cycle_edges = {}
+        for cycle in range(0, 8):
+            if cycle == DUTY_CYCLE_OFF:
+                sign = 0.0
+            elif cycle == DUTY_CYCLE_DECREASE:
+                sign = -1.0
+            else:
+                sign = 1.0
+            for value in range(0, DUTY_CYCLE_MAX_VALUE + 1):
+                self.duty_cycle_edges[(cycle, value)] = sign * \
+                    DUTY_CYCLE_STEP * value
+        self.duty_cycle_codes = {}
+        for value in range(1, DUTY_CYCLE_MAX_VALUE + 1):
+            self.duty_cycle_codes[value] = (DUTY_CYCLE_INCREASE, value)
+            self.duty_cycle_codes[-value] = (DUTY_CYCLE_DECREASE, value)
+
+        self.adelay_edges = tuple(edge for edge, steps in ADELAY_BANDS)
+        self.adelay_steps = tuple(steps for edge, steps in ADELAY_BANDS)
+        return
+
+
+_domain_tables = None
+
+
+def get_domain_tables():
+    """
+    Returns the lookup tables of the discrete register domains, the tables
+    are built on the first call.
+
+    Returns
+    ----------
+    tables : DomainTables
+        The shared lookup tables, which must not be modified
+    """
+    global _domain_tables
+    if _domain_tables is None:
+        _domain_tables = DomainTables()
+    return _domain_tables
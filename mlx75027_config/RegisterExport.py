@@ -0,0 +1,310 @@
+"""
+Refael Whyte, r.whyte@chronoptics.com
+
+Streaming writers of the register values of many configurations to a single
+output. Each configuration is packed into arrays of register addresses and
+values once, and written in one of the formats
+
+    * csv - a Config, Register, Value row for each register of each configuration
+    * c - a C header with a {address, value} array for each configuration
+    * raw - a binary stream, for each configuration the little endian uint32 number
+      of registers followed by a uint16 address and uint8 value for each register
+    * ndjson - a JSON object for each configuration with its name, addresses and values, one per line
+
+format_registers() yields the encoded bytes for a pipeline, and a
+RegisterStreamWriter writes configurations to a file as they are given to it.
+
+    with RegisterStreamWriter("fleet.csv", "csv") as writer:
+        for name, reg_map in configs:
+            writer.write(reg_map, name)
+
+Copyright 2020 Refael Whyte - Chronoptics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import itertools
+import json
+import re
+import struct
+
+import numpy as np
+
+from mlx75027_config.CSVConfigIO import dict_to_registers
+from mlx75027_config.RegisterMapping import RegisterMap
+
+REGISTER_FORMATS = ("csv", "c", "raw", "ndjson")
+
+# A register of the raw format
+RAW_RECORD = np.dtype([("address", "<u2"), ("value", "u1")])
+_RAW_COUNT = struct.Struct("<I")
+
+# The hex strings of the 8 bit register values
+_HEX_VALUES = ["0x{:02X}".format(value) for value in range(0, 256)]
+
+
+def pack_register_arrays(reg_dict):
+    """
+    Packs the fields into arrays of register addresses and values
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The dictionary that contains all the register information, or a RegisterMap
+
+    Returns
+    ----------
+    addresses : numpy.array
+        The address of each register, in the order of dict_to_registers()
+    values : numpy.array
+        The value of each register
+    """
+    if isinstance(reg_dict, RegisterMap):
+        reg_dict.pack_registers()
+        return reg_dict.layout.register_addresses, reg_dict._state.registers.copy()
+    registers = dict_to_registers(reg_dict)
+    addresses = np.fromiter(registers.keys(), dtype=np.int64, count=len(registers))
+    values = np.fromiter(registers.values(), dtype=np.int64, count=len(registers))
+    return addresses, values
+
+
+def _hex_strings(values, width):
+    # Most register values are 8 bit, and are looked up rather than formatted
+    if width == 2 and values.size > 0 and values.min() >= 0 and values.max() < 256:
+        return [_HEX_VALUES[value] for value in values.tolist()]
+    fmt = "0x{:0" + str(width) + "X}"
+    return [fmt.format(value) for value in values.tolist()]
+
+
+def _csv_field(name):
+    if any(c in name for c in ',"\r\n'):
+        return '"' + name.replace('"', '""') + '"'
+    return name
+
+
+def _c_identifier(name):
+    # Only ASCII letters and digits are valid in a C identifier
+    identifier = re.sub(r"[^0-9A-Za-z_]", "_", name)
+    if identifier == "" or identifier[0].isdigit():
+        identifier = "_" + identifier
+    return identifier
+
+
+class _Encoder:
+    """ Encodes the header and each configuration of a format as bytes """
+
+    def __init__(self, fmt):
+        if fmt not in REGISTER_FORMATS:
+            raise ValueError("Unknown register format: " + str(fmt))
+        self.fmt = fmt
+        # The address strings of the last layout, which are the same for most configurations
+        self._addresses = None
+        self._address_strings = None
+        # The number of configurations encoded, and the C identifiers used, in upper case as the macros
+        self._count = 0
+        self._identifiers = set()
+
+    def _address_list(self, addresses):
+        if self._addresses is None or not np.array_equal(self._addresses, addresses):
+            self._addresses = np.array(addresses)
+            self._address_strings = _hex_strings(self._addresses, 4)
+        return self._address_strings
+
+    def _c_unique_identifier(self, name, index):
+        """ The C identifier of a name, with the configuration index added if it is already used """
+        identifier = _c_identifier(name)
+        if identifier.upper() in self._identifiers:
+            identifier += "_" + str(index)
+            while identifier.upper() in self._identifiers:
+                identifier += "_"
+        self._identifiers.add(identifier.upper())
+        return identifier
+
+    def header(self):
+        if self.fmt == "csv":
+            return b"Config,Register,Value\r\n"
+        elif self.fmt == "c":
+            return (b"/* Register configurations, {address, value} pairs */\n"
+                    b"#pragma once\n\n#include <stdint.h>\n")
+        return b""
+
+    def config(self, name, addresses, values):
+        index = self._count
+        self._count += 1
+        if self.fmt == "csv":
+            prefix = _csv_field(name) + ","
+            return "".join([prefix + address + "," + value + "\r\n" for address, value in zip(
+                self._address_list(addresses), _hex_strings(values, 2))]).encode("utf-8")
+        elif self.fmt == "c":
+            identifier = self._c_unique_identifier(name, index)
+            rows = ",\n".join(["    {" + address + ", " + value + "}" for address, value in zip(
+                self._address_list(addresses), _hex_strings(values, 2))])
+            return ("\n#define " + identifier.upper() + "_COUNT " + str(len(values)) +
+                    "\nstatic const uint16_t " + identifier + "[][2] = {\n" + rows + "\n};\n").encode("utf-8")
+        elif self.fmt == "raw":
+            if np.any(addresses > 0xFFFF) or np.any(values > 0xFF) or np.any(values < 0):
+                raise ValueError("Raw format registers must be 16 bit addresses with 8 bit values")
+            records = np.empty(len(values), dtype=RAW_RECORD)
+            records["address"] = addresses
+            records["value"] = values
+            return _RAW_COUNT.pack(len(values)) + records.tobytes()
+        return (json.dumps({"name": name, "addresses": np.asarray(addresses).tolist(),
+                            "values": np.asarray(values).tolist()}) + "\n").encode("utf-8")
+
+
+def format_registers(reg_states, fmt="csv", names=None):
+    """
+    Encodes the registers of many configurations, one configuration at a time
+
+    Parameters
+    ----------
+    reg_states : iterable
+        The reg_dicts or RegisterMaps, can be a generator
+    fmt : str, optional
+        The format, "csv", "c", "raw" or "ndjson"
+    names : iterable, optional
+        The name of each configuration, defaults to config0, config1, ...
+
+    Yields
+    ----------
+    chunk : bytes
+        The header, then the encoding of each configuration
+    """
+    encoder = _Encoder(fmt)
+    header = encoder.header()
+    if header:
+        yield header
+    if names is None:
+        names = ("config" + str(n) for n in itertools.count())
+    for name, reg_dict in zip(names, reg_states):
+        addresses, values = pack_register_arrays(reg_dict)
+        yield encoder.config(str(name), addresses, values)
+
+
+class RegisterStreamWriter:
+    """
+    Writes the registers of many configurations to a single output, each
+    configuration is written when it is given.
+
+    Parameters
+    ----------
+    outfile : str or file
+        The file to write to, or a file object opened for writing bytes which is not closed
+    fmt : str, optional
+        The format, "csv", "c", "raw" or "ndjson"
+    """
+
+    def __init__(self, outfile, fmt="csv"):
+        self._encoder = _Encoder(fmt)
+        if isinstance(outfile, str):
+            self._file = open(outfile, "wb")
+            self._owned = True
+        else:
+            self._file = outfile
+            self._owned = False
+        self.count = 0
+        self._file.write(self._encoder.header())
+        return
+
+    def write(self, reg_dict, name=None):
+        """
+        Writes the registers of a configuration
+
+        Parameters
+        ----------
+        reg_dict : dict
+            The dictionary that contains all the register information, or a RegisterMap
+        name : str, optional
+            The name of the configuration, defaults to config<n>
+        """
+        if self._file is None:
+            raise RuntimeError("The writer is closed")
+        if name is None:
+            name = "config" + str(self.count)
+        addresses, values = pack_register_arrays(reg_dict)
+        self._file.write(self._encoder.config(str(name), addresses, values))
+        self.count += 1
+        return
+
+    def close(self):
+        """ Closes the file if the writer opened it, otherwise flushes it """
+        if self._file is None:
+            return
+        if self._owned:
+            self._file.close()
+        else:
+            self._file.flush()
+        self._file = None
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def export_registers(outfile, reg_states, fmt="csv", names=None):
+    """
+    Writes the registers of many configurations to a single file
+
+    Parameters
+    ----------
+    outfile : str
+        The file to write to
+    reg_states : iterable
+        The reg_dicts or RegisterMaps, can be a generator
+    fmt : str, optional
+        The format, "csv", "c", "raw" or "ndjson"
+    names : iterable, optional
+        The name of each configuration, defaults to config0, config1, ...
+
+    Returns
+    ----------
+    count : int
+        The number of configurations written
+    """
+    if names is None:
+        names = itertools.repeat(None)
+    with RegisterStreamWriter(outfile, fmt) as writer:
+        for name, reg_dict in zip(names, reg_states):
+            writer.write(reg_dict, name)
+    return writer.count
+
+
+def read_raw_registers(infile):
+    """
+    Reads the configurations of a raw format file
+
+    Parameters
+    ----------
+    infile : str
+        The raw format file
+
+    Yields
+    ----------
+    addresses : numpy.array
+        The address of each register of a configuration
+    values : numpy.array
+        The value of each register
+    """
+    with open(infile, "rb") as rawfile:
+        data = rawfile.read()
+    pos = 0
+    while pos < len(data):
+        if pos + _RAW_COUNT.size > len(data):
+            raise ValueError("Truncated raw register file")
+        count = _RAW_COUNT.unpack_from(data, pos)[0]
+        pos += _RAW_COUNT.size
+        end = pos + count*RAW_RECORD.itemsize
+        if end > len(data):
+            raise ValueError("Truncated raw register file")
+        records = np.frombuffer(data, dtype=RAW_RECORD, count=count, offset=pos)
+        yield records["address"].astype(np.int64), records["value"].astype(np.int64)
+        pos = end
+    return
@@ -0,0 +1,512 @@
+"""
+Refael Whyte, r.whyte@chronoptics.com
+
+A compiled, array backed register map. The register definitions from the CSV
+file are held once in a RegisterLayout, and each RegisterMap only stores the
+field values in a NumPy array. The RegisterMap can be used wherever a reg_dict
+is used, as reg_map[name][2] reads and writes the field value.
+
+Copyright 2020 Refael Whyte - Chronoptics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+# The index of each item in a reg_dict entry, as created by csv_import()
+OFFSET = 0
+SIZE = 1
+VALUE = 2
+DESCRIPTION = 3
+ADDRESS = 4
+VALUE_MEANING = 5
+SECTION = 6
+
+
+def _violation(name, value, max_value):
+    """ Returns the report of a field whose value is too large or negative """
+    return {"name": name,
+            "value": value,
+            "max_value": max_value,
+            "error": "Negative register value" if value < 0 else "Size"}
+
+
+def _string_sequence(strings):
+    """ Copies a list of strings, read only sequences such as lazily decoded strings are kept as is """
+    if isinstance(strings, list) or not isinstance(strings, Sequence):
+        return list(strings)
+    return strings
+
+
+class RegisterLayout:
+    """
+    The read only description of every field in a register map, shared
+    between all the RegisterMaps of the same sensor.
+
+    Parameters
+    ----------
+    names : list[str]
+        The property name of each field, in CSV order
+    offsets : array_like
+        The bit offset of each field in its register
+    sizes : array_like
+        The number of bits of each field
+    addresses : array_like
+        The register address of each field
+    descriptions : Sequence[str]
+        The description of each field
+    value_meanings : Sequence[str]
+        The meaning of the values of each field
+    sections : Sequence[str]
+        The datasheet section of each field
+    """
+
+    def __init__(self, names, offsets, sizes, addresses, descriptions, value_meanings, sections):
+        self.names = list(names)
+        self.index = {name: slot for slot, name in enumerate(self.names)}
+        if len(self.index) != len(self.names):
+            raise ValueError("Duplicate register names in layout")
+
+        self.offsets = np.asarray(offsets, dtype=np.uint8)
+        self.sizes = np.asarray(sizes, dtype=np.uint8)
+        self.addresses = np.asarray(addresses, dtype=np.uint32)
+        self.max_values = (np.left_shift(
+            np.int64(1), self.sizes.astype(np.int64)) - 1)
+        self.descriptions = _string_sequence(descriptions)
+        self.value_meanings = _string_sequence(value_meanings)
+        self.sections = _string_sequence(sections)
+
+        # The registers in the order their first field appears, as dict_to_registers() orders them,
+        # and the index of the register each field is packed into
+        self.register_addresses, first, self.field_registers = np.unique(
+            self.addresses, return_index=True, return_inverse=True)
+        order = np.argsort(first, kind="stable")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(0, order.size)
+        self.register_addresses = self.register_addresses[order]
+        self.field_registers = rank[np.reshape(self.field_registers, -1)]
+        self.register_list = [int(addr) for addr in self.register_addresses]
+        # The slots of the fields packed into each register
+        by_register = np.argsort(self.field_registers, kind="stable")
+        self.register_slots = np.split(by_register, np.cumsum(
+            np.bincount(self.field_registers, minlength=len(self.register_list)))[:-1])
+
+        for arr in [self.offsets, self.sizes, self.addresses, self.max_values,
+                    self.register_addresses, self.field_registers] + self.register_slots:
+            arr.flags.writeable = False
+        return
+
+    def __len__(self):
+        return len(self.names)
+
+    def slot(self, name):
+        """ Returns the slot index of the named field """
+        return self.index[name]
+
+
+class RegisterField:
+    """
+    A view of a single field of a RegisterMap that behaves like the
+    [offset, size, value, desc, reg_num, value_meaning, section] list of a reg_dict.
+    Only the value, index 2, can be written.
+    """
+    __slots__ = ("_map", "_slot")
+
+    def __init__(self, reg_map, slot):
+        self._map = reg_map
+        self._slot = slot
+
+    def __getitem__(self, ind):
+        if ind == VALUE:
+            return self._map._state.values.item(self._slot)
+        layout = self._map.layout
+        if ind == OFFSET:
+            return int(layout.offsets[self._slot])
+        elif ind == SIZE:
+            return int(layout.sizes[self._slot])
+        elif ind == DESCRIPTION:
+            return layout.descriptions[self._slot]
+        elif ind == ADDRESS:
+            return int(layout.addresses[self._slot])
+        elif ind == VALUE_MEANING:
+            return layout.value_meanings[self._slot]
+        elif ind == SECTION:
+            return layout.sections[self._slot]
+        return self.to_list()[ind]
+
+    def __setitem__(self, ind, value):
+        if ind != VALUE:
+            raise TypeError("Only the register value can be written")
+        self._map._set_slot(self._slot, value)
+
+    def __len__(self):
+        return 7
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __eq__(self, other):
+        try:
+            return self.to_list() == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return repr(self.to_list())
+
+    def to_list(self):
+        """ Returns the field as a reg_dict list """
+        return [self[n] for n in range(0, 7)]
+
+
+class _MapState:
+    """
+    The field values and packed registers of a RegisterMap, shared by its shallow copies.
+    A forked state shares the arrays of the state it was forked from until it is written.
+    """
+
+    def __init__(self, values, nregisters):
+        self.values = values
+        self.registers = np.zeros(nregisters, dtype=np.int64)
+        self.dirty = set(range(0, nregisters))
+        self.checkpoint = None
+        self.shared = False
+
+    def fork(self):
+        state = _MapState.__new__(_MapState)
+        state.values = self.values
+        state.registers = self.registers
+        state.dirty = self.dirty
+        state.checkpoint = self.checkpoint
+        state.shared = True
+        self.shared = True
+        return state
+
+    def own(self):
+        # Copies the shared arrays before the first write
+        if self.shared:
+            self.values = self.values.copy()
+            self.registers = self.registers.copy()
+            self.dirty = set(self.dirty)
+            self.shared = False
+        return
+
+
+class RegisterMap(Mapping):
+    """
+    A register map with the values stored in a NumPy array, and the field
+    definitions stored in a shared RegisterLayout.
+
+    Parameters
+    ----------
+    layout : RegisterLayout
+        The field definitions
+    values : array_like, optional
+        The value of each field, defaults to zero
+    """
+
+    def __init__(self, layout, values=None):
+        self.layout = layout
+        if values is None:
+            values = np.zeros(len(layout), dtype=np.int64)
+        else:
+            values = np.array(values, dtype=np.int64)
+            if values.shape != (len(layout),):
+                raise ValueError("Number of values does not match the layout")
+        self._fields = {}
+        self._state = _MapState(values, len(layout.register_list))
+        return
+
+    def __getitem__(self, name):
+        field = self._fields.get(name)
+        if field is None:
+            # Not a try/except, as a fork starts with no field views
+            field = RegisterField(self, self.layout.index[name])
+            self._fields[name] = field
+        return field
+
+    def __iter__(self):
+        return iter(self.layout.names)
+
+    def __len__(self):
+        return len(self.layout)
+
+    def __contains__(self, name):
+        return name in self.layout.index
+
+    def _with_state(self, state):
+        reg_map = RegisterMap.__new__(RegisterMap)
+        reg_map.layout = self.layout
+        reg_map._fields = {}
+        reg_map._state = state
+        return reg_map
+
+    def __copy__(self):
+        # Matches copy.copy() of a reg_dict, the copy shares the values
+        return self._with_state(self._state)
+
+    def __deepcopy__(self, memo):
+        # The layout is read only, so only the values need copying
+        return self.fork()
+
+    def fork(self):
+        """
+        Returns an independent copy of the register map in constant time.
+        The values are shared until either map is written, when the written
+        map copies them.
+
+        Returns
+        ----------
+        reg_map : RegisterMap
+            The copy, sharing the layout
+        """
+        return self._with_state(self._state.fork())
+
+    @property
+    def values_array(self):
+        """ A read only view of the field values """
+        view = self._state.values.view()
+        view.flags.writeable = False
+        return view
+
+    def set_values(self, values):
+        """
+        Sets the value of every field
+
+        Parameters
+        ----------
+        values : array_like
+            The value of each field, in layout order
+        """
+        values = np.array(values, dtype=np.int64)
+        if values.shape != (len(self.layout),):
+            raise ValueError("Number of values does not match the layout")
+        state = self._state
+        state.own()
+        state.values = values
+        state.dirty.update(range(0, len(self.layout.register_list)))
+        return
+
+    def get_value(self, name):
+        """ Returns the value of the named field """
+        return self._state.values.item(self.layout.index[name])
+
+    def set_value(self, name, value):
+        """ Sets the value of the named field """
+        self._set_slot(self.layout.index[name], value)
+        return
+
+    def _set_slot(self, slot, value):
+        state = self._state
+        if state.shared:
+            state.own()
+        state.values[slot] = value
+        state.dirty.add(self.layout.field_registers.item(slot))
+        return
+
+    def _dirty_slots(self):
+        # The dirty registers, and the slots of the fields packed into them in field order
+        layout = self.layout
+        dirty = list(self._state.dirty)
+        if len(dirty) == 1:
+            return dirty, layout.register_slots[dirty[0]]
+        if len(dirty) == len(layout.register_list):
+            return dirty, np.arange(0, len(layout))
+        return dirty, np.sort(np.concatenate([layout.register_slots[n] for n in dirty]))
+
+    def validate(self):
+        """
+        Checks the value of every field written since the last successful check
+        fits in its size and is not negative. A successful check packs the
+        registers, so the next check only looks at the fields written after it.
+
+        Returns
+        ----------
+        violations : list
+            A dict for each invalid field with its name, value, max_value and error,
+            empty if every field is valid
+        """
+        if not self._state.dirty:
+            return []
+        dirty, slots = self._dirty_slots()
+        values = self._state.values[slots]
+        max_values = self.layout.max_values[slots]
+        invalid = np.nonzero((values > max_values) | (values < 0))[0]
+        if invalid.size == 0:
+            self.pack_registers()
+            return []
+        return [_violation(self.layout.names[slots[n]], values.item(n), max_values.item(n))
+                for n in invalid.tolist()]
+
+    def pack_registers(self):
+        """
+        Packs the fields into register values, only re-packing and checking the
+        registers that have had a field written since the last time.
+
+        Returns
+        ----------
+        reg : dict
+            dictionary where the keys are the register and the values are the register value,
+            the same as dict_to_registers()
+        """
+        pack = self._state
+        layout = self.layout
+        if pack.dirty:
+            # A shared state is re-packed in place, as the values are the same
+            dirty, slots = self._dirty_slots()
+            values = pack.values[slots]
+            if np.any(values > layout.max_values[slots]):
+                raise ValueError("Size")
+            if np.any(values < 0):
+                raise ValueError("Negative register value")
+
+            pack.registers[dirty] = 0
+            np.bitwise_or.at(pack.registers, layout.field_registers[slots],
+                             np.left_shift(values, layout.offsets[slots].astype(np.int64)))
+            pack.dirty.clear()
+        return dict(zip(layout.register_list, pack.registers.tolist()))
+
+    def checkpoint(self):
+        """
+        Marks the current register values as the ones written to the sensor,
+        changed_registers() then returns the registers that differ from them.
+        """
+        self.pack_registers()
+        self._state.own()
+        self._state.checkpoint = self._state.registers.copy()
+        return
+
+    def changed_registers(self):
+        """
+        Returns the registers whose value has changed since the last checkpoint(),
+        or every register if there has not been a checkpoint.
+
+        Returns
+        ----------
+        reg : dict
+            dictionary where the keys are the register and the values are the register value
+        """
+        self.pack_registers()
+        pack = self._state
+        if pack.checkpoint is None:
+            changed = np.arange(0, pack.registers.size)
+        else:
+            changed = np.nonzero(pack.registers != pack.checkpoint)[0]
+        return {self.layout.register_list[n]: pack.registers.item(n) for n in changed}
+
+    def to_dict(self):
+        """
+        Converts the register map back to a reg_dict
+
+        Returns
+        ----------
+        reg_dict : dict
+            The dictionary of [offset, size, value, desc, reg_num, value_meaning, section] lists
+        """
+        layout = self.layout
+        reg_dict = {}
+        for slot, name in enumerate(layout.names):
+            reg_dict[name] = [int(layout.offsets[slot]),
+                              int(layout.sizes[slot]),
+                              int(self._state.values[slot]),
+                              layout.descriptions[slot],
+                              int(layout.addresses[slot]),
+                              layout.value_meanings[slot],
+                              layout.sections[slot]]
+        return reg_dict
+
+
+def compile_reg_dict(reg_dict):
+    """
+    Compiles a reg_dict into a RegisterMap
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The dictionary that contains all the register information, as returned by csv_import()
+
+    Returns
+    ----------
+    reg_map : RegisterMap
+        The compiled register map, with the same fields and values
+    """
+    if isinstance(reg_dict, RegisterMap):
+        return copy_map(reg_dict)
+
+    names = list(reg_dict.keys())
+    layout = RegisterLayout(names,
+                            [reg_dict[k][OFFSET] for k in names],
+                            [reg_dict[k][SIZE] for k in names],
+                            [reg_dict[k][ADDRESS] for k in names],
+                            [reg_dict[k][DESCRIPTION] for k in names],
+                            [reg_dict[k][VALUE_MEANING] for k in names],
+                            [reg_dict[k][SECTION] for k in names])
+    values = [int(reg_dict[k][VALUE]) for k in names]
+    return RegisterMap(layout, values)
+
+
+def copy_map(reg_map):
+    """
+    Returns an independent copy of a RegisterMap that shares its layout,
+    the values are copied when either map is first written.
+    """
+    return reg_map.fork()
+
+
+def unpack_registers(reg_dict, addresses, registers):
+    """
+    Unpacks the field values from the register values read back from one or
+    many sensors, with a shift and mask of every field at once. Fields whose
+    register is not read back keep their value in reg_dict.
+
+    Parameters
+    ----------
+    reg_dict : dict or RegisterMap
+        The register definitions, as returned by csv_import()
+    addresses : array_like
+        The register address of each column of registers
+    registers : array_like
+        The (naddresses,) register values of a sensor, or the (nsensors, naddresses)
+        register values of many sensors
+
+    Returns
+    ----------
+    layout : RegisterLayout
+        The field definitions of the columns of values
+    values : numpy.array
+        The (nfields,) or (nsensors, nfields) field values, as stack_reg_states() returns
+    """
+    if isinstance(reg_dict, RegisterMap):
+        layout = reg_dict.layout
+        defaults = reg_dict._state.values
+    else:
+        reg_map = compile_reg_dict(reg_dict)
+        layout = reg_map.layout
+        defaults = reg_map._state.values
+
+    addresses = np.asarray(addresses, dtype=np.int64).reshape(-1)
+    registers = np.asarray(registers, dtype=np.int64)
+    if registers.ndim not in (1, 2) or registers.shape[-1] != addresses.size:
+        raise ValueError("Registers must be of size (naddresses,) or (nsensors, naddresses)")
+    order = np.argsort(addresses, kind="stable")
+    sorted_addresses = addresses[order]
+    if np.any(sorted_addresses[1:] == sorted_addresses[:-1]):
+        raise ValueError("Duplicate register addresses")
+
+    shape = registers.shape[:-1] + (len(layout),)
+    if addresses.size == 0:
+        return layout, np.broadcast_to(defaults, shape).copy()
+
+    # The column of the register of each field, and if it was read back
+    pos = np.searchsorted(sorted_addresses, layout.addresses)
+    pos[pos == addresses.size] = 0
+    found = sorted_addresses[pos] == layout.addresses
+    unpacked = np.right_shift(registers[..., order[pos]],
+                              layout.offsets.astype(np.int64)) & layout.max_values
+    return layout, np.where(found, unpacked, defaults)
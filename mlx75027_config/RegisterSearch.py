@@ -0,0 +1,186 @@
+"""
+Refael Whyte, r.whyte@chronoptics.com
+
+An in-memory index of a register map, for finding fields by their property
+name, section, register address, description and value meaning (the columns of
+csv_import). The names and addresses are kept sorted, so prefix and address
+range queries are binary searches, the text of each field is kept lower case
+for substring queries. Every query returns the names in the register map order.
+
+    index = RegisterIndex(csv_import("mlx75027.csv"))
+    index.prefix("FMOD")
+    index.address_range(0x1000, 0x10FF)
+    index.query("lane 0x10")
+
+Copyright 2020 Refael Whyte - Chronoptics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import bisect
+import re
+
+# Sorts after every character, the end of a prefix range
+_MAX_CHAR = "\U0010FFFF"
+
+_NUMBER = r"(?:0x[0-9a-f]+|[0-9]+)"
+_RANGE_RE = re.compile(r"^(" + _NUMBER + r")-(" + _NUMBER + r")$")
+_HEX_RE = re.compile(r"^0x[0-9a-f]*$")
+
+
+def _parse_number(text):
+    if text.startswith("0x"):
+        return int(text, 16)
+    return int(text)
+
+
+def _address_str(address):
+    """ The register address as in the CSV files, 0x1000 """
+    return "0x{:04x}".format(address)
+
+
+def _prefix_range(keys, prefix):
+    """ The positions of the (key, position) pairs whose key starts with prefix """
+    start = bisect.bisect_left(keys, (prefix,))
+    stop = bisect.bisect_left(keys, (prefix + _MAX_CHAR,))
+    return {pos for key, pos in keys[start:stop]}
+
+
+class RegisterIndex:
+    """
+    A search index of the fields of a register map
+
+    Parameters
+    ----------
+    reg_dict : dict
+        The register map, a dict or a RegisterMap
+    """
+
+    def __init__(self, reg_dict):
+        self.names = list(reg_dict)
+        self._names = sorted((name.lower(), pos)
+                             for pos, name in enumerate(self.names))
+        self._addresses = sorted((int(reg_dict[name][4]), pos)
+                                 for pos, name in enumerate(self.names))
+        self._address_strs = sorted((_address_str(address), pos)
+                                    for address, pos in self._addresses)
+        # The whitespace of the descriptions is collapsed, as they are shown
+        self._text = [" ".join(" ".join((name, reg_dict[name][6], reg_dict[name][3],
+                                         reg_dict[name][5])).split()).lower()
+                      for name in self.names]
+        return
+
+    def __len__(self):
+        return len(self.names)
+
+    def _to_names(self, positions):
+        return [self.names[pos] for pos in sorted(positions)]
+
+    def _prefix(self, text):
+        return _prefix_range(self._names, text.lower())
+
+    def _substring(self, text):
+        text = text.lower()
+        return {pos for pos, field_text in enumerate(self._text) if text in field_text}
+
+    def _address_range(self, start, stop):
+        first = bisect.bisect_left(self._addresses, (start,))
+        last = bisect.bisect_left(self._addresses, (stop + 1,))
+        return {pos for address, pos in self._addresses[first:last]}
+
+    def _address_prefix(self, text):
+        return _prefix_range(self._address_strs, text.lower())
+
+    def prefix(self, text):
+        """
+        Returns the fields whose property name starts with text, ignoring case
+
+        Parameters
+        ----------
+        text : str
+            The start of the property name
+
+        Returns
+        ----------
+        names : list
+            The property names in the register map order
+        """
+        return self._to_names(self._prefix(text))
+
+    def substring(self, text):
+        """
+        Returns the fields whose property name, section, description or value
+        meaning contains text, ignoring case
+
+        Parameters
+        ----------
+        text : str
+            The text to find
+
+        Returns
+        ----------
+        names : list
+            The property names in the register map order
+        """
+        return self._to_names(self._substring(text))
+
+    def address_range(self, start, stop):
+        """
+        Returns the fields of the registers from start to stop, inclusive
+
+        Parameters
+        ----------
+        start : int
+            The first register address
+        stop : int
+            The last register address
+
+        Returns
+        ----------
+        names : list
+            The property names in the register map order
+        """
+        return self._to_names(self._address_range(start, stop))
+
+    def query(self, text):
+        """
+        Returns the fields matching every term of a search, the terms are
+        separated by white space and ignore case
+
+            0x1000-0x10FF   the registers of an address range, or 4096-4351
+            0x10            the registers whose address starts with 0x10
+            FMOD*           the property names starting with FMOD
+            lane            the fields containing lane, as substring()
+
+        Parameters
+        ----------
+        text : str
+            The search, an empty search returns every field
+
+        Returns
+        ----------
+        names : list
+            The property names in the register map order
+        """
+        positions = None
+        for term in text.lower().split():
+            match = _RANGE_RE.match(term)
+            if match:
+                found = self._address_range(_parse_number(match.group(1)),
+                                            _parse_number(match.group(2)))
+            elif _HEX_RE.match(term):
+                found = self._address_prefix(term)
+            elif term.endswith("*"):
+                found = self._prefix(term.rstrip("*"))
+            else:
+                found = self._substring(term)
+            positions = found if positions is None else positions & found
+            if not positions:
+                return []
+        if positions is None:
+            return list(self.names)
+        return self._to_names(positions)
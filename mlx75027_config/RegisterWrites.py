@@ -0,0 +1,193 @@
+"""
+Refael Whyte, r.whyte@chronoptics.com
+
+Compiles the register writes needed to change a running sensor from one
+configuration to another. Only the registers that differ are written, registers
+with contiguous addresses are merged into burst writes, and the writes are ordered
+so the modulation and line timing registers are written before the registers
+whose values depend on them.
+
+Copyright 2020 Refael Whyte - Chronoptics
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from mlx75027_config.CSVConfigIO import dict_to_registers
+
+# The MLX75027 and MLX75026 groups of fields, written in this order before any other register.
+# The modulation PLL first, then the line timing the integration and pretime registers depend on.
+MLX75027_WRITE_ORDER = [
+    ["DIVSELPRE", "DIVSEL", "FMOD_HI", "FMOD_LOW", "FVCO_FMOD"],
+    ["DATA_LANE_CONFIG", "OUTPUT_MODE", "HMAX_HI", "HMAX_LOW", "PLLSSETUP"],
+]
+
+# Fields that change the sensor state, written last and outside of PARAM_HOLD
+MLX75027_CONTROL_FIELDS = ["STANDBY", "STREAM"]
+
+
+def calc_register_delta(old_reg, new_reg):
+    """
+    Returns the registers that differ between two register states
+
+    Parameters
+    ----------
+    old_reg : dict
+        The register state currently on the sensor, a reg_dict or RegisterMap
+    new_reg : dict
+        The register state to change to, from the same CSV file
+
+    Returns
+    ----------
+    delta : dict
+        dictionary where the keys are the register and the values are the new register value
+    """
+    old_regs = dict_to_registers(old_reg)
+    new_regs = dict_to_registers(new_reg)
+    if set(old_regs.keys()) != set(new_regs.keys()):
+        raise ValueError("Register states are from different register maps")
+
+    delta = {}
+    for addr in new_regs:
+        if old_regs[addr] != new_regs[addr]:
+            delta[addr] = new_regs[addr]
+    return delta
+
+
+def compile_register_writes(old_reg, new_reg, write_order=None, use_hold=True, max_gap=0, max_burst=None):
+    """
+    Compiles the ordered register writes that change the sensor from the old to the new register state.
+
+    Parameters
+    ----------
+    old_reg : dict
+        The register state currently on the sensor, a reg_dict or RegisterMap
+    new_reg : dict
+        The register state to change to, from the same CSV file
+    write_order : list[list[str]], optional
+        Groups of field names whose registers are written first, in the order of the groups.
+        Defaults to MLX75027_WRITE_ORDER when the fields exist.
+    use_hold : bool, optional
+        Hold the changes with PARAM_HOLD, if the register map has it, so they are applied to the same frame
+    max_gap : int, optional
+        The number of unchanged registers a burst may rewrite to join two bursts together,
+        PARAM_HOLD and the control registers are never rewritten
+    max_burst : int, optional
+        The maximum number of registers in a single burst write
+
+    Returns
+    ----------
+    writes : list[tuple]
+        The (start_register, [values]) of each burst write, in the order to write them
+    """
+    delta = calc_register_delta(old_reg, new_reg)
+    new_regs = dict_to_registers(new_reg)
+
+    if write_order is None:
+        write_order = MLX75027_WRITE_ORDER
+    groups = {}
+    for ind, names in enumerate(write_order):
+        for name in names:
+            if name in new_reg:
+                groups.setdefault(new_reg[name][4], ind)
+    default_group = len(write_order)
+    control_group = default_group + 1
+    for name in MLX75027_CONTROL_FIELDS:
+        if name in new_reg:
+            groups[new_reg[name][4]] = control_group
+
+    # PARAM_HOLD is never part of another burst, and neither it nor the control
+    # registers are rewritten to bridge a gap, which would release the hold or
+    # change the sensor state part way through the writes
+    hold_regs = set()
+    if "PARAM_HOLD" in new_reg:
+        hold_regs.add(new_reg["PARAM_HOLD"][4])
+    no_bridge = hold_regs | {new_reg[name][4]
+                             for name in MLX75027_CONTROL_FIELDS if name in new_reg}
+
+    hold_reg = None
+    if use_hold and "PARAM_HOLD" in new_reg:
+        hold_reg = new_reg["PARAM_HOLD"][4]
+        hold_bit = 1 << new_reg["PARAM_HOLD"][0]
+        delta.pop(hold_reg, None)
+
+    ordered = sorted(delta.keys(), key=lambda addr: (
+        groups.get(addr, default_group), addr))
+
+    writes = []
+    for addr in ordered:
+        group = groups.get(addr, default_group)
+        if len(writes) > 0:
+            start, values, last_group = writes[-1]
+            gap = addr - (start + len(values))
+            joined = len(values) + gap + 1
+            if (last_group == group and 0 <= gap <= max_gap and
+                    (max_burst is None or joined <= max_burst) and
+                    addr not in hold_regs and (start + len(values) - 1) not in hold_regs and
+                    all((start + len(values) + n) in new_regs and (start + len(values) + n) not in no_bridge
+                        for n in range(0, gap))):
+                for n in range(0, gap):
+                    values.append(new_regs[start + len(values)])
+                values.append(delta[addr])
+                continue
+        writes.append((addr, [delta[addr]], group))
+
+    held = [(start, values) for start, values, group in writes if group != control_group]
+    control = [(start, values) for start, values, group in writes if group == control_group]
+    if hold_reg is not None and len(delta) > 1 and len(held) > 0:
+        held = [(hold_reg, [new_regs[hold_reg] | hold_bit])] + \
+            held + [(hold_reg, [new_regs[hold_reg]])]
+    return held + control
+
+
+def calc_write_time(writes, bus_khz=400.0, addr_bytes=2):
+    """
+    Estimates the time to write the registers over I2C.
+    Each burst is a start, the device address, the register address, the data bytes and a stop.
+
+    Parameters
+    ----------
+    writes : list[tuple]
+        The (start_register, [values]) of each burst write
+    bus_khz : float, optional
+        The I2C clock in kHz
+    addr_bytes : int, optional
+        The number of bytes of the register address, 2 for the MLX75027 and 1 for the EPC660
+
+    Returns
+    ----------
+    write_time_us : float
+        The write time in micro-seconds (us)
+    """
+    nclocks = 0
+    for start, values in writes:
+        # 9 clocks per byte including the ACK, and a clock each for the start and stop
+        nclocks += 2 + 9*(1 + addr_bytes + len(values))
+    write_time_us = nclocks / (bus_khz*1e3) * 1e6
+    return write_time_us
+
+
+def apply_register_writes(registers, writes):
+    """
+    Applies burst writes to a dictionary of register values, as the sensor would.
+
+    Parameters
+    ----------
+    registers : dict
+        dictionary where the keys are the register and the values are the register value
+    writes : list[tuple]
+        The (start_register, [values]) of each burst write
+
+    Returns
+    ----------
+    registers : dict
+        A new dictionary with the writes applied
+    """
+    registers = dict(registers)
+    for start, values in writes:
+        for n, value in enumerate(values):
+            registers[start + n] = value
+    return registers
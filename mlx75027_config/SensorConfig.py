@@ -1,6 +1,14 @@
 
 import numpy as np
 
+# The unsigned type values are cast to, as np.uint16 / np.uint32, keyed by the number of 8 bit registers
+_UINT_TYPES = {1: np.uint8, 2: np.uint16, 3: np.uint32, 4: np.uint32}
+
+
+def _int_value(value, nbits):
+    # Plain int semantics of np.uint16(value) / np.uint32(value), floats are truncated and ints wrap
+    return int(value) & ((1 << nbits) - 1)
+
 
 def reg16_to_value(reg_dict, reg0, reg1):
     """
@@ -16,8 +24,7 @@ def reg16_to_value(reg_dict, reg0, reg1):
     ----------
     value : int, the combined 16bit value 
     """
-    value = np.left_shift(reg_dict[reg1][2], 8) | reg_dict[reg0][2]
-    return value
+    return (int(reg_dict[reg1][2]) << 8) | int(reg_dict[reg0][2])
 
 
 def reg_to_value(reg_dict, reg0, reg1, reg2, reg3):
@@ -42,48 +49,78 @@ def reg_to_value(reg_dict, reg0, reg1, reg2, reg3):
     value : int 
         the combined 32bit value 
     """
-    value = np.left_shift(reg_dict[reg3][2], 24) | np.left_shift(
-        reg_dict[reg2][2], 16) | np.left_shift(reg_dict[reg1][2], 8) | reg_dict[reg0][2]
-    return value
+    return ((int(reg_dict[reg3][2]) << 24) | (int(reg_dict[reg2][2]) << 16) |
+            (int(reg_dict[reg1][2]) << 8) | int(reg_dict[reg0][2]))
 
 
 def value16_to_reg(reg_dict, value, hi_reg, low_reg):
-    val16 = np.uint16(value)
-    hi_val = np.right_shift(val16, 8)
-    low_val = val16 & 0x00FF
-    reg_dict[hi_reg][2] = hi_val
-    reg_dict[low_reg][2] = low_val
+    val16 = _int_value(value, 16)
+    reg_dict[hi_reg][2] = val16 >> 8
+    reg_dict[low_reg][2] = val16 & 0x00FF
     return
 
 
 def value32_to_reg(reg_dict, value, reg0, reg1, reg2, reg3):
     # Write a value into difference registers
-    val32 = np.uint32(value)
-    val3 = np.right_shift(val32, 24) & 0xFF
-    val2 = np.right_shift(val32, 16) & 0xFF
-    val1 = np.right_shift(val32, 8) & 0xFF
-    val0 = val32 & 0xFF
-    #
-    reg_dict[reg0][2] = val0
-    reg_dict[reg1][2] = val1
-    reg_dict[reg2][2] = val2
-    reg_dict[reg3][2] = val3
+    val32 = _int_value(value, 32)
+    reg_dict[reg0][2] = val32 & 0xFF
+    reg_dict[reg1][2] = (val32 >> 8) & 0xFF
+    reg_dict[reg2][2] = (val32 >> 16) & 0xFF
+    reg_dict[reg3][2] = val32 >> 24
     return
 
 
 def reg24_to_value(reg_dict, reg0, reg1, reg2):
-    value = np.left_shift(reg_dict[reg2][2], 16) | np.left_shift(
-        reg_dict[reg1][2], 8) | reg_dict[reg0][2]
-    return value
+    return (int(reg_dict[reg2][2]) << 16) | (int(reg_dict[reg1][2]) << 8) | int(reg_dict[reg0][2])
 
 
 def value24_to_reg(reg_dict, value, reg0, reg1, reg2):
-    val32 = np.uint32(value)
-    val2 = np.right_shift(val32, 16) & 0xFF
-    val1 = np.right_shift(val32, 8) & 0xFF
-    val0 = val32 & 0xFF
-
-    reg_dict[reg0][2] = val0
-    reg_dict[reg1][2] = val1
-    reg_dict[reg2][2] = val2
+    val24 = _int_value(value, 24)
+    reg_dict[reg0][2] = val24 & 0xFF
+    reg_dict[reg1][2] = (val24 >> 8) & 0xFF
+    reg_dict[reg2][2] = val24 >> 16
     return
+
+
+def values_to_regs(values, nregs):
+    """
+    Split an array of values into 8 bit register values, the array version of
+    value16_to_reg(), value24_to_reg() and value32_to_reg()
+
+    Parameters
+    ----------
+    values : numpy.array
+        The values, cast to np.uint16 for 2 registers and np.uint32 for 3 or 4
+    nregs : int
+        The number of 8 bit registers, between 1 and 4
+
+    Returns
+    ----------
+    regs : list
+        The int64 numpy.array of each register, from the low [7:0] bits
+    """
+    if nregs not in _UINT_TYPES:
+        raise ValueError("The number of registers must be between 1 and 4")
+    vals = np.asarray(values).astype(_UINT_TYPES[nregs]).astype(np.int64)
+    return [np.right_shift(vals, 8*n) & 0xFF for n in range(0, nregs)]
+
+
+def regs_to_values(regs):
+    """
+    Combine arrays of 8 bit register values, the array version of
+    reg16_to_value(), reg24_to_value() and reg_to_value()
+
+    Parameters
+    ----------
+    regs : list
+        The numpy.array of each register, from the low [7:0] bits
+
+    Returns
+    ----------
+    values : numpy.array
+        The combined int64 values
+    """
+    values = np.asarray(regs[0]).astype(np.int64)
+    for n in range(1, len(regs)):
+        values = values | np.left_shift(np.asarray(regs[n]).astype(np.int64), 8*n)
+    return values
@@ -1,28 +1,75 @@
 """
 mlx75027_config is the configuration library for the Melexis MLX75027 time of flight (tof) image sensor provided by Chronoptics
 
-The library contains the following functions 
+The library contains the following functions
 
-    * csv_export_registers - 
-    * csv_export - 
+    * csv_export_registers -
+    * csv_export -
+
+The modules are imported on the first use of one of their names, so importing
+the package does not import NumPy or the sensor modules that are not used.
 
 """
 
-from mlx75027_config.CSVConfigIO import csv_export_registers, csv_export, csv_import, dict_to_registers, calc_bits, check_reg_dict
-from mlx75027_config.SensorConfig import value16_to_reg, value24_to_reg, value32_to_reg, reg24_to_value, reg16_to_value, reg_to_value
-
-from mlx75027_config.MLX75027Config import calc_startup_time, set_startup_time, set_deadtime, calc_deadtime, calc_int_times, set_int_times
-from mlx75027_config.MLX75027Config import calc_all_pretimes, calc_pretime, set_pretime, set_mod_freq, calc_mod_freq, calc_frame_time
-from mlx75027_config.MLX75027Config import calc_fps, calc_idle_time, calc_duty_cycle, set_duty_cycle, calc_roi, set_roi, calc_speed
-from mlx75027_config.MLX75027Config import calc_hmax, calc_pll_setup, calc_randnm7, calc_randnm0
-from mlx75027_config.MLX75027Config import calc_nraw, set_nraw, calc_phase_shifts, calc_binning, set_binning
-from mlx75027_config.MLX75027Config import calc_leden, set_leden, set_frame_time
-from mlx75027_config.MLX75027Config import calc_preheat, set_preheat, calc_premix, set_premix, set_phase_shift
-from mlx75027_config.MLX75027Config import calc_nlanes, set_nlanes, set_hmax, calc_output_mode, set_output_mode
-from mlx75027_config.MLX75027Config import calc_analog_delay, set_analog_delay
-
-# The EPC660 functions
-from mlx75027_config.EPC660Config import epc_calc_mod_freq, epc_calc_phase_steps, epc_calc_int_times, epc_set_int_times, epc_calc_roi_coordinates
-from mlx75027_config.EPC660Config import epc_calc_roi, epc_calc_light_phase, epc_setup_light_phase, epc_calc_hdr, epc_calc_dual_phase, epc_set_mode
-from mlx75027_config.EPC660Config import epc_set_roi, epc_calc_bin_mode, epc_set_bin_mode, epc_calc_binning, epc_set_binning, epc_set_mod_freq, epc_calc_img_size
-from mlx75027_config.EPC660Config import epc_set_phase_steps, epc_calc_phase_steps, epc_calc_external_mod, epc_set_external_mod
+import importlib
+
+# The public names of each module
+_MODULE_NAMES = {
+    "RegisterMapping": ("RegisterLayout", "RegisterMap", "compile_reg_dict", "unpack_registers"),
+    "CSVConfigIO": ("csv_export_registers", "csv_export", "csv_import", "dict_to_registers", "registers_to_dict", "calc_bits", "check_reg_dict", "validate_reg_dict"),
+    "CompiledConfigIO": ("compiled_export", "compiled_import", "csv_to_compiled", "compiled_to_csv"),
+    "RegisterExport": ("REGISTER_FORMATS", "RegisterStreamWriter", "pack_register_arrays", "format_registers", "export_registers", "read_raw_registers"),
+    "ConfigCache": ("CSVCache",),
+    "RegisterWrites": ("calc_register_delta", "compile_register_writes", "calc_write_time", "apply_register_writes"),
+    "SensorConfig": ("value16_to_reg", "value24_to_reg", "value32_to_reg", "reg24_to_value", "reg16_to_value", "reg_to_value", "values_to_regs", "regs_to_values"),
+    "Instrumentation": ("CallProfiler",),
+    "RegisterSearch": ("RegisterIndex",),
+
+    "MLX75027Config": ("calc_startup_time", "set_startup_time", "set_deadtime", "calc_deadtime", "calc_int_times", "set_int_times",
+                       "calc_all_pretimes", "calc_pretime", "set_pretime", "set_mod_freq", "calc_mod_freq", "calc_frame_time",
+                       "calc_fps", "calc_idle_time", "calc_duty_cycle", "set_duty_cycle", "calc_roi", "set_roi", "snap_roi", "calc_img_size", "calc_bandwidth", "calc_speed",
+                       "calc_hmax", "calc_pll_setup", "calc_randnm7", "calc_randnm0",
+                       "calc_nraw", "set_nraw", "calc_phase_shifts", "calc_binning", "set_binning",
+                       "calc_leden", "set_leden", "set_frame_time",
+                       "calc_preheat", "set_preheat", "calc_premix", "set_premix", "set_phase_shift",
+                       "calc_nlanes", "set_nlanes", "set_hmax", "calc_output_mode", "set_output_mode",
+                       "calc_analog_delay", "set_analog_delay",
+                       "calc_line_timing", "clear_line_timing_cache"),
+    "MLX75027Tables": ("get_domain_tables",),
+    "MLX75027Batch": ("stack_reg_states", "calc_batch_hmax", "calc_batch_timing", "calc_batch_bandwidth", "sweep_reg_states", "sweep_timing"),
+
+    "MLX75027Solver": ("solve_max_fps", "solve_int_time"),
+    "MLX75027Planner": ("calc_mod_freq_table", "calc_unambiguous_range", "plan_mod_freqs"),
+    "MLX75027Fleet": ("configure_unit", "read_units", "generate_fleet"),
+
+    # The EPC660 functions
+    "EPC660Config": ("epc_calc_mod_freq", "epc_calc_phase_steps", "epc_calc_int_times", "epc_calc_int_mult", "epc_set_int_times", "epc_calc_roi_coordinates",
+                     "epc_calc_roi", "epc_calc_light_phase", "epc_setup_light_phase", "epc_calc_hdr", "epc_calc_dual_phase", "epc_set_mode",
+                     "epc_set_roi", "epc_calc_bin_mode", "epc_set_bin_mode", "epc_calc_binning", "epc_set_binning", "epc_set_mod_freq", "epc_calc_img_size",
+                     "epc_set_phase_steps", "epc_calc_external_mod", "epc_set_external_mod"),
+}
+
+# The module of each public name
+_NAME_MODULES = {name: module for module, names in _MODULE_NAMES.items() for name in names}
+
+__all__ = list(_NAME_MODULES)
+
+
+def __getattr__(name):
+    """ Imports the module of a public name, or a module, on its first use """
+    module = _NAME_MODULES.get(name)
+    if module is None:
+        if name in _MODULE_NAMES:
+            return importlib.import_module(__name__ + "." + name)
+        raise AttributeError("module " + repr(__name__) +
+                             " has no attribute " + repr(name))
+    mod = importlib.import_module(__name__ + "." + module)
+    # Every name of the module is kept, so later uses are plain attribute lookups
+    package = globals()
+    for mod_name in _MODULE_NAMES[module]:
+        package[mod_name] = getattr(mod, mod_name)
+    return package[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_NAME_MODULES) | set(_MODULE_NAMES))
@@ -2,8 +2,19 @@
 """
 
 import unittest
+import csv
 import filecmp
+import io
+import json
+import itertools
+import copy
 import os
+import re
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
 
 import numpy as np
 import mlx75027_config as mlx
@@ -203,6 +214,22 @@ class EPC660ConfigTest(unittest.TestCase):
             self.assertEqual(tx[1], np.round(int_time[1], 2))
         return
 
+    def test_int_mult(self):
+        # Compare against searching every multiplier
+        pos_mult = np.arange(1, 1023)
+        rng = np.random.RandomState(0)
+        totals = np.concatenate(
+            ([0, 1, 1022, 1023, 2044, 1021*1019, 4800, 12000], rng.randint(0, 200000, 200)))
+        for total in totals:
+            int_mult = pos_mult[np.mod(total, pos_mult) == 0][-1]
+            self.assertEqual(mlx.epc_calc_int_mult(np.array([total])), int_mult)
+        for n in range(0, 200):
+            int_total = rng.randint(0, 200000, 2) * rng.randint(1, 50)
+            com_mult = np.all(np.mod(int_total, pos_mult[:, None]) == 0, axis=1)
+            int_mult = pos_mult[com_mult][-1]
+            self.assertEqual(mlx.epc_calc_int_mult(int_total), int_mult)
+        return
+
     def test_sequence(self):
         import_file = os.path.join("..", "epc660.csv")
         self.assertTrue(os.path.isfile(import_file))
@@ -380,6 +407,68 @@ class MLX75027ConfigTest(unittest.TestCase):
 
         return
 
+    def test_line_timing(self):
+        """ The resolved line timing follows changes to the HMAX, lane and output mode registers """
+        import_file = os.path.join("..", "mlx75027.csv")
+        self.assertTrue(os.path.isfile(import_file))
+        reg_dict = mlx.csv_import(import_file)
+        mlx75027 = True
+
+        for nlanes, output_mode in [(2, 0), (4, 0), (4, 4)]:
+            for speed in [300, 600, 704, 800, 960]:
+                mlx.set_nlanes(reg_dict, nlanes)
+                mlx.set_output_mode(reg_dict, output_mode)
+                hmax = mlx.calc_hmax(reg_dict, mlx75027, speed=speed)
+                mlx.set_hmax(reg_dict, hmax)
+                self.assertEqual(mlx.calc_line_timing(
+                    reg_dict, mlx75027), (speed, hmax))
+                self.assertEqual(mlx.calc_line_timing(
+                    reg_dict, mlx75027), (mlx.calc_speed(reg_dict, mlx75027), hmax))
+
+        # An invalid HMAX is never cached
+        mlx.set_hmax(reg_dict, 1)
+        with self.assertRaises(ValueError):
+            mlx.calc_line_timing(reg_dict, mlx75027)
+        return
+
+    def test_domain_tables(self):
+        """ The lookup tables agree with the functions that use them in both directions """
+        import_file = os.path.join("..", "mlx75027.csv")
+        reg_dict = mlx.csv_import(import_file)
+        tables = mlx.get_domain_tables()
+        self.assertIs(tables, mlx.get_domain_tables())
+
+        for (mlx75027, ab_mode, nlanes, speed), hmax in tables.hmaxes.items():
+            mlx.set_nlanes(reg_dict, nlanes)
+            mlx.set_output_mode(reg_dict, 4 if ab_mode else 0)
+            self.assertEqual(mlx.calc_hmax(
+                reg_dict, mlx75027, speed=speed), hmax)
+            self.assertIn((ab_mode, nlanes, speed),
+                          tables.line_modes[(mlx75027, hmax)])
+        with self.assertRaises(ValueError):
+            mlx.calc_hmax(reg_dict, True, speed=500)
+
+        for (mlx75027, hmax), speed in tables.speeds.items():
+            mlx.set_hmax(reg_dict, hmax)
+            self.assertEqual(mlx.calc_speed(reg_dict, mlx75027), speed)
+        # The MLX75026 lists 0x02B6 at 704, 800 and 960 Mbps, the lowest speed is used
+        self.assertEqual(tables.speeds[(False, 0x02B6)], 704)
+
+        for code, shift in enumerate(tables.phase_shifts):
+            mlx.set_phase_shift(reg_dict, [shift])
+            self.assertEqual(reg_dict["P0_PHASE_SHIFT"][2], code)
+            self.assertEqual(mlx.calc_phase_shifts(reg_dict)[0], shift)
+        with self.assertRaises(ValueError):
+            mlx.set_phase_shift(reg_dict, [0.1])
+
+        for steps, (cycle, value) in tables.duty_cycle_codes.items():
+            self.assertEqual(tables.duty_cycle_edges[(cycle, value)], 0.5*steps)
+        # A change too small for a step keeps the direction
+        mlx.set_mod_freq(reg_dict, 10.0)
+        self.assertEqual(mlx.set_duty_cycle(reg_dict, 0.499999), (2, 0))
+        self.assertEqual(mlx.set_duty_cycle(reg_dict, 0.99), (1, 15))
+        return
+
     def test_timing(self):
         """
         Test the timing calculations. Making sure we have done things correctly. 
@@ -445,6 +534,39 @@ class MLX75027ConfigTest(unittest.TestCase):
         self.assertEqual(col_end, ce)
         return
 
+    def test_snap_roi(self):
+        """
+        Test snapping regions of interest for each binning mode
+        """
+        # The full sensor, one ROI per binning mode
+        cs, ce, rs, re, ncols, nrows = mlx.snap_roi(
+            1, 640, 1, 480, np.arange(0, 4), True)
+        self.assertTrue(np.array_equal(ce, [640, 640, 640, 640]))
+        self.assertTrue(np.array_equal(ncols, [640, 320, 160, 80]))
+        self.assertTrue(np.array_equal(nrows, [480, 240, 120, 60]))
+
+        # The end is moved to a multiple of 4 binned columns
+        cs, ce, rs, re, ncols, nrows = mlx.snap_roi(
+            [50, 50], [150, 150], [51, 51], [240, 240], [0, 1], True)
+        self.assertTrue(np.array_equal(ce, [149, 145]))
+        self.assertTrue(np.array_equal(re, [240, 240]))
+        self.assertTrue(np.array_equal(ncols, [100, 48]))
+        self.assertTrue(np.array_equal(nrows, [190, 95]))
+
+        # A minimum ROI past the edge is moved back inside the sensor
+        cs, ce, rs, re, ncols, nrows = mlx.snap_roi(
+            300, 301, 239, 240, 3, False)
+        self.assertEqual((cs, ce, rs, re), (257, 320, 233, 240))
+        self.assertEqual((ncols, nrows), (8, 1))
+
+        reg_dict = mlx.csv_import(os.path.join("..", "mlx75027.csv"))
+        mlx.set_roi(reg_dict, cs, ce, rs, re, False)
+        self.assertEqual(mlx.calc_roi(reg_dict), (cs, ce, rs, re))
+
+        with self.assertRaises(RuntimeError):
+            mlx.snap_roi(1, 640, 1, 480, 4, True)
+        return
+
     def test_mod_freq(self):
         """
         Test the setting of the modulation frequency and the under lying registers 
@@ -592,5 +714,832 @@ class MLX75027ConfigTest(unittest.TestCase):
         return
 
 
+class RegisterMapTest(unittest.TestCase):
+    def test_compile(self):
+        import_file = os.path.join("..", "mlx75027.csv")
+        self.assertTrue(os.path.isfile(import_file))
+        reg_dict = mlx.csv_import(import_file)
+        reg_map = mlx.csv_import(import_file, compiled=True)
+
+        self.assertEqual(len(reg_map), len(reg_dict))
+        self.assertEqual(list(reg_map.keys()), list(reg_dict.keys()))
+        for k in reg_dict:
+            self.assertEqual(reg_map[k], reg_dict[k])
+        self.assertEqual(reg_map.to_dict(), reg_dict)
+
+        with self.assertRaises(TypeError):
+            reg_map["FMOD_HI"][0] = 1
+        return
+
+    def test_configure(self):
+        """ The calc and set functions give the same registers for a reg_dict and a RegisterMap """
+        import_file = os.path.join("..", "mlx75027.csv")
+        reg_dict = mlx.csv_import(import_file)
+        reg_map = mlx.compile_reg_dict(reg_dict)
+        mlx75027 = True
+
+        for reg in [reg_dict, reg_map]:
+            mlx.set_nlanes(reg, 2)
+            mlx.set_output_mode(reg, 0)
+            mlx.set_hmax(reg, mlx.calc_hmax(reg, mlx75027, speed=800))
+            mlx.set_roi(reg, 1, 640, 1, 480, mlx75027)
+            mlx.set_mod_freq(reg, 35.0)
+            mlx.set_nraw(reg, 4)
+            mlx.set_int_times(reg, np.array([250, 250, 250, 250]), mlx75027)
+            mlx.set_duty_cycle(reg, 0.4)
+            mlx.set_phase_shift(reg, np.array([0.0, 0.25, 0.5, 0.75]))
+
+        self.assertEqual(mlx.dict_to_registers(reg_dict),
+                         mlx.dict_to_registers(reg_map))
+        self.assertEqual(mlx.calc_fps(reg_dict, mlx75027),
+                         mlx.calc_fps(reg_map, mlx75027))
+        return
+
+    def test_changed_registers(self):
+        import_file = os.path.join("..", "mlx75027.csv")
+        self.assertTrue(os.path.isfile(import_file))
+        reg_map = mlx.csv_import(import_file, compiled=True)
+        registers = mlx.dict_to_registers(reg_map)
+
+        # Without a checkpoint every register has changed
+        self.assertEqual(reg_map.changed_registers(), registers)
+        reg_map.checkpoint()
+        self.assertEqual(reg_map.changed_registers(), {})
+
+        # Writing the same value is not a change
+        reg_map["FMOD_HI"][2] = reg_map["FMOD_HI"][2]
+        self.assertEqual(reg_map.changed_registers(), {})
+
+        mlx.set_int_times(reg_map, np.array([500]), True)
+        changed = reg_map.changed_registers()
+        registers = mlx.dict_to_registers(reg_map)
+        self.assertEqual(registers, mlx.dict_to_registers(reg_map.to_dict()))
+        self.assertTrue(len(changed) > 0)
+        for reg in changed:
+            self.assertEqual(changed[reg], registers[reg])
+
+        reg_map.checkpoint()
+        self.assertEqual(reg_map.changed_registers(), {})
+
+        reg_map["OUTPUT_MODE"][2] = 8
+        with self.assertRaises(ValueError):
+            mlx.dict_to_registers(reg_map)
+        return
+
+    def test_copy(self):
+        import_file = os.path.join("..", "epc660.csv")
+        reg_map = mlx.csv_import(import_file, compiled=True)
+
+        reg_copy = copy.deepcopy(reg_map)
+        self.assertIs(reg_copy.layout, reg_map.layout)
+        mlx.epc_set_mod_freq(reg_copy, 4.0, 96.0)
+        self.assertNotEqual(reg_copy["mod_clk_div"][2],
+                            reg_map["mod_clk_div"][2])
+        return
+
+    def test_validate(self):
+        """ Every invalid value is reported, and a valid RegisterMap is not checked again """
+        import_file = os.path.join("..", "mlx75027.csv")
+        reg_dict = mlx.csv_import(import_file)
+        reg_map = mlx.compile_reg_dict(reg_dict)
+        self.assertEqual(mlx.validate_reg_dict(reg_dict), [])
+        self.assertEqual(mlx.validate_reg_dict(reg_map), [])
+
+        expected = [{"name": "DIVSEL", "value": -1, "max_value": 3, "error": "Negative register value"},
+                    {"name": "OUTPUT_MODE", "value": 8, "max_value": 7, "error": "Size"}]
+        for reg in [reg_dict, reg_map]:
+            reg["OUTPUT_MODE"][2] = 8
+            reg["DIVSEL"][2] = -1
+            violations = mlx.validate_reg_dict(reg)
+            self.assertEqual(sorted(violations, key=lambda v: v["name"]), expected)
+            with self.assertRaises(ValueError):
+                mlx.check_reg_dict(reg)
+
+            reg["OUTPUT_MODE"][2] = 7
+            reg["DIVSEL"][2] = 3
+            self.assertEqual(mlx.validate_reg_dict(reg), [])
+
+        # The successful check packed the registers, so nothing is left to check
+        self.assertEqual(len(reg_map._state.dirty), 0)
+        self.assertEqual(mlx.dict_to_registers(reg_map),
+                         mlx.dict_to_registers(reg_dict))
+        return
+
+    def test_unpack_registers(self):
+        """ Register dumps of many sensors unpack to the field values that were packed """
+        import_file = os.path.join("..", "mlx75027.csv")
+        reg_dict = mlx.csv_import(import_file)
+        mlx75027 = True
+
+        configs = []
+        for mod_freq, int_time in [(10.0, 100), (35.0, 250), (80.0, 1000)]:
+            reg = copy.deepcopy(reg_dict)
+            mlx.set_mod_freq(reg, mod_freq)
+            mlx.set_int_times(reg, np.array([int_time]*4), mlx75027)
+            configs.append(reg)
+        dumps = [mlx.dict_to_registers(reg) for reg in configs]
+        addresses = list(dumps[0].keys())
+        registers = np.array([[dump[addr] for addr in addresses] for dump in dumps])
+
+        layout, values = mlx.unpack_registers(reg_dict, addresses, registers)
+        np.testing.assert_equal(values, mlx.stack_reg_states(configs)[1])
+        np.testing.assert_equal(mlx.calc_batch_timing(values, mlx75027, layout=layout)["frame_time"],
+                                [mlx.calc_frame_time(reg, mlx75027) for reg in configs])
+
+        # A single dump, in any order and without some registers
+        reg_map = mlx.compile_reg_dict(reg_dict)
+        dump = {addr: dumps[2][addr] for addr in reversed(addresses[1:])}
+        layout, values = mlx.unpack_registers(reg_map, list(dump.keys()), list(dump.values()))
+        mlx.registers_to_dict(reg_map, dump)
+        mlx.registers_to_dict(reg_dict, dump)
+        np.testing.assert_equal(values, reg_map.values_array)
+        self.assertEqual(reg_map.to_dict(), reg_dict)
+        self.assertEqual(mlx.calc_mod_freq(reg_map), 80.0)
+        self.assertEqual(reg_map[layout.names[0]][2], reg_dict[layout.names[0]][2])
+
+        with self.assertRaises(ValueError):
+            mlx.unpack_registers(reg_dict, [0x1000, 0x1000], [0, 0])
+        with self.assertRaises(ValueError):
+            mlx.unpack_registers(reg_dict, [0x1000], [0, 0])
+        return
+
+    def test_fork(self):
+        import_file = os.path.join("..", "mlx75027.csv")
+        reg_map = mlx.csv_import(import_file, compiled=True)
+        reg_map.checkpoint()
+        registers = mlx.dict_to_registers(reg_map)
+
+        fork = reg_map.fork()
+        self.assertEqual(mlx.dict_to_registers(fork), registers)
+        # Writing the fork does not change the original, or the other way
+        mlx.set_int_times(fork, np.array([500]), True)
+        self.assertEqual(mlx.dict_to_registers(reg_map), registers)
+        self.assertEqual(reg_map.changed_registers(), {})
+        self.assertTrue(len(fork.changed_registers()) > 0)
+        mlx.set_mod_freq(reg_map, 50.0)
+        self.assertNotEqual(mlx.calc_mod_freq(fork), 50.0)
+
+        # A shallow copy of a fork shares its values
+        shallow = copy.copy(fork)
+        fork.checkpoint()
+        mlx.set_nraw(shallow, 2)
+        self.assertEqual(mlx.calc_nraw(fork), 2)
+        self.assertTrue(len(fork.changed_registers()) > 0)
+        self.assertNotEqual(mlx.calc_nraw(reg_map), 2)
+        return
+
+    def test_compiled_file(self):
+        """ Converting to and from the compiled file keeps every field """
+        import_file = os.path.join("..", "mlx75027.csv")
+        compiled_file = "mlx75027_compiled.bin"
+        export_file = "mlx75027_compiled.csv"
+        for out_file in [compiled_file, export_file]:
+            if os.path.isfile(out_file):
+                os.remove(out_file)
+        reg_dict = mlx.csv_import(import_file)
+        mlx.set_mod_freq(reg_dict, 35.0)
+
+        mlx.compiled_export(compiled_file, reg_dict)
+        reg_map = mlx.compiled_import(compiled_file)
+        self.assertEqual(reg_map.to_dict(), reg_dict)
+        self.assertEqual(mlx.dict_to_registers(reg_map),
+                         mlx.dict_to_registers(reg_dict))
+        self.assertEqual(reg_map.layout.descriptions[-1],
+                         reg_dict[list(reg_dict.keys())[-1]][3])
+        # The values are copied from the file
+        mlx.set_mod_freq(reg_map, 50.0)
+        self.assertNotEqual(mlx.calc_mod_freq(mlx.compiled_import(compiled_file)),
+                            mlx.calc_mod_freq(reg_map))
+
+        mlx.compiled_to_csv(compiled_file, export_file)
+        self.assertEqual(mlx.csv_import(export_file), reg_dict)
+
+        # A corrupted string only fails the whole file checksum
+        with open(compiled_file, "r+b") as binfile:
+            binfile.seek(-1, os.SEEK_END)
+            binfile.write(b"?")
+        mlx.compiled_import(compiled_file)
+        with self.assertRaises(ValueError):
+            mlx.compiled_import(compiled_file, verify_all=True)
+        # A corrupted value fails the default checksum
+        mlx.compiled_export(compiled_file, reg_dict)
+        with open(compiled_file, "rb") as binfile:
+            values_offset = struct.unpack_from("<I", binfile.read(48), 20)[0]
+        with open(compiled_file, "r+b") as binfile:
+            binfile.seek(values_offset + 8*5)
+            value = binfile.read(1)
+            binfile.seek(values_offset + 8*5)
+            binfile.write(bytes([value[0] ^ 1]))
+        with self.assertRaises(ValueError):
+            mlx.compiled_import(compiled_file)
+        # A corrupted field table fails the default checksum
+        with open(compiled_file, "r+b") as binfile:
+            binfile.seek(48)
+            binfile.write(b"?")
+        with self.assertRaises(ValueError):
+            mlx.compiled_import(compiled_file)
+        with self.assertRaises(ValueError):
+            mlx.compiled_import(import_file)
+
+        os.remove(compiled_file)
+        os.remove(export_file)
+        return
+
+    def test_csv_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        cache = mlx.CSVCache(cache_dir, max_entries=2)
+        import_file = os.path.join("..", "mlx75027.csv")
+        reg_dict = mlx.csv_import(import_file)
+
+        self.assertEqual(mlx.csv_import(import_file, cache=cache), reg_dict)
+        reg_map = mlx.csv_import(import_file, compiled=True, cache=cache)
+        self.assertEqual(reg_map.to_dict(), reg_dict)
+        stats = cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["memory_hits"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+        # Each load has its own values
+        mlx.set_mod_freq(reg_map, 50.0)
+        self.assertEqual(mlx.csv_import(import_file, cache=cache), reg_dict)
+
+        # A new cache, as in another process, loads from disk
+        cache = mlx.CSVCache(cache_dir, max_entries=2)
+        reg_map = mlx.csv_import(import_file, compiled=True, cache=cache)
+        self.assertEqual(reg_map.to_dict(), reg_dict)
+        self.assertEqual(cache.stats()["disk_hits"], 1)
+
+        # A corrupted entry is rebuilt from the CSV file
+        cache_file = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+        with open(cache_file, "r+b") as binfile:
+            binfile.seek(-1, os.SEEK_END)
+            binfile.write(b"?")
+        cache = mlx.CSVCache(cache_dir, max_entries=2)
+        self.assertEqual(mlx.csv_import(import_file, cache=cache), reg_dict)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["disk_hits"], 0)
+
+        for name in ["mlx75026.csv", "epc660.csv"]:
+            mlx.csv_import(os.path.join("..", name), cache=cache)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+        cache.clear()
+        self.assertEqual(len(os.listdir(cache_dir)), 0)
+        shutil.rmtree(cache_dir)
+        return
+
+
+class MLX75027BatchTest(unittest.TestCase):
+    def test_batch_timing(self):
+        """ The batch timing is identical to the scalar timing functions """
+        import_file = os.path.join("..", "mlx75027.csv")
+        self.assertTrue(os.path.isfile(import_file))
+        base = mlx.csv_import(import_file)
+        mlx75027 = True
+
+        reg_states = []
+        for nraw in [1, 3, 4, 8]:
+            for int_time in [10.0, 250.0, 1000.0]:
+                for dead_time in [0.0, 1000.0]:
+                    reg_dict = copy.deepcopy(base)
+                    mlx.set_nraw(reg_dict, nraw)
+                    mlx.set_preheat(reg_dict, np.arange(0, 8) < nraw-1)
+                    mlx.set_pretime(reg_dict, 25.0, mlx75027)
+                    mlx.set_int_times(reg_dict, int_time *
+                                      np.arange(1, 9), mlx75027)
+                    mlx.set_deadtime(reg_dict, dead_time, mlx75027)
+                    reg_states.append(reg_dict)
+
+        timing = mlx.calc_batch_timing(reg_states, mlx75027)
+        for n, reg_dict in enumerate(reg_states):
+            self.assertEqual(timing["frame_time"][n], mlx.calc_frame_time(
+                reg_dict, mlx75027, use_frame_time=True))
+            self.assertEqual(timing["min_frame_time"][n],
+                             mlx.calc_frame_time(reg_dict, mlx75027))
+            depth_fps, raw_fps = mlx.calc_fps(reg_dict, mlx75027)
+            self.assertEqual(timing["depth_fps"][n], depth_fps)
+            self.assertEqual(timing["raw_fps"][n], raw_fps)
+            self.assertEqual(timing["dead_time"][n],
+                             mlx.calc_deadtime(reg_dict, mlx75027))
+        return
+
+    def test_batch_bandwidth(self):
+        """ The batch bandwidth is identical to calc_bandwidth() """
+        import_file = os.path.join("..", "mlx75027.csv")
+        self.assertTrue(os.path.isfile(import_file))
+        base = mlx.csv_import(import_file)
+        mlx75027 = True
+        mlx.set_roi(base, 1, 640, 1, 480, mlx75027)
+
+        # The full VGA image of A-B values, RAW12 on 4 lanes at 960 Mbps
+        bandwidth = mlx.calc_bandwidth(base, mlx75027)
+        self.assertEqual((bandwidth["nrows"], bandwidth["ncols"]), (480, 640))
+        self.assertEqual(bandwidth["frame_bytes"], 480*640*3//2)
+        self.assertEqual(bandwidth["buffer_bytes"], 480*640*2)
+        self.assertEqual(bandwidth["link_rate"], 4*960)
+        self.assertTrue(0.0 < bandwidth["utilization"] < 1.0)
+        self.assertLessEqual(bandwidth["raw_fps"], bandwidth["max_raw_fps"])
+
+        reg_states = []
+        # calc_speed() does not resolve the A & B output on 2 lanes
+        for output_mode, nlanes in [(0, 2), (0, 4), (4, 4)]:
+            for binning in range(0, 4):
+                reg_dict = copy.deepcopy(base)
+                mlx.set_output_mode(reg_dict, output_mode)
+                mlx.set_nlanes(reg_dict, nlanes)
+                mlx.set_hmax(reg_dict, mlx.calc_hmax(
+                    reg_dict, mlx75027, speed=600))
+                mlx.set_binning(reg_dict, binning)
+                reg_states.append(reg_dict)
+
+        bandwidth = mlx.calc_batch_bandwidth(reg_states, mlx75027)
+        for n, reg_dict in enumerate(reg_states):
+            for key, value in mlx.calc_bandwidth(reg_dict, mlx75027).items():
+                self.assertAlmostEqual(bandwidth[key][n], value)
+        # Binning divides the image, A & B output doubles it
+        np.testing.assert_equal(bandwidth["ncols"][0:4], [640, 320, 160, 80])
+        np.testing.assert_equal(bandwidth["nrows"][0:4], [480, 240, 120, 60])
+        self.assertEqual(bandwidth["frame_bytes"][8], 2*bandwidth["frame_bytes"][4])
+        return
+
+    def test_sweep(self):
+        """ A sweep sets the same registers as the set functions """
+        import_file = os.path.join("..", "mlx75027.csv")
+        self.assertTrue(os.path.isfile(import_file))
+        base = mlx.csv_import(import_file)
+        mlx75027 = True
+        mlx.set_preheat(base, [True, False, False,
+                               False, False, False, False, False])
+
+        speeds = np.array([300, 600, 704, 800, 960])
+        int_times = np.array([100.0, 333.3, 1000.0])
+        pretimes = np.array([5.0, 40.0])
+        layout, values = mlx.sweep_reg_states(base, mlx75027, speed=speeds[:, None, None],
+                                              int_times=int_times[None, :, None, None], pretime=pretimes)
+        timing = mlx.calc_batch_timing(values, mlx75027, layout=layout)
+        self.assertEqual(values.shape, (30, len(base)))
+
+        n = 0
+        for speed in speeds:
+            for int_time in int_times:
+                for pretime in pretimes:
+                    reg_dict = copy.deepcopy(base)
+                    mlx.set_hmax(reg_dict, mlx.calc_hmax(
+                        reg_dict, mlx75027, speed=speed))
+                    mlx.set_int_times(
+                        reg_dict, np.array([int_time]), mlx75027)
+                    mlx.set_pretime(reg_dict, pretime, mlx75027)
+                    np.testing.assert_equal(
+                        values[n], [reg_dict[k][2] for k in layout.names])
+                    self.assertEqual(timing["depth_fps"][n],
+                                     mlx.calc_fps(reg_dict, mlx75027)[0])
+                    n += 1
+
+        with self.assertRaises(RuntimeError):
+            mlx.sweep_reg_states(base, mlx75027, nraw=np.array([4, 9]))
+        return
+
+
+class MLX75027SolverTest(unittest.TestCase):
+    def configure(self, reg_dict, mlx75027, nlanes, speed, int_time):
+        reg = copy.deepcopy(reg_dict)
+        pretime = mlx.calc_pretime(reg_dict, mlx75027)
+        mlx.set_nlanes(reg, nlanes)
+        mlx.set_hmax(reg, mlx.calc_hmax(reg, mlx75027, speed=speed))
+        mlx.set_nraw(reg, 4)
+        mlx.set_pretime(reg, pretime, mlx75027)
+        mlx.set_int_times(reg, np.full(4, int_time), mlx75027)
+        mlx.set_frame_time(reg, 0, mlx75027)
+        return reg
+
+    def test_max_fps(self):
+        """ The solver finds the same frame rate as trying every lane and speed """
+        for name, mlx75027 in [("mlx75027.csv", True), ("mlx75026.csv", False)]:
+            reg_dict = mlx.csv_import(os.path.join("..", name))
+            best_fps = 0
+            for nlanes in [2, 4]:
+                for speed in [300, 600, 704, 800, 960]:
+                    reg = self.configure(
+                        reg_dict, mlx75027, nlanes, speed, 200.0)
+                    best_fps = max(best_fps, mlx.calc_fps(reg, mlx75027)[0])
+
+            reg, solution = mlx.solve_max_fps(
+                reg_dict, mlx75027, 200.0, nraw=4)
+            self.assertEqual(solution["depth_fps"], best_fps)
+            self.assertEqual(mlx.calc_fps(reg, mlx75027)[0], best_fps)
+            self.assertEqual(mlx.calc_nlanes(reg), solution["nlanes"])
+            self.assertTrue(np.all(mlx.calc_int_times(reg)[0:4] >= 200.0))
+
+            # Limited to two lanes
+            reg, solution = mlx.solve_max_fps(
+                reg_dict, mlx75027, 200.0, nraw=4, max_lanes=2, max_speed=800)
+            self.assertEqual(solution["nlanes"], 2)
+            self.assertTrue(solution["speed"] <= 800)
+            self.assertTrue(solution["depth_fps"] < best_fps)
+        return
+
+    def test_int_time(self):
+        reg_dict = mlx.csv_import(os.path.join("..", "mlx75027.csv"), compiled=True)
+        mlx75027 = True
+        for target_fps in [30.0, 60.0, 100.0]:
+            reg, solution = mlx.solve_int_time(
+                reg_dict, mlx75027, target_fps, 50.0, nraw=4)
+            self.assertIsInstance(reg, mlx.RegisterMap)
+            self.assertTrue(mlx.calc_fps(reg, mlx75027)[0] >= target_fps)
+            int_times = mlx.calc_int_times(reg)[0:4]
+            np.testing.assert_allclose(int_times, solution["int_time"])
+
+            # One more line of integration misses the target
+            line = solution["hmax"] / 120.0
+            longer = self.configure(reg_dict, mlx75027, solution["nlanes"],
+                                    solution["speed"], solution["int_time"] + line)
+            self.assertTrue(mlx.calc_fps(longer, mlx75027)[0] < target_fps)
+
+        reg, solution = mlx.solve_int_time(
+            reg_dict, mlx75027, 30.0, 50.0, max_int_time=1000.0, nraw=4)
+        self.assertTrue(solution["int_time"] <= 1000.0)
+        with self.assertRaises(RuntimeError):
+            mlx.solve_int_time(reg_dict, mlx75027, 1000.0, 50.0, nraw=4)
+        return
+
+
+class MLX75027PlannerTest(unittest.TestCase):
+    def test_mod_freq_table(self):
+        """ The table is every frequency set_mod_freq() produces, with its registers """
+        reg_dict = mlx.csv_import(os.path.join("..", "mlx75027.csv"))
+        mod_freqs, fmod, divselpre, divsel = mlx.calc_mod_freq_table()
+        for n in range(0, mod_freqs.size):
+            regs = mlx.set_mod_freq(reg_dict, mod_freqs[n])
+            self.assertEqual(regs, (fmod[n], divselpre[n], divsel[n]))
+            self.assertEqual(mlx.calc_mod_freq(reg_dict), mod_freqs[n])
+
+        produced = set()
+        for mod_freq in np.linspace(4.0, 100.0, 5000):
+            mlx.set_mod_freq(reg_dict, mod_freq)
+            produced.add(mlx.calc_mod_freq(reg_dict))
+        self.assertTrue(produced <= set(mod_freqs.tolist()))
+        return
+
+    def test_unambiguous_range(self):
+        np.testing.assert_allclose(mlx.calc_unambiguous_range([20.0]), 7.49481145)
+        np.testing.assert_allclose(
+            mlx.calc_unambiguous_range([80.0, 60.0]), 7.49481145)
+        np.testing.assert_allclose(
+            mlx.calc_unambiguous_range([10.125, 11.25]), 7.49481145*20/1.125)
+        with self.assertRaises(ValueError):
+            mlx.calc_unambiguous_range([10.01, 20.0])
+        return
+
+    def test_plan(self):
+        reg_dict = mlx.csv_import(os.path.join("..", "mlx75027.csv"))
+        mlx75027 = True
+        mlx.set_nraw(reg_dict, 4)
+        mlx.set_frame_time(reg_dict, 0, mlx75027)
+        frame_time = mlx.calc_frame_time(reg_dict, mlx75027)
+
+        for nfreqs in [2, 3]:
+            reg_dicts, plan = mlx.plan_mod_freqs(
+                reg_dict, mlx75027, 3.5*frame_time, nfreqs=nfreqs, min_freq=60.0, max_multiple=6)
+            self.assertEqual(len(reg_dicts), nfreqs)
+            np.testing.assert_allclose(plan["frame_time"], nfreqs*frame_time)
+            for reg, mod_freq in zip(reg_dicts, plan["mod_freqs"]):
+                self.assertEqual(mlx.calc_mod_freq(reg), mod_freq)
+            self.assertEqual(plan["unambiguous_range"],
+                             mlx.calc_unambiguous_range(plan["mod_freqs"]))
+
+            # No other set of frequencies has a longer range
+            table = mlx.calc_mod_freq_table()[0]
+            steps = (table[table >= 60.0]*32).astype(np.int64)
+            best_range = 0
+            for subset in itertools.combinations(steps, nfreqs):
+                common = np.gcd.reduce(subset)
+                if np.max(subset) // common <= 6:
+                    best_range = max(best_range, mlx.calc_unambiguous_range(
+                        np.array(subset) / 32.0))
+            self.assertEqual(plan["unambiguous_range"], best_range)
+
+        # Only two frames fit in the budget
+        reg_dicts, plan = mlx.plan_mod_freqs(
+            reg_dict, mlx75027, 2.5*frame_time)
+        self.assertEqual(len(reg_dicts), 2)
+        with self.assertRaises(RuntimeError):
+            mlx.plan_mod_freqs(reg_dict, mlx75027, 1.5*frame_time)
+        return
+
+
+class MLX75027FleetTest(unittest.TestCase):
+    def test_generate(self):
+        """ Every unit gets the register file of the example configuration with its own settings """
+        import_file = os.path.join("..", "mlx75027.csv")
+        mlx75027 = True
+        units = [("cam0", {}),
+                 ("cam1", {"duty_cycle": 0.45, "phase_offset": 0.125}),
+                 ("cam2", {"int_time": 500.0}),
+                 ("cam3", {"phase_offset": 0.1})]
+        out_dir = tempfile.mkdtemp()
+        try:
+            for processes in [1, 2]:
+                progress = []
+                metrics = mlx.generate_fleet(import_file, units, out_dir, mlx75027, processes=processes,
+                                             chunksize=1, progress=lambda *args: progress.append(args))
+                self.assertEqual(metrics["units"], 4)
+                self.assertEqual(list(metrics["failures"].keys()), ["cam3"])
+                self.assertEqual(sorted(p[0] for p in progress), [1, 2, 3, 4])
+
+                for name, settings in units[:3]:
+                    reg_dict = mlx.csv_import(import_file)
+                    mlx.configure_unit(reg_dict, settings, mlx75027)
+                    expected = os.path.join(out_dir, "expected.csv")
+                    mlx.csv_export_registers(expected, reg_dict)
+                    self.assertTrue(filecmp.cmp(os.path.join(
+                        out_dir, name + ".csv"), expected, shallow=False))
+                self.assertFalse(os.path.isfile(os.path.join(out_dir, "cam3.csv")))
+
+            reg_dict = mlx.csv_import(import_file)
+            mlx.configure_unit(reg_dict, units[1][1], mlx75027)
+            np.testing.assert_equal(mlx.calc_phase_shifts(reg_dict)[0:4], [0.125, 0.375, 0.625, 0.875])
+            self.assertAlmostEqual(mlx.calc_duty_cycle(reg_dict), 0.45, 2)
+
+            # The MLX75026 defaults to its full 320x240 ROI
+            import_file = os.path.join("..", "mlx75026.csv")
+            metrics = mlx.generate_fleet(import_file, units[:2], out_dir, False, processes=1)
+            self.assertEqual(metrics["failed"], 0)
+            reg_dict = mlx.csv_import(import_file)
+            mlx.configure_unit(reg_dict, {}, False)
+            self.assertEqual(mlx.calc_roi(reg_dict), (1, 320, 1, 240))
+            expected = os.path.join(out_dir, "expected.csv")
+            mlx.csv_export_registers(expected, reg_dict)
+            self.assertTrue(filecmp.cmp(os.path.join(
+                out_dir, "cam0.csv"), expected, shallow=False))
+        finally:
+            shutil.rmtree(out_dir)
+        return
+
+
+class RegisterExportTest(unittest.TestCase):
+    def test_formats(self):
+        """ Many configurations stream to one output in each format, and read back """
+        import_file = os.path.join("..", "mlx75027.csv")
+        reg_dict = mlx.csv_import(import_file)
+        reg_map = mlx.compile_reg_dict(reg_dict)
+        mlx.set_mod_freq(reg_map, 35.0)
+        configs = [reg_dict, reg_map]
+        names = ["base", "cam,1"]
+        registers = [mlx.dict_to_registers(reg) for reg in configs]
+
+        out_dir = tempfile.mkdtemp()
+        try:
+            for fmt in mlx.REGISTER_FORMATS:
+                outfile = os.path.join(out_dir, "registers." + fmt)
+                self.assertEqual(mlx.export_registers(outfile, configs, fmt, names), 2)
+                with open(outfile, "rb") as infile:
+                    data = infile.read()
+                self.assertEqual(
+                    b"".join(mlx.format_registers(iter(configs), fmt, names)), data)
+
+                if fmt == "csv":
+                    with open(outfile, newline="") as infile:
+                        rows = list(csv.reader(infile))
+                    self.assertEqual(rows[0], ["Config", "Register", "Value"])
+                    for name, regs in zip(names, registers):
+                        self.assertEqual({int(r[1], 0): int(r[2], 0) for r in rows[1:] if r[0] == name}, regs)
+                elif fmt == "raw":
+                    read_back = [dict(zip(addr.tolist(), val.tolist()))
+                                 for addr, val in mlx.read_raw_registers(outfile)]
+                    self.assertEqual(read_back, registers)
+                elif fmt == "ndjson":
+                    lines = data.decode("utf-8").splitlines()
+                    for line, name, regs in zip(lines, names, registers):
+                        config = json.loads(line)
+                        self.assertEqual(config["name"], name)
+                        self.assertEqual(dict(zip(config["addresses"], config["values"])), regs)
+                else:
+                    text = data.decode("utf-8")
+                    self.assertIn("static const uint16_t base[][2] = {", text)
+                    self.assertIn("#define CAM_1_COUNT " + str(len(registers[1])), text)
+
+            # Names that are the same after sanitising get unique C identifiers
+            data = b"".join(mlx.format_registers(
+                [reg_dict, reg_map, reg_map, reg_dict], "c", ["cam,1", "cam_1", "cam_1", "CAM_1"]))
+            text = data.decode("utf-8")
+            identifiers = re.findall(r"static const uint16_t (\w+)\[\]", text)
+            self.assertEqual(identifiers, ["cam_1", "cam_1_1", "cam_1_2", "CAM_1_3"])
+            self.assertEqual(len(set(re.findall(r"#define (\w+)_COUNT", text))), 4)
+            # Non ASCII letters are not valid C identifiers
+            data = b"".join(mlx.format_registers([reg_dict], "c", ["kamera_\u00e9t\u00e9"]))
+            self.assertIn("static const uint16_t kamera__t_[]", data.decode("utf-8"))
+
+            # A sink that is not closed by the writer
+            sink = io.BytesIO()
+            with mlx.RegisterStreamWriter(sink, "ndjson") as writer:
+                writer.write(reg_map)
+            self.assertEqual(json.loads(sink.getvalue())["name"], "config0")
+            with self.assertRaises(ValueError):
+                mlx.RegisterStreamWriter(sink, "xml")
+        finally:
+            shutil.rmtree(out_dir)
+        return
+
+
+class RegisterWritesTest(unittest.TestCase):
+    def test_mode_switch(self):
+        import_file = os.path.join("..", "mlx75027.csv")
+        self.assertTrue(os.path.isfile(import_file))
+        mlx75027 = True
+        short_mode = mlx.csv_import(import_file)
+        mlx.set_mod_freq(short_mode, 20.0)
+        mlx.set_int_times(short_mode, np.array(
+            [100, 100, 100, 100]), mlx75027)
+
+        long_mode = copy.deepcopy(short_mode)
+        mlx.set_mod_freq(long_mode, 80.0)
+        mlx.set_int_times(long_mode, np.array(
+            [1000, 1000, 1000, 1000]), mlx75027)
+
+        writes = mlx.compile_register_writes(short_mode, long_mode)
+        registers = mlx.apply_register_writes(
+            mlx.dict_to_registers(short_mode), writes)
+        self.assertEqual(registers, mlx.dict_to_registers(long_mode))
+
+        # Held with PARAM_HOLD, and the modulation written before the integration times
+        hold_reg = long_mode["PARAM_HOLD"][4]
+        self.assertEqual(writes[0], (hold_reg, [1]))
+        self.assertEqual(writes[-1], (hold_reg, [0]))
+        starts = [w[0] for w in writes]
+        self.assertLess(starts.index(long_mode["DIVSEL"][4]),
+                        starts.index(long_mode["P0_INT0"][4] - 2))
+
+        # Contiguous registers are burst written
+        total = sum([len(w[1]) for w in writes[1:-1]])
+        self.assertEqual(total, len(mlx.calc_register_delta(short_mode, long_mode)))
+        self.assertLess(len(writes) - 2, total)
+
+        # Bridging unchanged registers gives fewer bursts, and a shorter bus time
+        bridged = mlx.compile_register_writes(short_mode, long_mode, max_gap=1)
+        self.assertLess(len(bridged), len(writes))
+        self.assertLess(mlx.calc_write_time(bridged),
+                        mlx.calc_write_time(writes))
+        self.assertEqual(mlx.apply_register_writes(mlx.dict_to_registers(short_mode), bridged),
+                         mlx.dict_to_registers(long_mode))
+
+        self.assertEqual(mlx.compile_register_writes(long_mode, long_mode), [])
+        return
+
+    def test_hold_not_bridged(self):
+        # A changed register either side of PARAM_HOLD
+        old_reg = {"REG_A": [0, 8, 0, "", 0x0101, "", ""],
+                   "PARAM_HOLD": [0, 1, 0, "", 0x0102, "", ""],
+                   "REG_B": [0, 8, 0, "", 0x0103, "", ""],
+                   "STANDBY": [0, 1, 0, "", 0x0104, "", ""],
+                   "REG_C": [0, 8, 0, "", 0x0105, "", ""]}
+        new_reg = copy.deepcopy(old_reg)
+        new_reg["REG_A"][2] = 1
+        new_reg["REG_B"][2] = 2
+        new_reg["REG_C"][2] = 3
+
+        writes = mlx.compile_register_writes(old_reg, new_reg, max_gap=1)
+        self.assertEqual(writes, [(0x0102, [1]), (0x0101, [1]), (0x0103, [2]),
+                                  (0x0105, [3]), (0x0102, [0])])
+
+        # Without the hold a changed PARAM_HOLD is still written on its own
+        new_reg["PARAM_HOLD"][2] = 1
+        writes = mlx.compile_register_writes(
+            old_reg, new_reg, use_hold=False, max_gap=1)
+        self.assertEqual(writes, [(0x0101, [1]), (0x0102, [1]), (0x0103, [2]), (0x0105, [3])])
+        return
+
+    def test_write_time(self):
+        # Device address, two register address bytes, and one data byte
+        writes = [(0x1000, [1])]
+        self.assertEqual(mlx.calc_write_time(writes, bus_khz=400.0),
+                         (2 + 9*4) / 400e3 * 1e6)
+        writes = [(0x10, [1, 2, 3])]
+        self.assertEqual(mlx.calc_write_time(writes, bus_khz=100.0, addr_bytes=1),
+                         (2 + 9*5) / 100e3 * 1e6)
+        return
+
+
+class CallProfilerTest(unittest.TestCase):
+
+    def test_profile(self):
+        reg_dict = mlx.csv_import(os.path.join("..", "mlx75027.csv"))
+        mlx.configure_unit(reg_dict, {}, True)
+        fps = mlx.calc_fps(reg_dict, True)
+        calc_fps = mlx.calc_fps
+        mlx.clear_line_timing_cache()
+
+        with mlx.CallProfiler() as profiler:
+            self.assertTrue(profiler.enabled)
+            self.assertEqual(mlx.calc_fps(reg_dict, True), fps)
+            mlx.calc_fps(reg_dict, True)
+            with self.assertRaises(RuntimeError):
+                mlx.CallProfiler().enable()
+        # The original functions are put back
+        self.assertFalse(profiler.enabled)
+        self.assertIs(mlx.calc_fps, calc_fps)
+        self.assertFalse(hasattr(mlx.MLX75027Config.calc_frame_time, "__wrapped__"))
+
+        stats = profiler.stats()
+        self.assertEqual(stats["calc_fps"]["calls"], 2)
+        # The line timing is cached after the first call
+        self.assertEqual(stats["calc_speed"]["calls"], 1)
+        self.assertGreaterEqual(stats["calc_fps"]["total_time"],
+                                stats["calc_frame_time"]["total_time"])
+        tree = profiler.call_tree()
+        self.assertEqual([node["name"] for node in tree], ["calc_fps"])
+        self.assertEqual(tree[0]["children"][0]["name"], "calc_frame_time")
+        for line in profiler.collapsed_stacks():
+            stack, self_us = line.rsplit(" ", 1)
+            self.assertTrue(stack.startswith("calc_fps"))
+            self.assertGreater(int(self_us), 0)
+
+        out_dir = tempfile.mkdtemp()
+        try:
+            json_file = os.path.join(out_dir, "profile.json")
+            profiler.export_json(json_file)
+            with open(json_file, encoding="utf-8") as infile:
+                profile = json.load(infile)
+            self.assertEqual(profile["functions"]["calc_fps"]["calls"], 2)
+        finally:
+            shutil.rmtree(out_dir)
+        return
+
+
+class SensorConfigTest(unittest.TestCase):
+
+    def test_register_values(self):
+        reg_dict = {name: [0, 8, 0] for name in ("R0", "R1", "R2", "R3")}
+        mlx.value32_to_reg(reg_dict, 0x12345678, "R0", "R1", "R2", "R3")
+        self.assertEqual([reg_dict[name][2] for name in ("R0", "R1", "R2", "R3")],
+                         [0x78, 0x56, 0x34, 0x12])
+        # Plain ints are written, not NumPy scalars
+        self.assertTrue(all(type(reg[2]) is int for reg in reg_dict.values()))
+        self.assertEqual(mlx.reg_to_value(
+            reg_dict, "R0", "R1", "R2", "R3"), 0x12345678)
+        self.assertEqual(mlx.reg24_to_value(reg_dict, "R0", "R1", "R2"), 0x345678)
+        self.assertEqual(mlx.reg16_to_value(reg_dict, "R0", "R1"), 0x5678)
+
+        # Floats are truncated, and values wrap as np.uint16 / np.uint32 casts
+        mlx.value16_to_reg(reg_dict, 0x1234 + 0.7, "R1", "R0")
+        self.assertEqual(mlx.reg16_to_value(reg_dict, "R0", "R1"), 0x1234)
+        mlx.value24_to_reg(reg_dict, np.int64(0x1ABCDEF), "R0", "R1", "R2")
+        self.assertEqual(mlx.reg24_to_value(reg_dict, "R0", "R1", "R2"), 0xABCDEF)
+
+        values = np.array([0, 1, 0x1234, 0xFFFF, 0x10000])
+        regs = mlx.values_to_regs(values, 2)
+        self.assertTrue(np.array_equal(regs[0], values & 0xFF))
+        self.assertTrue(np.array_equal(
+            mlx.regs_to_values(regs), values & 0xFFFF))
+        with self.assertRaises(ValueError):
+            mlx.values_to_regs(values, 5)
+        return
+
+
+class RegisterSearchTest(unittest.TestCase):
+
+    def test_queries(self):
+        reg_dict = mlx.csv_import(os.path.join("..", "mlx75027.csv"))
+        for reg_map in [reg_dict, mlx.compile_reg_dict(reg_dict)]:
+            index = mlx.RegisterIndex(reg_map)
+            self.assertEqual(len(index), len(reg_dict))
+            self.assertEqual(index.prefix("fmod"), ["FMOD_HI", "FMOD_LOW"])
+            self.assertEqual(index.query("FMOD*"), ["FMOD_HI", "FMOD_LOW"])
+            # The descriptions are searched too
+            self.assertIn("DATA_LANE_CONFIG", index.substring("MIPI LANES"))
+
+            names = index.address_range(0x1000, 0x10FF)
+            self.assertEqual(names, [k for k in reg_dict if 0x1000 <= reg_dict[k][4] <= 0x10FF])
+            self.assertEqual(index.query("0x1000-0x10ff"), names)
+            self.assertEqual(index.query("4096-4351"), names)
+            self.assertEqual(index.query("0x10"), names)
+            self.assertEqual(index.query("0x10 lane"), ["DATA_LANE_CONFIG"])
+
+            self.assertEqual(index.query(""), list(reg_dict))
+            self.assertEqual(index.query("no_such_field"), [])
+        return
+
+
+class PackageTest(unittest.TestCase):
+
+    def test_lazy_import(self):
+        # Importing the package does not import NumPy or the sensor modules
+        code = ("import sys; import mlx75027_config; "
+                "assert 'numpy' not in sys.modules; "
+                "assert 'mlx75027_config.MLX75027Config' not in sys.modules")
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), ".."))
+        subprocess.run([sys.executable, "-c", code], env=env, check=True)
+
+        for name in mlx.__all__:
+            self.assertTrue(callable(getattr(mlx, name))
+                            or name == "REGISTER_FORMATS")
+        self.assertIn("calc_speed", dir(mlx))
+        with self.assertRaises(AttributeError):
+            mlx.calc_nothing
+        return
+
+
 if __name__ == "__main__":
     unittest.main()